@@ -0,0 +1,163 @@
+# This file times the hand processors on generated hand histories.
+# It reports hands per second and peak memory for each processing stage at several file sizes.
+# Results are saved as JSON under benchmarks/results so runs on different commits can be compared.
+import argparse
+import contextlib
+import datetime
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.hand_generator import generate_hand_history  # noqa: E402
+from website.LadbrooksPokerHandProcessor import LadbrooksPokerHandProcessor  # noqa: E402
+from website.PokerStarsHandProcessor import PokerStarsHandProcessor  # noqa: E402
+
+
+RESULTS_FOLDER = os.path.join(ROOT, 'benchmarks', 'results')
+DEFAULT_SIZES = (1000, 10000, 100000)
+SITES = {
+    'ladbrooks': (LadbrooksPokerHandProcessor, 'is_ladbrooks_hands'),
+    'stars': (PokerStarsHandProcessor, 'is_pokerstars_hands'),
+}
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def _measure(stage, hands, func, trace_memory):
+    """Run one stage quietly; returns its output and fills in the stage's numbers"""
+    if trace_memory:
+        tracemalloc.start()
+    started = time.perf_counter()
+    try:
+        # The processors print progress and tracebacks; keep them out of the benchmark output
+        with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+            output = func()
+    finally:
+        seconds = time.perf_counter() - started
+        if trace_memory:
+            stage['peak_memory_mb'] = round(tracemalloc.get_traced_memory()[1] / (1024 * 1024), 2)
+            tracemalloc.stop()
+    stage['seconds'] = round(seconds, 4)
+    stage['hands'] = hands
+    stage['hands_per_second'] = round(hands / seconds, 1) if seconds > 0 else None
+    return output
+
+
+def benchmark_site(site, size, seed=0, trace_memory=True):
+    """Time each processing stage on one generated file; returns stage name -> numbers"""
+    processor_class, validate = SITES[site]
+    data = generate_hand_history(size, site, seed=seed)
+    processor = processor_class(data)
+    stages = {}
+
+    stages['split_hands'] = {}
+    hands = _measure(stages['split_hands'], size, processor.split_hands, trace_memory)
+
+    stages[validate] = {}
+    is_valid, reason, valid_hands = _measure(stages[validate], len(hands), getattr(processor, validate), trace_memory)
+    if not is_valid:
+        raise RuntimeError(f"{site} file with {size} hands failed validation: {reason}")
+
+    # process_hands is parsing each hand and then building the dataframe;
+    # the two halves are timed separately and added up
+    stages['process_hands.parse'] = {}
+    rows, failed = _measure(stages['process_hands.parse'], len(valid_hands),
+                            lambda: processor.parse_hand_rows(valid_hands), trace_memory)
+    stages['process_hands.parse']['failed_hands'] = failed
+
+    stages['csv_process_poker_hand'] = {}
+    dataframe = _measure(stages['csv_process_poker_hand'], len(rows),
+                         lambda: processor.csv_process_poker_hand(rows), trace_memory)
+
+    parse, build = stages['process_hands.parse'], stages['csv_process_poker_hand']
+    seconds = parse['seconds'] + build['seconds']
+    stages['process_hands'] = {
+        'seconds': round(seconds, 4),
+        'hands': len(valid_hands),
+        'hands_per_second': round(len(valid_hands) / seconds, 1) if seconds > 0 else None,
+    }
+    if trace_memory:
+        stages['process_hands']['peak_memory_mb'] = max(parse['peak_memory_mb'], build['peak_memory_mb'])
+
+    stages['advanced_processing'] = {}
+    _measure(stages['advanced_processing'], len(dataframe),
+             lambda: processor.advanced_processing(dataframe), trace_memory)
+    return stages
+
+
+def compare(current, baseline):
+    """Print how each stage's speed changed against a saved run"""
+    print(f"\nCompared with {baseline['commit']} ({baseline['created_at']}):")
+    for key, stages in current['results'].items():
+        old_stages = baseline['results'].get(key)
+        if not old_stages:
+            continue
+        for name, stage in stages.items():
+            old = old_stages.get(name, {}).get('hands_per_second')
+            new = stage.get('hands_per_second')
+            if old and new:
+                print(f"  {key:<18} {name:<24} {new / old:6.2f}x  ({old:,.0f} -> {new:,.0f} hands/s)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the hand processors on generated hand histories.')
+    parser.add_argument('--sizes', default=','.join(str(size) for size in DEFAULT_SIZES),
+                        help='Comma separated hand counts (default: %(default)s)')
+    parser.add_argument('--sites', default=','.join(SITES), help='Comma separated sites (default: %(default)s)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--no-memory', action='store_true',
+                        help='Skip the second, traced run that measures peak memory')
+    parser.add_argument('--compare', metavar='RESULTS_JSON', help='Saved results to compare against')
+    parser.add_argument('--output', metavar='RESULTS_JSON', help='Where to save results (default: benchmarks/results/)')
+    args = parser.parse_args(argv)
+
+    run = {
+        'commit': _git_commit(),
+        'created_at': datetime.datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'seed': args.seed,
+        'memory_traced': not args.no_memory,
+        'results': {},
+    }
+    for site in args.sites.split(','):
+        for size in (int(value) for value in args.sizes.split(',')):
+            stages = benchmark_site(site, size, args.seed, trace_memory=False)
+            if not args.no_memory:
+                # tracemalloc slows every stage down several times, so memory gets its own run
+                for name, stage in benchmark_site(site, size, args.seed, trace_memory=True).items():
+                    stages[name]['peak_memory_mb'] = stage['peak_memory_mb']
+            run['results'][f"{site}/{size}"] = stages
+            print(f"{site} {size} hands")
+            for name, stage in stages.items():
+                memory = f"{stage['peak_memory_mb']:>9.2f} MB" if 'peak_memory_mb' in stage else ''
+                print(f"  {name:<24} {stage['seconds']:>9.3f} s {stage['hands_per_second'] or 0:>11,.1f} hands/s {memory}")
+
+    output = args.output or os.path.join(
+        RESULTS_FOLDER, f"{datetime.datetime.now():%Y%m%d-%H%M%S}-{run['commit']}.json")
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, 'w') as handle:
+        json.dump(run, handle, indent=2)
+    print(f"\nSaved {output}")
+
+    if args.compare:
+        with open(args.compare) as handle:
+            compare(run, json.load(handle))
+
+
+if __name__ == '__main__':
+    main()
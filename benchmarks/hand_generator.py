@@ -0,0 +1,347 @@
+# This file makes up realistic 6-max cash game hand histories for testing and benchmarks.
+# The same seed always gives the same file, in Ladbrokes or PokerStars format.
+# Hands include folds, raises, all-ins with side pots, multiway pots and showdowns.
+import random
+from datetime import datetime, timedelta
+
+
+RANKS = "23456789TJQKA"
+SUITS = "cdhs"
+DECK = [rank + suit for rank in RANKS for suit in SUITS]
+VILLAINS = [
+    "Ace_Hunter", "RiverRat77", "foldpre", "nit_king", "LAGgy", "calldown99",
+    "sharkbait", "tiltedTom", "pocketRockets", "donkslayer", "ValueTown", "cbet_carl",
+]
+STREETS = ("preflop", "flop", "turn", "river")
+BOARD_CARDS = {"preflop": 0, "flop": 3, "turn": 4, "river": 5}
+DEFAULT_STAKES = ((0.05, 0.10),)
+
+
+def _money(value):
+    return f"{value:.2f}"
+
+
+def _blind(value):
+    """Blind as written in a Ladbrokes header, e.g. .05 or 1"""
+    text = f"{value:g}"
+    return text[1:] if text.startswith("0.") else text
+
+
+class SyntheticHand:
+    """One simulated 6-max hand, kept apart from how it is written out.
+
+    Players act with simple random tendencies. Pots are split into main and
+    side pots by how much each player put in; a random player still in the
+    hand wins each pot at showdown.
+    """
+
+    def __init__(self, rng, hand_id, played_at, small_blind, big_blind, hero_name):
+        self.rng = rng
+        self.hand_id = hand_id
+        self.played_at = played_at
+        self.small_blind = small_blind
+        self.big_blind = big_blind
+        self.hero_name = hero_name
+
+        names = rng.sample(VILLAINS, 5) + [hero_name]
+        rng.shuffle(names)
+        # Some short stacks so all-ins and side pots come up regularly
+        self.seats = [
+            (seat, name, round(big_blind * rng.choice((rng.randint(15, 60), rng.randint(80, 250))), 2))
+            for seat, name in enumerate(names, start=1)
+        ]
+        self.button = rng.randint(1, 6)
+        deck = list(DECK)
+        rng.shuffle(deck)
+        self.hole_cards = {name: (deck.pop(), deck.pop()) for _, name, _ in self.seats}
+        self.board = [deck.pop() for _ in range(5)]
+        self.events = []  # (street, player, verb, amount, raise_to, all_in)
+        self.returned = []  # (player, amount) uncalled bets
+        self._play()
+
+    def seat_order(self, offset):
+        names = [name for _, name, _ in self.seats]
+        start = [seat for seat, _, _ in self.seats].index(self.button)
+        return [names[(start + offset + step) % 6] for step in range(6)]
+
+    def _play(self):
+        rng = self.rng
+        stacks = {name: stack for _, name, stack in self.seats}
+        self.starting_stacks = dict(stacks)
+        put_in = {name: 0.0 for name in stacks}
+        order = self.seat_order(1)
+        self.small_blind_player, self.big_blind_player = order[0], order[1]
+        for player, amount in ((order[0], self.small_blind), (order[1], self.big_blind)):
+            stacks[player] = round(stacks[player] - amount, 2)
+            put_in[player] += amount
+
+        live = list(order)
+        self.streets_seen = ["preflop"]
+        for street in STREETS:
+            if street != "preflop":
+                if len(live) < 2:
+                    break
+                self.streets_seen.append(street)
+                if sum(1 for player in live if stacks[player] > 0) < 2:
+                    continue  # Everyone left is all-in; deal the rest of the board
+            acting = order[2:] + order[:2] if street == "preflop" else [player for player in order if player in live]
+            street_bets = {player: 0.0 for player in stacks}
+            if street == "preflop":
+                street_bets[order[0]], street_bets[order[1]] = self.small_blind, self.big_blind
+            to_match = self.big_blind if street == "preflop" else 0.0
+            last_raise = self.big_blind
+            raises = 0
+            to_act = list(acting)
+            while to_act and len(live) > 1:
+                player = to_act.pop(0)
+                if player not in live or stacks[player] <= 0:
+                    continue
+                owed = round(to_match - street_bets[player], 2)
+                roll = rng.random()
+                if owed > 0:
+                    fold_chance = 0.55 if street == "preflop" and raises == 0 else 0.4
+                    if roll < fold_chance:
+                        live.remove(player)
+                        self.events.append((street, player, "folds", 0.0, 0.0, False))
+                        continue
+                    if roll < 0.9 or raises >= 4:
+                        amount = min(owed, stacks[player])
+                        stacks[player] = round(stacks[player] - amount, 2)
+                        street_bets[player] += amount
+                        put_in[player] += amount
+                        self.events.append((street, player, "calls", round(amount, 2), 0.0, stacks[player] <= 0))
+                        continue
+                elif roll < 0.55 or (street == "preflop" and player == order[1] and raises == 0 and roll < 0.8):
+                    self.events.append((street, player, "checks", 0.0, 0.0, False))
+                    continue
+
+                pot = sum(put_in.values())
+                shove = rng.random() < 0.08
+                if to_match == 0:
+                    size = round(max(self.big_blind, pot * rng.choice((0.33, 0.5, 0.75, 1.0, 1.5))), 2)
+                    amount = stacks[player] if shove else min(size, stacks[player])
+                    stacks[player] = round(stacks[player] - amount, 2)
+                    street_bets[player] += amount
+                    put_in[player] += amount
+                    to_match = street_bets[player]
+                    last_raise = amount
+                    self.events.append((street, player, "bets", round(amount, 2), 0.0, stacks[player] <= 0))
+                else:
+                    if street == "preflop" and raises == 0:
+                        target = round(self.big_blind * rng.choice((2, 2.5, 3, 4)), 2)
+                    else:
+                        target = round(max(to_match * rng.choice((2.5, 3)), to_match + last_raise), 2)
+                    amount = stacks[player] if shove else min(round(target - street_bets[player], 2), stacks[player])
+                    stacks[player] = round(stacks[player] - amount, 2)
+                    street_bets[player] += amount
+                    put_in[player] += amount
+                    raise_by = round(street_bets[player] - to_match, 2)
+                    if raise_by <= 0:
+                        # All-in for less than the bet is just a call
+                        self.events.append((street, player, "calls", round(amount, 2), 0.0, True))
+                        continue
+                    last_raise = max(last_raise, raise_by)
+                    to_match = round(street_bets[player], 2)
+                    self.events.append((street, player, "raises", raise_by, to_match, stacks[player] <= 0))
+                raises += 1
+                start = acting.index(player)
+                to_act = [acting[(start + step) % len(acting)] for step in range(1, len(acting))]
+                to_act = [other for other in to_act if other in live]
+
+            # The part of the biggest bet nobody matched goes back to its owner
+            top = max(street_bets, key=street_bets.get)
+            matched = max([amount for player, amount in street_bets.items() if player != top] or [0.0])
+            if street_bets[top] > matched:
+                excess = round(street_bets[top] - matched, 2)
+                stacks[top] = round(stacks[top] + excess, 2)
+                put_in[top] -= excess
+                self.returned.append((street, top, excess))
+
+        self.live = live
+        self.showdown = len(live) > 1
+        self.put_in = {player: round(amount, 2) for player, amount in put_in.items()}
+        self.total_pot = round(sum(self.put_in.values()), 2)
+        self.rake = round(min(self.total_pot * 0.05, 3 * self.big_blind), 2) if "flop" in self.streets_seen else 0.0
+        self._award_pots()
+
+    def _award_pots(self):
+        """Split the money into main and side pots and pick who wins each"""
+        levels = sorted({self.put_in[player] for player in self.live})
+        self.pots = []
+        previous = 0.0
+        for level in levels:
+            amount = round(sum(min(put, level) - min(put, previous) for put in self.put_in.values()), 2)
+            eligible = [player for player in self.live if self.put_in[player] >= level]
+            if amount > 0:
+                self.pots.append({'amount': amount, 'winner': self.rng.choice(eligible)})
+            previous = level
+        # Rake comes out of the main pot
+        self.pots[0]['amount'] = round(self.pots[0]['amount'] - self.rake, 2)
+        self.collected = {}
+        for pot in self.pots:
+            self.collected[pot['winner']] = round(self.collected.get(pot['winner'], 0.0) + pot['amount'], 2)
+
+    # Ladbrokes
+
+    def ladbrokes(self):
+        lines = [
+            f"***** Hand History For Game {self.hand_id} *****",
+            f"{_blind(self.small_blind)}/{_blind(self.big_blind)} Texas Holdem Game Table (NL) - "
+            + self.played_at.strftime("%a %b %d %H:%M:%S GMT %Y"),
+            f"Table Synth{self.hand_id % 97} (Real Money)",
+            f"Seat {self.button} is the button",
+            "Total number of players : 6/6",
+        ]
+        for seat, name, stack in self.seats:
+            lines.append(f"Seat {seat}: {name} (${_money(stack)})")
+        lines.append(f"{self.small_blind_player} posts small blind ({_money(self.small_blind)})")
+        lines.append(f"{self.big_blind_player} posts big blind ({_money(self.big_blind)})")
+        lines.append("** Dealing down cards **")
+        first, second = self.hole_cards[self.hero_name]
+        lines.append(f"Dealt to {self.hero_name} [  {first}, {second} ]")
+        current = "preflop"
+        for street, player, verb, amount, raise_to, all_in in self.events:
+            if street != current:
+                current = street
+                lines.append(self._ladbrokes_street(street))
+            suffix = " (all in)" if all_in else ""
+            if verb in ("folds", "checks"):
+                lines.append(f"{player} {verb}")
+            elif verb == "raises":
+                lines.append(f"{player} raises {_money(amount)} to {_money(raise_to)}{suffix}")
+            else:
+                lines.append(f"{player} {verb} ({_money(amount)}){suffix}")
+        for street in self.streets_seen[self.streets_seen.index(current) + 1:]:
+            lines.append(self._ladbrokes_street(street))
+
+        lines.append("** Summary **")
+        pots = f"Main Pot: ${_money(self.pots[0]['amount'] + self.rake)}"
+        for number, pot in enumerate(self.pots[1:], start=1):
+            pots += f" | Side Pot {number}: ${_money(pot['amount'])}"
+        lines.append(f"{pots} | Rake: ${_money(self.rake)}")
+        board = self.board[:BOARD_CARDS[self.streets_seen[-1]]]
+        if board:
+            lines.append(f"Board: [{', '.join(board)}]")
+        for _, name, _ in self.seats:
+            put = self.put_in[name]
+            cards = f" [ {self.hole_cards[name][0]}, {self.hole_cards[name][1]} ]" if self.showdown and name in self.live else ""
+            balance = self.starting_stacks[name] - put + self.collected.get(name, 0.0)
+            if name in self.collected:
+                net = self.collected[name] - put
+                sign = "+" if net >= 0 else "-"
+                lines.append(f"{name} balance ${_money(balance)}, bet ${_money(put)}, "
+                             f"collected ${_money(self.collected[name])}, net {sign}${_money(abs(net))}{cards}")
+            elif put > 0:
+                folded = "" if name in self.live else " (folded)"
+                lines.append(f"{name} balance ${_money(balance)}, lost ${_money(put)}{folded}{cards}")
+            else:
+                lines.append(f"{name} balance ${_money(balance)}, didn't bet (folded)")
+        return "\n".join(lines)
+
+    def _ladbrokes_street(self, street):
+        board = self.board
+        if street == "flop":
+            return f"** Dealing Flop ** : [ {board[0]}, {board[1]}, {board[2]} ]"
+        if street == "turn":
+            return f"** Dealing Turn ** : [ {board[3]} ]"
+        return f"** Dealing River ** : [ {board[4]} ]"
+
+    # PokerStars
+
+    def pokerstars(self):
+        lines = [
+            f"PokerStars Hand #{self.hand_id}:  Hold'em No Limit (${_money(self.small_blind)}/${_money(self.big_blind)} USD) - "
+            + self.played_at.strftime("%Y/%m/%d %H:%M:%S") + " ET",
+            f"Table 'Synth {self.hand_id % 97}' 6-max Seat #{self.button} is the button",
+        ]
+        for seat, name, stack in self.seats:
+            lines.append(f"Seat {seat}: {name} (${_money(stack)} in chips)")
+        lines.append(f"{self.small_blind_player}: posts small blind ${_money(self.small_blind)}")
+        lines.append(f"{self.big_blind_player}: posts big blind ${_money(self.big_blind)}")
+        lines.append("*** HOLE CARDS ***")
+        first, second = self.hole_cards[self.hero_name]
+        lines.append(f"Dealt to {self.hero_name} [{first} {second}]")
+        current = "preflop"
+        returned = {street: (player, amount) for street, player, amount in self.returned}
+        for street, player, verb, amount, raise_to, all_in in self.events + [(None, None, None, 0, 0, False)]:
+            if street != current:
+                if current in returned:
+                    player_back, amount_back = returned.pop(current)
+                    lines.append(f"Uncalled bet (${_money(amount_back)}) returned to {player_back}")
+                if street is None:
+                    break
+                current = street
+                lines.append(self._pokerstars_street(street))
+            suffix = " and is all-in" if all_in else ""
+            if verb in ("folds", "checks"):
+                lines.append(f"{player}: {verb}")
+            elif verb == "raises":
+                lines.append(f"{player}: raises ${_money(amount)} to ${_money(raise_to)}{suffix}")
+            else:
+                lines.append(f"{player}: {verb} ${_money(amount)}{suffix}")
+        for street in self.streets_seen[self.streets_seen.index(current) + 1:]:
+            lines.append(self._pokerstars_street(street))
+        if self.showdown:
+            lines.append("*** SHOW DOWN ***")
+            for name in self.live:
+                lines.append(f"{name}: shows [{self.hole_cards[name][0]} {self.hole_cards[name][1]}] (a pair)")
+        for number, pot in enumerate(self.pots):
+            source = "pot" if len(self.pots) == 1 else "main pot" if number == 0 else \
+                "side pot" if len(self.pots) == 2 else f"side pot-{number}"
+            lines.append(f"{pot['winner']} collected ${_money(pot['amount'])} from {source}")
+
+        lines.append("*** SUMMARY ***")
+        if len(self.pots) == 1:
+            lines.append(f"Total pot ${_money(self.total_pot)} | Rake ${_money(self.rake)}")
+        else:
+            side_pots = " ".join(
+                f"Side pot{'' if len(self.pots) == 2 else f'-{number}'} ${_money(pot['amount'])}."
+                for number, pot in enumerate(self.pots[1:], start=1)
+            )
+            lines.append(f"Total pot ${_money(self.total_pot)} Main pot ${_money(self.pots[0]['amount'] + self.rake)}. "
+                         f"{side_pots} | Rake ${_money(self.rake)}")
+        board = self.board[:BOARD_CARDS[self.streets_seen[-1]]]
+        if board:
+            lines.append(f"Board [{' '.join(board)}]")
+        for seat, name, _ in self.seats:
+            cards = f"[{self.hole_cards[name][0]} {self.hole_cards[name][1]}]"
+            if self.showdown and name in self.live:
+                if name in self.collected:
+                    lines.append(f"Seat {seat}: {name} showed {cards} and won (${_money(self.collected[name])}) with a pair")
+                else:
+                    lines.append(f"Seat {seat}: {name} showed {cards} and lost with a pair")
+            elif name in self.collected:
+                lines.append(f"Seat {seat}: {name} collected (${_money(self.collected[name])})")
+            else:
+                lines.append(f"Seat {seat}: {name} folded")
+        return "\n".join(lines)
+
+    def _pokerstars_street(self, street):
+        board = self.board
+        if street == "flop":
+            return f"*** FLOP *** [{board[0]} {board[1]} {board[2]}]"
+        if street == "turn":
+            return f"*** TURN *** [{board[0]} {board[1]} {board[2]}] [{board[3]}]"
+        return f"*** RIVER *** [{board[0]} {board[1]} {board[2]} {board[3]}] [{board[4]}]"
+
+
+def generate_hand_history(hands, site="ladbrooks", seed=0, stakes=DEFAULT_STAKES, hero_name=None,
+                          start=datetime(2024, 1, 15, 12, 0, 0)):
+    """A hand history file of the given number of hands for 'ladbrooks' or 'stars'.
+
+    Stakes are (small blind, big blind) pairs used in turn, so several pairs
+    give a file with several stake levels.
+    """
+    if site not in ("ladbrooks", "stars"):
+        raise ValueError(f"Unknown site '{site}'")
+    hero_name = hero_name or ("Hero" if site == "ladbrooks" else "SynthHero")
+    rng = random.Random(seed)
+    played_at = start
+    written = []
+    for number in range(hands):
+        small_blind, big_blind = stakes[number % len(stakes)]
+        hand = SyntheticHand(rng, 100000000 + number, played_at, small_blind, big_blind, hero_name)
+        written.append(hand.ladbrokes() if site == "ladbrooks" else hand.pokerstars())
+        played_at += timedelta(seconds=rng.randint(20, 90))
+    separator = "\n\n" if site == "ladbrooks" else "\n\n\n"
+    return separator.join(written) + "\n"
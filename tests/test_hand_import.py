@@ -0,0 +1,80 @@
+# These tests run the import-hands command over a folder of generated hand histories.
+# The folder is saved over several commits, and running the import again skips what it saved.
+# Run them from the project folder with: python -m unittest discover tests
+import os
+import re
+import shutil
+import tempfile
+import unittest
+
+from flask import Flask
+
+from benchmarks.hand_generator import generate_hand_history
+from website import db
+from website.commands import import_hands_command
+from website.models import ImportedFile, Post, User
+
+
+def write_split_history(folder, hands, files):
+    """Write one generated Ladbrokes history split over several files, so no hand is in two of them"""
+    data = generate_hand_history(hands, 'ladbrooks', seed=1)
+    starts = [m.start() for m in re.finditer(r'\*\*\*\*\* Hand History For Game', data)]
+    per_file = len(starts) // files
+    bounds = starts[::per_file][:files] + [len(data)]
+    for number, (start, end) in enumerate(zip(bounds, bounds[1:])):
+        with open(os.path.join(folder, f'session{number}.txt'), 'w', encoding='utf-8') as handle:
+            handle.write(data[start:end])
+
+
+class ImportHandsTest(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.app = Flask(__name__)
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(self.folder, 'test.db')}"
+        db.init_app(self.app)
+        with self.app.app_context():
+            db.create_all()
+            user = User(email='importer@example.com', username='importer', password='x')
+            db.session.add(user)
+            db.session.commit()
+            self.user_id = user.id
+        self.hands = os.path.join(self.folder, 'hands')
+        os.makedirs(self.hands)
+        write_split_history(self.hands, 60, 3)
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.session.remove()
+            db.engine.dispose()
+        shutil.rmtree(self.folder)
+
+    def import_hands(self, *args):
+        result = self.app.test_cli_runner().invoke(
+            import_hands_command, ['--user', 'importer', '--workers', '1', *args, self.hands])
+        self.assertIsNone(result.exception, result.output)
+        return result.output
+
+    def test_import_saves_every_batch(self):
+        output = self.import_hands('--post-hands', '25', '--batch-size', '1')
+        self.assertIn('3/3 posts', output)
+        with self.app.app_context():
+            posts = Post.query.filter_by(author=self.user_id).order_by(Post.id).all()
+            self.assertEqual([post.hand_count for post in posts], [25, 25, 10])
+            self.assertTrue(all(post.results_digest for post in posts))
+            self.assertEqual(ImportedFile.query.filter_by(user_id=self.user_id).count(), 3)
+
+    def test_second_import_skips_saved_files_and_hands(self):
+        self.import_hands('--post-hands', '25', '--batch-size', '1')
+        self.assertIn('3 already imported', self.import_hands('--post-hands', '25'))
+
+        # A new file repeating hands already imported only adds the ones that are new
+        write_split_history(self.hands, 70, 1)
+        output = self.import_hands('--post-hands', '25', '--batch-size', '1')
+        self.assertIn('10 new hands (60 duplicates skipped)', output)
+        with self.app.app_context():
+            posts = Post.query.filter_by(author=self.user_id).order_by(Post.id).all()
+            self.assertEqual([post.hand_count for post in posts], [25, 25, 20])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,12 +1,37 @@
 # This file reads poker hand histories and turns them into clean data.
 # It calculates stats for flop, turn, and river for each hand.
 # The output is used to show your poker metrics in the website.
+import copy
+import hashlib
+import json
+import logging
 import pandas as pd
 import re
 from datetime import datetime
 from dataclasses import dataclass, field
 from typing import List, Dict, Optional, Any
 
+from .processing_log import HandIssues
+from .processing_memory import (MB, chunk_hands, estimate_footprint_mb,
+                                memory_budget_mb as default_memory_budget_mb)
+from .stage_timer import NullStageTimer, StageTimer
+
+logger = logging.getLogger(__name__)
+
+
+def _add_tallies(total, tally):
+    """Add tally into total in place: numbers add, lists extend and dicts add key by key; None (a failed metric) stays None"""
+    if total is None or tally is None:
+        return None
+    if isinstance(total, dict):
+        for key, value in tally.items():
+            total[key] = _add_tallies(total[key], value) if key in total else value
+        return total
+    if isinstance(total, list):
+        total.extend(tally)
+        return total
+    return total + tally
+
 @dataclass
 class SeatInfo:
     """Information about a seat at the table"""
@@ -146,14 +171,121 @@ class HandHistory:
     raw_hand: str = ""
 
 class LadbrooksPokerHandProcessor:
-    def __init__(self, data):
+    # Bump when hand parsing changes what ends up in a post's data_frame
+    PARSER_VERSION = "2"
+
+    # Streets in the order they are dealt, and the board cards showing once each is
+    STREETS = ('preflop', 'flop', 'turn', 'river')
+    BOARD_SIZES = {'flop': 3, 'turn': 4, 'river': 5}
+    # Verbs the action frequency stats use for each action type
+    ACTION_VERBS = {'fold': 'folds', 'check': 'checks', 'call': 'calls', 'bet': 'bets',
+                    'raise': 'raises', 'all_in': 'raises'}
+
+    # Version of every metric advanced_processing produces. Bump one when its
+    # calculation changes so a stale-only reprocess refreshes just that metric.
+    METRIC_VERSIONS = {
+        'Session Earnings': "1",
+        'Session BB Earnings': "1",
+        'BB per 100 hands': "1",
+        'Total Hands': "1",
+        'VPIP Info': "1",
+        'RFI VPIP Info': "1",
+        'Positional Profitability': "1",
+        'Three bet info': "1",
+        'Four bet info': "1",
+        'IP Profitability': "1",
+        'OP Profitability': "1",
+        'In Position Percentage': "1",
+        'Out Of Position Percentage': "1",
+        'Iso Raise info': "1",
+        'Bet Rates': "1",
+        'Flop Action Frequency': "1",
+        'Turn Action Frequency': "1",
+        'River Action Frequency': "1",
+        'Flop High Card Analysis': "1",
+        'Turn High Card Analysis': "1",
+        'River High Card Analysis': "1",
+        'Board High Card Analysis': "1",
+        'Hand Matrix Analysis': "1",
+        'RFI Matrix Analysis': "1",
+        '3-Bet Matrix Analysis': "1",
+        '4-Bet Matrix Analysis': "1",
+        'Leak Detection': "1",
+        'Positional Matchups': "1",
+        'Flop Positional Matchups': "1",
+        'Turn Positional Matchups': "1",
+        'River Positional Matchups': "1",
+        'Biggest Hands': "1",
+    }
+
+    # Results stored as JSON strings inside the results row
+    NESTED_RESULT_KEYS = [
+        'Flop High Card Analysis', 'Turn High Card Analysis', 'River High Card Analysis',
+        'Board High Card Analysis', 'Hand Matrix Analysis', 'RFI Matrix Analysis',
+        '3-Bet Matrix Analysis', '4-Bet Matrix Analysis', 'Leak Detection',
+        'Positional Matchups', 'Flop Positional Matchups', 'Turn Positional Matchups', 'River Positional Matchups',
+        'Biggest Hands',
+        'VPIP Info', 'RFI VPIP Info', 'Three bet info', 'Four bet info', 'Iso Raise info', 'Positional Profitability',
+        'Flop Action Frequency', 'Turn Action Frequency', 'River Action Frequency'
+    ]
+
+    @classmethod
+    def metrics_version(cls):
+        """Short fingerprint of METRIC_VERSIONS stamped on each post"""
+        registry = json.dumps(cls.METRIC_VERSIONS, sort_keys=True)
+        return hashlib.sha1(registry.encode('utf-8')).hexdigest()[:12]
+
+    def __init__(self, data, timer=None, memory_budget_mb=None):
         self.data = data
+        # Records each processing stage; pass a NullStageTimer to skip the bookkeeping
+        self.timer = timer or StageTimer()
+        # Files estimated to need more than this (in MB) are processed in chunks; 0 means no limit
+        self.memory_budget_mb = default_memory_budget_mb() if memory_budget_mb is None else memory_budget_mb
+        # Metric tallies of the last process() run (see metric_tallies), for adding hands to it later
+        self.tallies = None
+        # Problems with single hands, logged as one summary at the end of a run
+        self.issues = HandIssues(logger)
+
+    # Where each hand starts in an uploaded file
+    HAND_START_PATTERN = re.compile(r'\*\*\*\*\* Hand History For Game')
+    # Joins a file's hands back together when it is split by stake
+    HAND_SEPARATOR = "\n"
+
+    @classmethod
+    def sniff(cls, head):
+        """Whether the opening text of a file looks like this site's hand histories"""
+        return bool(cls.HAND_START_PATTERN.search(head))
 
     def split_hands(self):
         hands = self.data.split('***** Hand History For Game')
         hands = [f'***** Hand History For Game{hand}' for hand in hands if hand.strip() != '']
         return hands
 
+    def locate_hands(self):
+        """Map each hand id to the (byte offset, byte length) of its text in the file"""
+        starts = [m.start() for m in self.HAND_START_PATTERN.finditer(self.data)]
+        located = {}
+        byte_offset = 0
+        previous = 0
+        for start, end in zip(starts, starts[1:] + [len(self.data)]):
+            byte_offset += len(self.data[previous:start].encode('utf-8'))
+            hand = self.data[start:end]
+            byte_length = len(hand.encode('utf-8'))
+            try:
+                hand_id = self.parse_hand_header(hand).get('hand_id')
+            except Exception:
+                hand_id = None
+            if hand_id:
+                located.setdefault(str(hand_id), (byte_offset, byte_length))
+            byte_offset += byte_length
+            previous = end
+        return located
+
+    def raw_hand_from_source(self, hand):
+        """Rebuild the 'Raw Hand' text processing stores for a hand sliced from the file"""
+        marker = '***** Hand History For Game'
+        return f"{marker}{hand[len(marker):].strip()}"
+
     def _normalize_stake_value(self, value):
         formatted = f"{value:g}"
         if formatted.startswith("0."):
@@ -195,25 +327,26 @@ class LadbrooksPokerHandProcessor:
     def _format_stake_key(self, sb, bb):
         return f"{self._normalize_stake_value(sb)}/{self._normalize_stake_value(bb)}"
 
+    def stake_key(self, hand):
+        """A hand's stake level as 'sb/bb' (e.g. '.05/.1'), or None if it shows none"""
+        stakes = self._extract_stakes_from_hand(hand)
+        return self._format_stake_key(*stakes) if stakes else None
+
     def detect_stakes_in_file(self):
         stake_counts = {}
         for hand in self.split_hands():
-            stakes = self._extract_stakes_from_hand(hand)
-            if not stakes:
-                continue
-            stake_key = self._format_stake_key(*stakes)
-            stake_counts[stake_key] = stake_counts.get(stake_key, 0) + 1
+            stake_key = self.stake_key(hand)
+            if stake_key:
+                stake_counts[stake_key] = stake_counts.get(stake_key, 0) + 1
         return stake_counts
 
     def split_by_stakes(self):
         split_data = {}
         for hand in self.split_hands():
-            stakes = self._extract_stakes_from_hand(hand)
-            if not stakes:
-                continue
-            stake_key = self._format_stake_key(*stakes)
-            split_data.setdefault(stake_key, []).append(hand)
-        return {key: "\n".join(hands) for key, hands in split_data.items()}
+            stake_key = self.stake_key(hand)
+            if stake_key:
+                split_data.setdefault(stake_key, []).append(hand)
+        return {key: self.HAND_SEPARATOR.join(hands) for key, hands in split_data.items()}
 
     def get_button_seat(self, hand):
         for line in hand.split('\n'):
@@ -586,13 +719,14 @@ class LadbrooksPokerHandProcessor:
             'bb_stake', 'hand_result', 'hand', 'flop_HU_with_hero', 'turn_HU_with_hero', 'river_HU_with_hero',
             'flop_Position', 'flop_cards', 'flop_pot',
             'flop_OP', 'flop_IP', 'turn_cards', 'turn_pot', 'turn_OP', 'turn_IP', 'river_cards', 'river_pot',
-            'river_IP', 'river_OP', 'Raw Hand'
+            'river_IP', 'river_OP', 'board_all', 'final_pot', 'street_actions', 'position_map', 'Raw Hand'
         ]
         hand_actions_data_frame = pd.DataFrame(columns=columns)
         total_hands_processed = 0
         total_earnings_sum = 0.0
         
         for hand in processed_data:
+            self.issues.current_hand_id = hand.get('hand_id')
             # Use hand_result directly if available (from new parsing), otherwise parse Summary
             hand_result = None
             vpip = None
@@ -603,12 +737,12 @@ class LadbrooksPokerHandProcessor:
                     hand_result_val = hand['hand_result']
                     if hand_result_val is not None:
                         hand_result = float(hand_result_val)
-                        if hand_result != 0.0:
-                            print(f"DEBUG: Found non-zero hand_result={hand_result} in hand dict")
                 except (ValueError, TypeError) as e:
-                    print(f"DEBUG: Error converting hand_result: {e}, value={hand_result_val}")
+                    self.issues.record('had an unreadable hand_result',
+                                       "Error converting hand_result: %s, value=%r", e, hand_result_val)
             else:
-                print(f"DEBUG: hand_result not in hand dict. Available keys: {list(hand.keys())[:10]}")
+                self.issues.record('had no hand_result',
+                                   "hand_result not in hand dict. Available keys: %s", list(hand.keys())[:10])
             
             # If hand_result not found, try to parse from Summary
             if hand_result is None:
@@ -617,19 +751,20 @@ class LadbrooksPokerHandProcessor:
                     if summary:
                         hand_result, vpip = self.process_summary(summary)
                 except Exception as e:
-                    print(f"Error parsing summary: {e}")
+                    self.issues.record('had an unreadable summary', "Error parsing summary: %s", e)
                     hand_result = 0.0
                     vpip = False
             
             # If still None, default to 0
             if hand_result is None:
                 hand_result = 0.0
-                print(f"DEBUG: hand_result is None, defaulting to 0.0. Summary available: {'Summary' in hand}")
-            
+                self.issues.record('had no result and were counted as 0',
+                                   "hand_result is None, defaulting to 0.0. Summary available: %s", 'Summary' in hand)
+
             total_hands_processed += 1
             total_earnings_sum += hand_result
-            if total_hands_processed <= 5:  # Debug first 5 hands
-                print(f"DEBUG: Hand {total_hands_processed} - hand_result={hand_result}, has_Summary={'Summary' in hand}")
+            self.issues.debug('hand_result', "Hand %s - hand_result=%s, has_Summary=%s",
+                              total_hands_processed, hand_result, 'Summary' in hand)
             
             # For VPIP, prioritize HandHistory value (most reliable), then process_summary, then determine from actions
             vpip_from_summary = vpip  # Save vpip from process_summary if available
@@ -669,6 +804,11 @@ class LadbrooksPokerHandProcessor:
                 "flop_HU_with_hero": hand.get('HU_hero_flop', hand.get('flop_HU_with_hero', False)),
                 "turn_HU_with_hero": hand.get('HU_hero_turn', hand.get('turn_HU_with_hero', False)),
                 "river_HU_with_hero": hand.get('HU_hero_river', hand.get('river_HU_with_hero', False)),
+                # Structured per-hand data the analytics read instead of the raw text
+                "board_all": hand.get('board_all', []),
+                "final_pot": hand.get('final_pot', 0.0),
+                "street_actions": hand.get('street_actions'),
+                "position_map": hand.get('position_map'),
                 "Raw Hand": hand.get('Raw Hand', '')  # Add raw hand history
             }
             # Always process actions to determine VPIP correctly
@@ -691,18 +831,11 @@ class LadbrooksPokerHandProcessor:
                                     'six_bet', 'call_six_bet']
                 has_voluntary_action = any(hand_data.get(key, 0) != 0 for key in voluntary_actions)
                 
-                # Fallback: If Action Summary didn't detect actions, check raw hand data
-                if not has_voluntary_action and hand_data.get('Raw Hand'):
-                    raw_hand = hand_data['Raw Hand']
-                    preflop_section = raw_hand.split('** Dealing Flop **')[0] if '** Dealing Flop **' in raw_hand else raw_hand
-                    hero_action_patterns = [
-                        r'Hero\s+calls',
-                        r'Hero\s+raises',
-                        r'Hero\s+bets',
-                        r'Hero\s+limps'
-                    ]
-                    has_other_action = any(re.search(pattern, preflop_section, re.IGNORECASE) for pattern in hero_action_patterns)
-                    if has_other_action:
+                # Fallback: If Action Summary didn't detect actions, check Hero's preflop actions
+                if not has_voluntary_action:
+                    preflop_actions = self._street_actions(hand_data).get('preflop', [])
+                    if any(actor == 'Hero' and action_type in ('call', 'bet', 'raise', 'all_in')
+                           for actor, action_type, _ in preflop_actions):
                         has_voluntary_action = True
                 
                 # Additional check: If vpip_from_summary is True, trust it
@@ -731,15 +864,14 @@ class LadbrooksPokerHandProcessor:
             hand_actions_data_frame = pd.concat([hand_actions_data_frame, pd.DataFrame([hand_data])], ignore_index=True)
 
         # Debug: Check final dataframe
-        if len(hand_actions_data_frame) > 0:
+        if len(hand_actions_data_frame) > 0 and logger.isEnabledFor(logging.DEBUG):
             df_earnings_sum = hand_actions_data_frame['hand_result'].sum()
             non_zero_count = (hand_actions_data_frame['hand_result'] != 0).sum()
-            print(f"DEBUG: Processed {total_hands_processed} hands")
-            print(f"DEBUG: Total earnings from hand dicts: {total_earnings_sum}")
-            print(f"DEBUG: Total earnings in dataframe: {df_earnings_sum}")
-            print(f"DEBUG: Non-zero hand_result count: {non_zero_count}/{len(hand_actions_data_frame)}")
+            logger.debug("Processed %s hands; earnings from hand dicts %s, in dataframe %s; non-zero hand_result %s/%s",
+                         total_hands_processed, total_earnings_sum, df_earnings_sum, non_zero_count,
+                         len(hand_actions_data_frame))
             if non_zero_count == 0:
-                print(f"DEBUG: Sample hand_result values: {hand_actions_data_frame['hand_result'].head(10).tolist()}")
+                logger.debug("Sample hand_result values: %s", hand_actions_data_frame['hand_result'].head(10).tolist())
         
         return hand_actions_data_frame
 
@@ -1273,7 +1405,8 @@ class LadbrooksPokerHandProcessor:
                 processed_players.add(player_name)
                 ending_stack = float(match.group(2))
             except (IndexError, AttributeError) as e:
-                print(f"Error parsing player result (bet pattern): {e}")
+                self.issues.record('had an unreadable player result',
+                                   "Error parsing player result (bet pattern): %s", e)
                 continue
             
             net_result = 0.0
@@ -1359,7 +1492,8 @@ class LadbrooksPokerHandProcessor:
                 ending_stack = float(match.group(2))
                 lost_amount = float(match.group(3))
             except (IndexError, AttributeError) as e:
-                print(f"Error parsing player result (lost pattern): {e}")
+                self.issues.record('had an unreadable player result',
+                                   "Error parsing player result (lost pattern): %s", e)
                 continue
             
             def safe_group(m, group_num):
@@ -1402,7 +1536,8 @@ class LadbrooksPokerHandProcessor:
                 processed_players.add(player_name)
                 ending_stack = float(match.group(2))
             except (IndexError, AttributeError) as e:
-                print(f"Error parsing player result (didn't bet pattern): {e}")
+                self.issues.record('had an unreadable player result',
+                                   "Error parsing player result (didn't bet pattern): %s", e)
                 continue
             
             def safe_group(m, group_num):
@@ -1446,10 +1581,10 @@ class LadbrooksPokerHandProcessor:
             # Try to find Hero line directly - use simpler, more robust parsing
             hero_lines = [line.strip() for line in summary_section.split('\n') if 'Hero' in line and 'balance' in line]
             if not hero_lines:
-                print(f"WARNING: No Hero line found in summary section")
-                print(f"Summary section preview: {summary_section[:500]}")
+                self.issues.record('had no Hero line in the summary',
+                                   "No Hero line found in summary section: %s", summary_section[:500])
             for hero_line in hero_lines:
-                print(f"DEBUG: Parsing Hero line: {hero_line[:150]}")
+                self.issues.debug('hero_line', "Parsing Hero line: %s", hero_line[:150])
                 try:
                     # Extract balance first
                     balance_match = re.search(r'balance\s+\$?([\d.]+)', hero_line)
@@ -1507,7 +1642,7 @@ class LadbrooksPokerHandProcessor:
                     
                     # Always add Hero if we found a Hero line (even if net_result is 0)
                     # This ensures Hero is always in player_results
-                    print(f"DEBUG: Hero parsed - net_result={net_result}, ending_stack={ending_stack}")
+                    self.issues.debug('hero_result', "Hero parsed - net_result=%s, ending_stack=%s", net_result, ending_stack)
                     summary_data['player_results'].append(PlayerResult(
                         player_name='Hero',
                         ending_stack=ending_stack,
@@ -1521,14 +1656,11 @@ class LadbrooksPokerHandProcessor:
                     hero_found = True
                     # Debug output
                     if net_result == 0.0 and "didn't bet" not in hero_line.lower():
-                        print(f"WARNING: Hero line parsed but net_result is 0: {hero_line[:100]}")
-                        print(f"  Pattern 1 (net): {bool(re.search(r'net\s+([+-])\$?([\d.]+)', hero_line))}")
-                        print(f"  Pattern 2 (bet/collected): {bool('bet $' in hero_line and 'collected $' in hero_line)}")
-                        print(f"  Pattern 3 (lost): {bool('lost $' in hero_line or ('lost' in hero_line.lower() and '$' in hero_line))}")
-                        print(f'  Pattern 4 (didn\'t bet): {bool("didn\'t bet" in hero_line.lower())}')
+                        self.issues.record('had a Hero result of 0 without "didn\'t bet"',
+                                           "Hero line parsed but net_result is 0: %s", hero_line[:100])
                     break
                 except (ValueError, AttributeError, IndexError) as e:
-                    print(f"Error parsing Hero line '{hero_line}': {e}")
+                    self.issues.record('had an unreadable Hero line', "Error parsing Hero line %r: %s", hero_line, e)
                     continue
         
         return summary_data
@@ -1847,12 +1979,14 @@ class LadbrooksPokerHandProcessor:
     
     def parse_hand_to_history(self, hand: str) -> Optional[HandHistory]:
         """Parse a single hand into a HandHistory object"""
+        self.issues.current_hand_id = None
         try:
             if "Hero" not in hand:
                 return None
             
             # Parse header
             header_data = self.parse_hand_header(hand)
+            self.issues.current_hand_id = header_data.get('hand_id')
             
             # Parse seats
             seats = self.parse_seat_information(hand)
@@ -1959,18 +2093,16 @@ class LadbrooksPokerHandProcessor:
                 hand_history.hero_won_at_showdown = hero_result.won_pot and hero_result.showed_down
                 hand_history.hero_won_without_showdown = hero_result.won_pot and not hero_result.showed_down
             else:
-                # Debug: Hero result not found - this is a critical issue
-                print(f"WARNING: Hero result not found in player_results for hand {hand_history.hand_id}")
-                print(f"Available players: {[r.player_name for r in hand_history.player_results]}")
+                # Hero result not found - this is a critical issue
+                self.issues.record('had no Hero result', "Hero result not found for hand %s. Available players: %s",
+                                   hand_history.hand_id, [r.player_name for r in hand_history.player_results])
                 # Set to 0 as fallback
                 hand_history.hero_net_result_chips = 0.0
                 hand_history.hero_net_result_bb = 0.0
             
             return hand_history
         except Exception as e:
-            print(f"Error parsing hand to history: {e}")
-            import traceback
-            traceback.print_exc()
+            self.issues.record('failed to parse', "Error parsing hand to history: %s", e, exc_info=True)
             return None  # Return None instead of crashing so reprocessing can continue
     
     def _reconstruct_action_summary(self, hand_history: HandHistory) -> str:
@@ -2051,6 +2183,31 @@ class LadbrooksPokerHandProcessor:
 
         return "\n".join(action_lines)
     
+    def street_actions(self, actions: List[Action], board: List[str]) -> Dict[str, List[list]]:
+        """Who did what on each street, as {street: [[actor, action_type, amount], ...]}.
+
+        Every street that was dealt is a key, even when nobody acted on it, so the
+        analytics can tell which streets a hand reached without its text. Blinds are
+        left out; a raise's amount is the total it raised to.
+        """
+        streets = {'preflop': []}
+        for street in ('flop', 'turn', 'river'):
+            if len(board) >= self.BOARD_SIZES[street]:
+                streets[street] = []
+        for action in actions:
+            if action.action_type in ('post_sb', 'post_bb'):
+                continue
+            amount = action.amount
+            if action.action_type in ('raise', 'all_in') and action.bet_size_total is not None:
+                amount = action.bet_size_total
+            streets.setdefault(action.street, []).append([action.actor, action.action_type, amount])
+        return streets
+
+    def seat_positions(self, seats: List[SeatInfo], button_seat: Optional[int]) -> Dict[str, str]:
+        """Each seated player's position, e.g. {'Hero': 'BTN', ...}"""
+        seat_info = [(seat.seat_number, seat.player_name) for seat in seats]
+        return self.calculate_positions(seat_info, button_seat, len(seat_info))
+
     def hand_history_to_dataframe_row(self, hand_history: HandHistory) -> Dict[str, Any]:
         """Convert HandHistory object to dictionary for DataFrame"""
         # Reconstruct legacy action summary strings
@@ -2174,6 +2331,8 @@ class LadbrooksPokerHandProcessor:
             
             # Store actions and raw hand
             'actions': hand_history.actions,
+            'street_actions': self.street_actions(hand_history.actions, hand_history.board_all),
+            'position_map': self.seat_positions(hand_history.seats, hand_history.button_seat),
             'Raw Hand': hand_history.raw_hand
         }
         
@@ -2378,61 +2537,131 @@ class LadbrooksPokerHandProcessor:
         
         return row
 
-    def process_hands(self, hand_list):
-        """Process hands using new robust parser"""
+    def parse_hand_row(self, hand):
+        """Parse one hand into the row csv_process_poker_hand expects, or None if it can't be parsed"""
+        # Parse hand into HandHistory object
+        hand_history = self.parse_hand_to_history(hand)
+        if not hand_history:
+            return None
+
+        # Convert to dictionary format for backward compatibility
+        hand_dict = self.hand_history_to_dataframe_row(hand_history)
+
+        # Add legacy fields that csv_process_poker_hand expects
+        hand_dict["Hero Position"] = hand_dict.get('position', '')
+        hand_dict["Number Players"] = hand_dict.get('no_players', 6)
+        hand_dict["SB Stake"] = hand_dict.get('stakes_sb', 0.0)
+        hand_dict["BB Stake"] = hand_dict.get('stakes_bb', 0.0)
+
+        # Legacy HU fields (will be recalculated by flop_HU_with_hero in csv_process_poker_hand)
+        # For now, calculate from active players
+        hand_dict["HU_hero_flop"] = hand_dict.get('hero_is_active_on_flop', False) and len(hand_dict.get('players_active_on_flop', [])) == 2
+        hand_dict["HU_hero_turn"] = hand_dict.get('hero_is_active_on_turn', False) and len(hand_dict.get('players_active_on_turn', [])) == 2
+        hand_dict["HU_hero_river"] = hand_dict.get('hero_is_active_on_river', False) and len(hand_dict.get('players_active_on_river', [])) == 2
+        return hand_dict
+
+    def parse_hand_rows(self, hand_list):
+        """Parse each of Hero's hands into a row; returns (rows, number of hands that failed)"""
         processed_hands = []
         failed_hands = 0
         for hand in hand_list:
             if "Hero" not in hand:
                 continue
-            
+
             try:
-                # Parse hand into HandHistory object
-                hand_history = self.parse_hand_to_history(hand)
-                if not hand_history:
+                hand_dict = self.parse_hand_row(hand)
+                if hand_dict is None:
                     failed_hands += 1
                     continue
-                
-                # Convert to dictionary format for backward compatibility
-                hand_dict = self.hand_history_to_dataframe_row(hand_history)
-                
-                # Add legacy fields that csv_process_poker_hand expects
-                hand_dict["Hero Position"] = hand_dict.get('position', '')
-                hand_dict["Number Players"] = hand_dict.get('no_players', 6)
-                hand_dict["SB Stake"] = hand_dict.get('stakes_sb', 0.0)
-                hand_dict["BB Stake"] = hand_dict.get('stakes_bb', 0.0)
-                
-                # Legacy HU fields (will be recalculated by flop_HU_with_hero in csv_process_poker_hand)
-                # For now, calculate from active players
-                hand_dict["HU_hero_flop"] = hand_dict.get('hero_is_active_on_flop', False) and len(hand_dict.get('players_active_on_flop', [])) == 2
-                hand_dict["HU_hero_turn"] = hand_dict.get('hero_is_active_on_turn', False) and len(hand_dict.get('players_active_on_turn', [])) == 2
-                hand_dict["HU_hero_river"] = hand_dict.get('hero_is_active_on_river', False) and len(hand_dict.get('players_active_on_river', [])) == 2
-                
                 processed_hands.append(hand_dict)
             except Exception as e:
                 failed_hands += 1
-                print(f"Error processing individual hand: {str(e)}")
+                self.issues.record('failed to process', "Error processing individual hand: %s", e)
                 continue
-        
-        if failed_hands > 0:
-            print(f"Warning: {failed_hands} hands failed to process")
-        
+        return processed_hands, failed_hands
+
+    def chunk_size(self, hand_count):
+        """Hands per chunk for a file over the memory budget, or None when it can be processed whole"""
+        if not self.memory_budget_mb:
+            return None
+        footprint_mb = estimate_footprint_mb(self.data)
+        if footprint_mb <= self.memory_budget_mb:
+            return None
+        size = chunk_hands(hand_count, footprint_mb, self.memory_budget_mb)
+        logger.info("Estimated %.0f MB for %d hands is over the %.0f MB budget; processing %d hands at a time",
+                    footprint_mb, hand_count, self.memory_budget_mb, size)
+        return size
+
+    def process_hands(self, hand_list):
+        """Process hands using new robust parser"""
+        with self.timer.stage('parsing', len(hand_list)) as stage:
+            processed_hands, failed_hands = self.parse_hand_rows(hand_list)
+            stage['rows_out'] = len(processed_hands)
+            stage['failures'] = failed_hands
+
         if len(processed_hands) == 0:
-            print("Error: No hands were successfully processed")
+            logger.warning("No hands were successfully processed (%d failed)", failed_hands)
             return pd.DataFrame()
         
         try:
-            result_df = self.csv_process_poker_hand(processed_hands)
+            with self.timer.stage('row_building', len(processed_hands)) as stage:
+                result_df = self.csv_process_poker_hand(processed_hands)
+                stage['rows_out'] = 0 if result_df is None else len(result_df)
             if result_df is None or result_df.empty:
-                print("Error: csv_process_poker_hand returned empty DataFrame")
+                logger.error("csv_process_poker_hand returned empty DataFrame")
                 return pd.DataFrame()
             return result_df
-        except Exception as e:
-            import traceback
-            print(f"Error in csv_process_poker_hand: {str(e)}")
-            print(f"Traceback: {traceback.format_exc()}")
+        except Exception:
+            logger.exception("Error in csv_process_poker_hand")
             return pd.DataFrame()
 
+    def process_hands_in_chunks(self, hand_list, chunk_size):
+        """Process a file over the memory budget chunk_size hands at a time: (stored rows, metric tallies).
+
+        Each chunk is parsed, built into rows and tallied (see metric_tallies),
+        then its rows are referenced to the file and kept only as the JSON they
+        are saved as (see StoredHandRows). hand_list is emptied as it goes, so
+        next to the file's text and the encoded rows only one chunk is ever
+        held. Returns an empty frame and None when no hand could be processed.
+        """
+        from .raw_hands import StoredHandRows, reference_located_hands
+
+        file_bytes = self.data.encode('utf-8')
+        located = self.locate_hands()
+        stored = StoredHandRows()
+        tallies = {}
+        failed_hands = 0
+        chunks = 0
+        # Metric stages once per chunk would bury the run's own stages
+        chunk_timer = NullStageTimer()
+        with self.timer.stage('chunked_processing', len(hand_list)) as stage:
+            while hand_list:
+                processed_hands, failed = self.parse_hand_rows(hand_list[:chunk_size])
+                del hand_list[:chunk_size]
+                failed_hands += failed
+                if not processed_hands:
+                    continue
+                try:
+                    chunk_df = self.csv_process_poker_hand(processed_hands)
+                except Exception:
+                    logger.exception("Error in csv_process_poker_hand")
+                    return pd.DataFrame(), None
+                del processed_hands
+                if chunk_df is None or chunk_df.empty:
+                    continue
+                tallies = self.merge_metric_tallies(tallies, self.metric_tallies(chunk_df, chunk_timer))
+                stored.add(reference_located_hands(chunk_df, file_bytes, located, self))
+                chunks += 1
+            stage['rows_out'] = len(stored)
+            stage['failures'] = failed_hands
+            stage['chunks'] = chunks
+            stage['stored_mb'] = round(stored.bytes / MB, 2)
+
+        if stored.empty:
+            logger.warning("No hands were successfully processed (%d failed)", failed_hands)
+            return pd.DataFrame(), None
+        return stored, tallies
+
     def is_ladbrooks_hands(self):
         try:
             hands = self.data.strip().split("***** Hand History For Game")
@@ -2467,37 +2696,48 @@ class LadbrooksPokerHandProcessor:
             return False
 
     def calculate_vpip(self, df):
+        return self.vpip_from_tally(self.vpip_tally(df))
+
+    def vpip_tally(self, df):
+        """Counts behind VPIP Info; tallies of several frames add up (see merge_metric_tallies)"""
+        tally = {'hands': 0, 'vpip_count': 0, 'position_vpip': {}, 'position_hands': {}}
         if df is None or df.empty or 'vpip' not in df.columns:
+            return tally
+
+        tally['hands'] = len(df)
+        # Convert vpip to numeric (True/False -> 1/0) to ensure sum works correctly
+        # Handle both boolean and string representations
+        vpip_series = df['vpip'].apply(lambda x: 1 if (x is True or x == True or str(x).lower() == 'true' or x == 1) else 0)
+        tally['vpip_count'] = int(vpip_series.sum())
+        for position, vpip in zip(df['position'], vpip_series):
+            if pd.isna(position):
+                continue
+            tally['position_hands'][position] = tally['position_hands'].get(position, 0) + 1
+            tally['position_vpip'][position] = tally['position_vpip'].get(position, 0) + int(vpip)
+        return tally
+
+    def vpip_from_tally(self, tally):
+        total_hands = tally['hands']
+        if total_hands == 0:
             return {
                 "num_viable_hands": 0,
                 "vpip_count": 0,
                 "general_vpip": 0.0,
                 "positional_vpip": {}
             }
-        
-        total_hands = len(df)
-        
-        # Convert vpip to numeric (True/False -> 1/0) to ensure sum works correctly
-        # Handle both boolean and string representations
-        vpip_series = df['vpip'].apply(lambda x: 1 if (x is True or x == True or str(x).lower() == 'true' or x == 1) else 0)
-        vpip_true_count = int(vpip_series.sum())
-        
-        general_vpip_percent = round((vpip_true_count / total_hands) * 100, 2) if total_hands > 0 else 0
 
-        # Calculate positional VPIP
-        position_vpip_counts = df.groupby('position').apply(lambda g: g['vpip'].apply(lambda x: 1 if (x is True or x == True or str(x).lower() == 'true' or x == 1) else 0).sum())
-        position_hand_counts = df['position'].value_counts()
-        position_vpip_percent = (position_vpip_counts / position_hand_counts * 100).fillna(0)
+        vpip_true_count = tally['vpip_count']
+        general_vpip_percent = round((vpip_true_count / total_hands) * 100, 2) if total_hands > 0 else 0
 
         # For 6-handed: UTG, MP, CO, BTN, SB, BB (HJ is only for 5-handed)
+        # Missing positions count as 0, which also drops unexpected ones (like HJ from old data)
         ordered_positions = ['UTG', 'MP', 'CO', 'BTN', 'SB', 'BB']
-        # Reindex will fill missing positions with NaN, then fillna(0) converts to 0
-        # This gracefully handles any unexpected positions (like HJ from old data)
-        position_vpip_percent = position_vpip_percent.reindex(ordered_positions).fillna(0)
-        position_hand_counts_ordered = position_hand_counts.reindex(ordered_positions).fillna(0)
-
-        rounded_positional_vpip = {pos: round(float(vpip), 2) for pos, vpip in position_vpip_percent.to_dict().items()}
-        rounded_positional_hand_counts = {pos: int(hand_count) for pos, hand_count in position_hand_counts_ordered.to_dict().items()}
+        position_hands = tally['position_hands']
+        rounded_positional_vpip = {
+            pos: round(float(tally['position_vpip'][pos] / position_hands[pos] * 100), 2) if position_hands.get(pos) else 0.0
+            for pos in ordered_positions
+        }
+        rounded_positional_hand_counts = {pos: int(position_hands.get(pos, 0)) for pos in ordered_positions}
 
         return {
             "num_viable_hands": total_hands,
@@ -2513,6 +2753,10 @@ class LadbrooksPokerHandProcessor:
         RFI VPIP = Hands where Hero was the FIRST person to open raise into the pot (RFI only, not limp).
         Only counts non-BB positions (BB can't RFI since they're already in the pot).
         """
+        return self.rfi_vpip_from_tally(self.rfi_vpip_tally(df))
+
+    def rfi_vpip_tally(self, df):
+        """Counts behind RFI VPIP Info"""
         rfi_count = 0  # Total RFI hands
         # Include all possible positions including HJ (Hijack)
         position_rfi_counts = {'UTG': 0, 'HJ': 0, 'MP': 0, 'CO': 0, 'BTN': 0, 'SB': 0}
@@ -2532,6 +2776,14 @@ class LadbrooksPokerHandProcessor:
                     rfi_count += 1
                     position_rfi_counts[position] += 1
 
+        return {'rfi_count': rfi_count, 'position_rfi_counts': position_rfi_counts,
+                'position_total_counts': position_total_counts}
+
+    def rfi_vpip_from_tally(self, tally):
+        rfi_count = tally['rfi_count']
+        position_rfi_counts = tally['position_rfi_counts']
+        position_total_counts = tally['position_total_counts']
+
         # Calculate RFI VPIP percentages
         total_viable_hands = sum(position_total_counts.values())
         general_rfi_vpip_percent = round((rfi_count / total_viable_hands) * 100, 2) if total_viable_hands > 0 else 0
@@ -2555,65 +2807,82 @@ class LadbrooksPokerHandProcessor:
     def is_dict(self, val):
         return val != '0' and val != 0
 
-    def _extract_preflop_section(self, raw_hand):
+    def street_actions_from_raw_hand(self, raw_hand):
+        """street_actions for a hand saved before that column existed, parsed from its text"""
         if not raw_hand or not isinstance(raw_hand, str):
-            return ""
-        start_marker = None
-        for marker in [
-            "** Dealing down cards **",
-            "** Dealing Hole Cards **",
-            "** Dealing hole cards **",
-            "** Dealing Cards **",
-            "** Dealing cards **"
-        ]:
-            if marker in raw_hand:
-                start_marker = marker
-                break
-        if not start_marker:
-            return ""
+            return {}
         try:
-            after = raw_hand.split(start_marker, 1)[1]
-            if "** Dealing Flop **" in after:
-                return after.split("** Dealing Flop **", 1)[0]
-            if "** Summary **" in after:
-                return after.split("** Summary **", 1)[0]
+            board = self.parse_board_cards(raw_hand)['board_all']
+            return self.street_actions(self.parse_actions(raw_hand, 0.0, 0.0), board)
         except Exception:
-            return ""
-        return ""
+            return {}
 
-    def _parse_preflop_actions(self, raw_hand):
-        preflop_section = self._extract_preflop_section(raw_hand)
-        actions = []
-        if not preflop_section:
-            return actions
-        for line in preflop_section.split("\n"):
-            line = line.strip()
-            if not line:
-                continue
-            lower = line.lower()
-            if "posts" in lower and ("small blind" in lower or "big blind" in lower):
-                continue
-            if "dealing" in lower or "dealt" in lower:
-                continue
-            parts = line.split(" ", 1)
-            if len(parts) < 2:
-                continue
-            player = parts[0].strip().rstrip(":")
-            action_text = parts[1].strip().lower()
-            if "raises" in action_text or "bets" in action_text:
-                action_type = "raise"
-            elif "calls" in action_text:
-                action_type = "call"
-            elif "all-in" in action_text or "all in" in action_text:
-                action_type = "raise"
-            elif "folds" in action_text:
-                action_type = "fold"
-            elif "checks" in action_text:
-                action_type = "check"
-            else:
-                action_type = "other"
-            actions.append((player, action_type, action_text))
-        return actions
+    def _street_actions(self, row):
+        street_actions = row.get('street_actions')
+        if isinstance(street_actions, dict):
+            return street_actions
+        return self.street_actions_from_raw_hand(row.get('Raw Hand'))
+
+    def _street_actions_column(self, dataframe):
+        """street_actions of every row, or None if the frame has neither it nor the hands' text"""
+        if 'street_actions' not in dataframe.columns and 'Raw Hand' not in dataframe.columns:
+            return None
+        saved = dataframe['street_actions'] if 'street_actions' in dataframe.columns else [None] * len(dataframe)
+        raw_hands = dataframe['Raw Hand'] if 'Raw Hand' in dataframe.columns else [None] * len(dataframe)
+        return pd.Series(
+            [street_actions if isinstance(street_actions, dict) else self.street_actions_from_raw_hand(raw_hand)
+             for street_actions, raw_hand in zip(saved, raw_hands)],
+            index=dataframe.index, dtype=object)
+
+    def _position_map(self, row):
+        position_map = row.get('position_map')
+        if isinstance(position_map, dict):
+            return position_map
+        return self._position_map_from_hand(row.get('Raw Hand'))
+
+    def _board_cards(self, row):
+        board = row.get('board_all')
+        if isinstance(board, list):
+            return board[:5]
+        raw_hand = row.get('Raw Hand')
+        if not raw_hand or not isinstance(raw_hand, str):
+            return []
+        return self.parse_board_cards(raw_hand)['board_all'][:5]
+
+    def _preflop_actions(self, row):
+        """Preflop actions as (player, kind, amount), kind being raise, call, fold or check"""
+        kinds = {'bet': 'raise', 'raise': 'raise', 'all_in': 'raise', 'call': 'call', 'fold': 'fold', 'check': 'check'}
+        return [(actor, kinds.get(action_type, 'other'), amount)
+                for actor, action_type, amount in self._street_actions(row).get('preflop', [])]
+
+    def _hero_reached_street(self, street_actions, street):
+        """Whether the street was dealt without Hero folding on an earlier one"""
+        if street not in street_actions:
+            return False
+        for earlier in self.STREETS[:self.STREETS.index(street)]:
+            if any(actor == 'Hero' and action_type == 'fold'
+                   for actor, action_type, _ in street_actions.get(earlier, [])):
+                return False
+        return True
+
+    def _hero_first_action(self, street_actions, street):
+        """Hero's first action on a street as a verb ('checks', 'bets', ...), or None"""
+        return next((self.ACTION_VERBS.get(action_type) for actor, action_type, _ in street_actions.get(street, [])
+                     if actor == 'Hero'), None)
+
+    def _players_left(self, street_actions, position_map, street):
+        """Seated players who hadn't folded before the street"""
+        players = set(position_map)
+        for earlier in self.STREETS[:self.STREETS.index(street)]:
+            players -= {actor for actor, action_type, _ in street_actions.get(earlier, []) if action_type == 'fold'}
+        return players
+
+    def _street_dealt_mask(self, dataframe, street):
+        """Rows whose hand was dealt the street"""
+        street_actions = self._street_actions_column(dataframe)
+        if street_actions is None:
+            return pd.Series(False, index=dataframe.index)
+        return street_actions.apply(lambda actions: street in actions).astype(bool)
 
     def _position_map_from_hand(self, raw_hand):
         try:
@@ -2627,6 +2896,10 @@ class LadbrooksPokerHandProcessor:
             return {}
 
     def get_three_bet_metrics(self, data_frame):
+        return self.three_bet_from_tally(self.three_bet_tally(data_frame))
+
+    def three_bet_tally(self, data_frame):
+        """Counts and unrounded BB sums behind Three bet info"""
         three_bet_data = {}
         position_values = {'MP': 0, 'CO': 0, 'BTN': 0, 'SB': 0, 'BB': 0}
         three_bet_data['Viable_hands'] = len(data_frame)
@@ -2659,14 +2932,13 @@ class LadbrooksPokerHandProcessor:
                     sum_results_position_flop[row['position']] += row['hand_result'] / row['bb_stake']
             sum_results += row['hand_result'] / row['bb_stake']
 
-        three_bet_data['Num_three_bets_position'] = {pos: round(value, 2) for pos, value in num_position_values.items()}
-        three_bet_data['Num_three_bet_wins'] = round(num_three_bet_wins, 2)
-        three_bet_data['Num_three_bet_wins_position'] = {pos: round(value, 2) for pos, value in num_three_bet_wins_position.items()}
-        three_bet_data['Sum_results_BB'] = round(sum_results, 2)
-        three_bet_data['Avg_result_BB'] = round(sum_results / len(filtered_df), 2) if len(filtered_df) > 0 else 0
-        three_bet_data['Sum_results_position_BB'] = {pos: round(value, 2) for pos, value in sum_results_position.items()}
-        three_bet_data['Sum_results_position_no_flop_BB'] = {pos: round(value, 2) for pos, value in sum_results_position_no_flop.items()}
-        three_bet_data['Sum_results_position_flop_BB'] = {pos: round(value, 2) for pos, value in sum_results_position_flop.items()}
+        three_bet_data['Num_three_bets_position'] = num_position_values
+        three_bet_data['Num_three_bet_wins'] = num_three_bet_wins
+        three_bet_data['Num_three_bet_wins_position'] = num_three_bet_wins_position
+        three_bet_data['Sum_results_BB'] = sum_results
+        three_bet_data['Sum_results_position_BB'] = sum_results_position
+        three_bet_data['Sum_results_position_no_flop_BB'] = sum_results_position_no_flop
+        three_bet_data['Sum_results_position_flop_BB'] = sum_results_position_flop
 
         # Three-bet opportunities and responses
         hero_positions = ['UTG', 'MP', 'CO', 'BTN', 'SB', 'BB']
@@ -2688,9 +2960,8 @@ class LadbrooksPokerHandProcessor:
         }
 
         for _, row in data_frame.iterrows():
-            raw_hand = row.get('Raw Hand', '')
             hero_pos = row.get('position')
-            actions = self._parse_preflop_actions(raw_hand)
+            actions = self._preflop_actions(row)
             if not actions:
                 if row.get('had_3bet_opportunity'):
                     hero_3bet_opps += 1
@@ -2722,7 +2993,7 @@ class LadbrooksPokerHandProcessor:
                 by_hero_position[hero_pos]['opportunities'] += 1
             hero_3bet_opps += 1
 
-            position_map = self._position_map_from_hand(raw_hand)
+            position_map = self._position_map(row)
             opener_pos = position_map.get(opener_name)
             if opener_pos in by_opener_position:
                 by_opener_position[opener_pos]['opportunities'] += 1
@@ -2803,6 +3074,24 @@ class LadbrooksPokerHandProcessor:
         three_bet_data['by_hero_position'] = by_hero_position
         three_bet_data['by_opener_position'] = by_opener_position
         three_bet_data['branch_ev'] = branch_ev
+        return three_bet_data
+
+    def three_bet_from_tally(self, tally):
+        three_bet_data = {
+            'Viable_hands': tally['Viable_hands'],
+            'Num_three_bets': tally['Num_three_bets'],
+            'Num_three_bets_position': {pos: round(value, 2) for pos, value in tally['Num_three_bets_position'].items()},
+            'Num_three_bet_wins': round(tally['Num_three_bet_wins'], 2),
+            'Num_three_bet_wins_position': {pos: round(value, 2) for pos, value in tally['Num_three_bet_wins_position'].items()},
+            'Sum_results_BB': round(tally['Sum_results_BB'], 2),
+            'Avg_result_BB': round(tally['Sum_results_BB'] / tally['Num_three_bets'], 2) if tally['Num_three_bets'] > 0 else 0,
+        }
+        for key in ('Sum_results_position_BB', 'Sum_results_position_no_flop_BB', 'Sum_results_position_flop_BB'):
+            three_bet_data[key] = {pos: round(value, 2) for pos, value in tally[key].items()}
+        for key in ('hero_3bet_opportunities', 'villain_fold_vs_hero_3bet', 'villain_call_vs_hero_3bet',
+                    'villain_4bet_vs_hero_3bet', 'by_hero_position', 'by_opener_position', 'branch_ev'):
+            three_bet_data[key] = tally[key]
+        branch_ev = tally['branch_ev']
 
         # Standardized helpers (single source of truth)
         # Denominators:
@@ -2810,12 +3099,12 @@ class LadbrooksPokerHandProcessor:
         # - hero_3bet_count: hands where Hero 3-bet
         # - response counts are vs Hero 3-bet (fold/call/raise)
         three_bet_data['standardized'] = {
-            'facing_open_opportunities': hero_3bet_opps,
+            'facing_open_opportunities': tally['hero_3bet_opportunities'],
             'hero_3bet_count': three_bet_data['Num_three_bets'],
             'villain_response': {
-                'fold': villain_fold_vs_3bet,
-                'call': villain_call_vs_3bet,
-                'raise': villain_4bet_vs_3bet
+                'fold': tally['villain_fold_vs_hero_3bet'],
+                'call': tally['villain_call_vs_hero_3bet'],
+                'raise': tally['villain_4bet_vs_hero_3bet']
             },
             'branch_ev': {
                 'fold': {'count': branch_ev['fold']['count'], 'ev_bb': branch_ev['fold']['ev_bb']},
@@ -2832,6 +3121,10 @@ class LadbrooksPokerHandProcessor:
         return three_bet_data
 
     def get_four_bet_metrics(self, data_frame):
+        return self.four_bet_from_tally(self.four_bet_tally(data_frame))
+
+    def four_bet_tally(self, data_frame):
+        """Counts and unrounded BB sums behind Four bet info"""
         four_bet_data = {}
         position_values = {'MP': 0, 'CO': 0, 'BTN': 0, 'SB': 0, 'BB': 0}
         four_bet_data['Viable_hands'] = len(data_frame)
@@ -2864,14 +3157,13 @@ class LadbrooksPokerHandProcessor:
                     sum_results_position_flop[row['position']] += row['hand_result'] / row['bb_stake']
             sum_results += row['hand_result'] / row['bb_stake']
 
-        four_bet_data['Num_four_bets_position'] = {pos: round(value, 2) for pos, value in num_position_values.items()}
-        four_bet_data['Num_four_bet_wins'] = round(num_four_bet_wins, 2)
-        four_bet_data['Num_four_bet_wins_position'] = {pos: round(value, 2) for pos, value in num_four_bet_wins_position.items()}
-        four_bet_data['Sum_results_BB'] = round(sum_results, 2)
-        four_bet_data['Avg_result_BB'] = round(sum_results / len(filtered_df), 2) if len(filtered_df) > 0 else 0
-        four_bet_data['Sum_results_position_BB'] = {pos: round(value, 2) for pos, value in sum_results_position.items()}
-        four_bet_data['Sum_results_position_no_flop_BB'] = {pos: round(value, 2) for pos, value in sum_results_position_no_flop.items()}
-        four_bet_data['Sum_results_position_flop_BB'] = {pos: round(value, 2) for pos, value in sum_results_position_flop.items()}
+        four_bet_data['Num_four_bets_position'] = num_position_values
+        four_bet_data['Num_four_bet_wins'] = num_four_bet_wins
+        four_bet_data['Num_four_bet_wins_position'] = num_four_bet_wins_position
+        four_bet_data['Sum_results_BB'] = sum_results
+        four_bet_data['Sum_results_position_BB'] = sum_results_position
+        four_bet_data['Sum_results_position_no_flop_BB'] = sum_results_position_no_flop
+        four_bet_data['Sum_results_position_flop_BB'] = sum_results_position_flop
 
         # Four-bet opportunities and responses
         hero_positions = ['UTG', 'MP', 'CO', 'BTN', 'SB', 'BB']
@@ -2894,8 +3186,7 @@ class LadbrooksPokerHandProcessor:
         }
 
         for _, row in data_frame.iterrows():
-            raw_hand = row.get('Raw Hand', '')
-            actions = self._parse_preflop_actions(raw_hand)
+            actions = self._preflop_actions(row)
             hero_pos = row.get('position')
             if not actions:
                 if row.get('had_4bet_opportunity'):
@@ -2949,7 +3240,7 @@ class LadbrooksPokerHandProcessor:
                 by_hero_position[hero_pos]['opportunities'] += 1
             hero_4bet_opps += 1
 
-            position_map = self._position_map_from_hand(raw_hand)
+            position_map = self._position_map(row)
             three_bettor_pos = position_map.get(three_bettor)
             if three_bettor_pos in by_three_bettor_position:
                 by_three_bettor_position[three_bettor_pos]['opportunities'] += 1
@@ -3004,7 +3295,9 @@ class LadbrooksPokerHandProcessor:
                     by_three_bettor_position[three_bettor_pos]['villain_5bet'] += 1
                     by_three_bettor_position[three_bettor_pos]['ev_bb'] += ev_bb
 
-                if any('all in' in txt for _, _, txt in post_hero_actions):
+                preflop = self._street_actions(row).get('preflop', [])
+                if any(actor != 'Hero' and action_type == 'all_in'
+                       for actor, action_type, _ in preflop[hero_action_idx + 1:]):
                     villain_5bet_jam_vs_4bet += 1
                     if hero_pos in by_hero_position:
                         by_hero_position[hero_pos]['villain_5bet_jam'] += 1
@@ -3030,6 +3323,25 @@ class LadbrooksPokerHandProcessor:
         four_bet_data['by_hero_position'] = by_hero_position
         four_bet_data['by_three_bettor_position'] = by_three_bettor_position
         four_bet_data['branch_ev'] = branch_ev
+        return four_bet_data
+
+    def four_bet_from_tally(self, tally):
+        four_bet_data = {
+            'Viable_hands': tally['Viable_hands'],
+            'Num_four_bets': tally['Num_four_bets'],
+            'Num_four_bets_position': {pos: round(value, 2) for pos, value in tally['Num_four_bets_position'].items()},
+            'Num_four_bet_wins': round(tally['Num_four_bet_wins'], 2),
+            'Num_four_bet_wins_position': {pos: round(value, 2) for pos, value in tally['Num_four_bet_wins_position'].items()},
+            'Sum_results_BB': round(tally['Sum_results_BB'], 2),
+            'Avg_result_BB': round(tally['Sum_results_BB'] / tally['Num_four_bets'], 2) if tally['Num_four_bets'] > 0 else 0,
+        }
+        for key in ('Sum_results_position_BB', 'Sum_results_position_no_flop_BB', 'Sum_results_position_flop_BB'):
+            four_bet_data[key] = {pos: round(value, 2) for pos, value in tally[key].items()}
+        for key in ('hero_4bet_opportunities', 'villain_fold_vs_hero_4bet', 'villain_call_vs_hero_4bet',
+                    'villain_5bet_vs_hero_4bet', 'villain_5bet_jam_vs_hero_4bet', 'by_hero_position',
+                    'by_three_bettor_position', 'branch_ev'):
+            four_bet_data[key] = tally[key]
+        branch_ev = tally['branch_ev']
 
         # Standardized helpers (single source of truth)
         # Denominators:
@@ -3037,15 +3349,15 @@ class LadbrooksPokerHandProcessor:
         # - hero_4bet_count: hands where Hero 4-bet
         # - response counts are vs Hero 4-bet (fold/call/raise)
         four_bet_data['standardized'] = {
-            'facing_3bet_opportunities': hero_4bet_opps,
+            'facing_3bet_opportunities': tally['hero_4bet_opportunities'],
             'hero_4bet_count': four_bet_data['Num_four_bets'],
             'villain_response': {
-                'fold': villain_fold_vs_4bet,
-                'call': villain_call_vs_4bet,
-                'raise': villain_5bet_vs_4bet
+                'fold': tally['villain_fold_vs_hero_4bet'],
+                'call': tally['villain_call_vs_hero_4bet'],
+                'raise': tally['villain_5bet_vs_hero_4bet']
             },
             'villain_raise_subtype': {
-                'jam': villain_5bet_jam_vs_4bet
+                'jam': tally['villain_5bet_jam_vs_hero_4bet']
             },
             'branch_ev': {
                 'fold': {'count': branch_ev['fold']['count'], 'ev_bb': branch_ev['fold']['ev_bb']},
@@ -3067,6 +3379,10 @@ class LadbrooksPokerHandProcessor:
         Iso-raise = Hero raises after someone limped (to isolate limpers).
         Detection: Check if someone called (limped) before Hero raised.
         """
+        return self.iso_raise_from_tally(self.iso_raise_tally(dataframe))
+
+    def iso_raise_tally(self, dataframe):
+        """Counts and unrounded BB sums behind Iso Raise info"""
         iso_raise_data = {}
         position_values = {'MP': 0, 'CO': 0, 'BTN': 0, 'SB': 0, 'BB': 0}
         
@@ -3096,67 +3412,21 @@ class LadbrooksPokerHandProcessor:
             
             # Check if there was a limp (call) before Hero's action
             # An iso-raise is when Hero raises after someone limped (called BB)
-            raw_hand = row.get('Raw Hand', '')
             is_iso_raise = False
-            
-            if raw_hand and isinstance(raw_hand, str):
-                # Extract preflop action section
-                try:
-                    if "** Dealing down cards **" in raw_hand:
-                        if "** Dealing Flop **" in raw_hand:
-                            preflop_section = raw_hand.split("** Dealing down cards **")[1].split("** Dealing Flop **")[0]
-                        elif "** Summary **" in raw_hand:
-                            preflop_section = raw_hand.split("** Dealing down cards **")[1].split("** Summary **")[0]
-                        else:
-                            preflop_section = ""
-                    else:
-                        preflop_section = ""
-                    
-                    # Parse action sequence to detect iso-raise
-                    # Iso-raise = call(s) before Hero, then Hero raises (no raise before Hero)
-                    action_sequence = []
-                    
-                    for line in preflop_section.split('\n'):
-                        line = line.strip()
-                        if not line:
-                            continue
-                        
-                        # Skip blind postings and dealing cards
-                        if 'posts' in line.lower() and ('small blind' in line.lower() or 'big blind' in line.lower()):
-                            continue
-                        if 'dealing' in line.lower() or 'dealt' in line.lower():
-                            continue
-                        
-                        # Track actions before Hero
-                        if 'Hero' not in line:
-                            if 'calls' in line.lower():
-                                action_sequence.append('call')
-                            elif 'raises' in line.lower():
-                                action_sequence.append('raise')
-                            elif 'folds' in line.lower():
-                                action_sequence.append('fold')
-                        else:
-                            # Hero's action
-                            if 'raises' in line.lower():
-                                # Check if there were calls (limps) before Hero and no raises
-                                if 'call' in action_sequence and 'raise' not in action_sequence:
-                                    is_iso_raise = True
-                            break  # Stop after Hero's first action
-                
-                except Exception:
-                    pass
-            
+            action_sequence = []
+            for player, kind, _ in self._preflop_actions(row):
+                if player != 'Hero':
+                    action_sequence.append(kind)
+                    continue
+                if kind == 'raise' and 'call' in action_sequence and 'raise' not in action_sequence:
+                    is_iso_raise = True
+                break  # Stop after Hero's first action
+
             # If we found a limp before Hero RFI'd, it's an iso-raise
             if is_iso_raise and hero_rfi and position in position_values:
                 iso_raise_hands.append(row)
         
-        # Create filtered dataframe
-        if iso_raise_hands:
-            filtered_df = pd.DataFrame(iso_raise_hands)
-        else:
-            filtered_df = pd.DataFrame()
-        
-        iso_raise_data['Num_iso_raises'] = len(filtered_df)
+        iso_raise_data['Num_iso_raises'] = len(iso_raise_hands)
         
         num_position_values = position_values.copy()
         num_iso_raise_wins = 0
@@ -3166,7 +3436,7 @@ class LadbrooksPokerHandProcessor:
         sum_results_position_no_flop = position_values.copy()
         sum_results_position_flop = position_values.copy()
         
-        for _, row in filtered_df.iterrows():
+        for row in iso_raise_hands:
             if row['position'] in num_position_values:
                 num_position_values[row['position']] += 1
                 bb_result = row['hand_result'] / row['bb_stake']
@@ -3180,22 +3450,40 @@ class LadbrooksPokerHandProcessor:
                     sum_results_position_flop[row['position']] += bb_result
             sum_results += row['hand_result'] / row['bb_stake']
         
-        iso_raise_data['Num_iso_raises_position'] = {pos: int(value) for pos, value in num_position_values.items()}
-        iso_raise_data['Num_iso_raise_wins'] = int(num_iso_raise_wins)
-        iso_raise_data['Num_iso_raise_wins_position'] = {pos: int(value) for pos, value in num_iso_raise_wins_position.items()}
-        iso_raise_data['Sum_results_BB'] = round(sum_results, 2)
-        iso_raise_data['Avg_result_BB'] = round(sum_results / len(filtered_df), 2) if len(filtered_df) > 0 else 0
-        iso_raise_data['Sum_results_position_BB'] = {pos: round(value, 2) for pos, value in sum_results_position.items()}
-        iso_raise_data['Sum_results_position_no_flop_BB'] = {pos: round(value, 2) for pos, value in sum_results_position_no_flop.items()}
-        iso_raise_data['Sum_results_position_flop_BB'] = {pos: round(value, 2) for pos, value in sum_results_position_flop.items()}
-        
+        iso_raise_data['Num_iso_raises_position'] = num_position_values
+        iso_raise_data['Num_iso_raise_wins'] = num_iso_raise_wins
+        iso_raise_data['Num_iso_raise_wins_position'] = num_iso_raise_wins_position
+        iso_raise_data['Sum_results_BB'] = sum_results
+        iso_raise_data['Sum_results_position_BB'] = sum_results_position
+        iso_raise_data['Sum_results_position_no_flop_BB'] = sum_results_position_no_flop
+        iso_raise_data['Sum_results_position_flop_BB'] = sum_results_position_flop
+        return iso_raise_data
+
+    def iso_raise_from_tally(self, tally):
+        iso_raise_data = {
+            'Viable_hands': tally['Viable_hands'],
+            'Num_iso_raises': tally['Num_iso_raises'],
+            'Num_iso_raises_position': {pos: int(value) for pos, value in tally['Num_iso_raises_position'].items()},
+            'Num_iso_raise_wins': int(tally['Num_iso_raise_wins']),
+            'Num_iso_raise_wins_position': {pos: int(value) for pos, value in tally['Num_iso_raise_wins_position'].items()},
+            'Sum_results_BB': round(tally['Sum_results_BB'], 2),
+            'Avg_result_BB': round(tally['Sum_results_BB'] / tally['Num_iso_raises'], 2) if tally['Num_iso_raises'] > 0 else 0,
+        }
+        for key in ('Sum_results_position_BB', 'Sum_results_position_no_flop_BB', 'Sum_results_position_flop_BB'):
+            iso_raise_data[key] = {pos: round(value, 2) for pos, value in tally[key].items()}
         return iso_raise_data
 
     def calculate_in_position_percentage(self, dataframe):
+        return self.in_position_from_tally(self.in_position_tally(dataframe))
+
+    def in_position_tally(self, dataframe):
+        """Heads-up flops, and how many of them Hero played in position"""
         hu_flop_df = dataframe[dataframe['flop_HU_with_hero'] == True]
-        total_hands = len(hu_flop_df)
-        in_position_hands = hu_flop_df['flop_Position'].sum()
-        in_position_percentage = (in_position_hands / total_hands) * 100 if total_hands > 0 else 0
+        return {'hands': len(hu_flop_df), 'in_position_hands': int(hu_flop_df['flop_Position'].sum())}
+
+    def in_position_from_tally(self, tally):
+        total_hands = tally['hands']
+        in_position_percentage = (tally['in_position_hands'] / total_hands) * 100 if total_hands > 0 else 0
         return round(in_position_percentage, 2), (100-round(in_position_percentage, 2))
 
     def process_op_bet_rates(self, op_reaction_counts):
@@ -3273,6 +3561,10 @@ class LadbrooksPokerHandProcessor:
 
 
     def calculate_bet_rates(self, dataframe, street):
+        return self.bet_rates_from_tally(self.bet_rates_tally(dataframe, street), street)
+
+    def bet_rates_tally(self, dataframe, street):
+        """How often each reaction came up in heads-up pots on a street, with Hero out of and in position"""
         street_column = 'flop_Position'
         street_op_column = f'{street.lower()}_OP'
         street_ip_column = f'{street.lower()}_IP'
@@ -3404,10 +3696,13 @@ class LadbrooksPokerHandProcessor:
                     elif ip_first_action == 'folds':
                         ip_reaction_counts['fold_to_donk'] += 1
 
+        return {'op': op_reaction_counts, 'ip': ip_reaction_counts}
+
+    def bet_rates_from_tally(self, tally, street):
         Hero_op_action, Villain_ip_action, Hero_op_vs_cbet, Villain_ip_vs_checkraise, Villain_ip_vs_donk = self.process_op_bet_rates(
-             op_reaction_counts)
+             tally['op'])
         Villain_op_action, Hero_ip_action, Villain_op_vs_cbet, Hero_ip_vs_checkraise, Hero_ip_vs_donk = self.process_ip_reaction(
-            ip_reaction_counts)
+            tally['ip'])
 
         return {
             f'{street}_Hero_op_action': Hero_op_action,
@@ -3422,188 +3717,12 @@ class LadbrooksPokerHandProcessor:
             f'{street}_Hero_ip_vs_donk': Hero_ip_vs_donk
         }
 
-    def _extract_hero_actions_from_raw_hand(self, raw_hand, street):
-        """Extract Hero's actions from raw hand history for a given street (for multiway pots)"""
-        hero_actions = []
-        
-        try:
-            # Find the street section
-            street_markers = {
-                'flop': '** Dealing Flop **',
-                'turn': '** Dealing Turn **',
-                'river': '** Dealing River **'
-            }
-            
-            next_street_markers = {
-                'flop': '** Dealing Turn **',
-                'turn': '** Dealing River **',
-                'river': '** Summary **'
-            }
-            
-            street_marker = street_markers.get(street)
-            next_marker = next_street_markers.get(street)
-            
-            if not street_marker or street_marker not in raw_hand:
-                return hero_actions
-            
-            # Extract the section between this street and the next
-            start_idx = raw_hand.find(street_marker)
-            if start_idx == -1:
-                return hero_actions
-            
-            # Find the end of this street's action
-            end_idx = raw_hand.find(next_marker, start_idx)
-            if end_idx == -1:
-                end_idx = raw_hand.find('** Summary **', start_idx)
-            
-            if end_idx == -1:
-                return hero_actions
-            
-            street_section = raw_hand[start_idx:end_idx]
-            
-            # Parse lines looking for Hero's actions
-            # Be more flexible - look for "Hero" anywhere in the line, not just at the start
-            for line in street_section.split('\n'):
-                line = line.strip()
-                # Skip empty lines, headers, and board card lines (which contain ':')
-                if not line or line.startswith('**'):
-                    continue
-                
-                # Skip board card lines (they have format like "** Dealing Flop ** :  [ Qd, 4d, 8c ]")
-                if ':' in line and ('[' in line or 'Dealing' in line):
-                    continue
-                
-                # Skip lines that contain "Dealing" (these are the header lines)
-                if 'Dealing' in line:
-                    continue
-                
-                # Check if this line contains Hero's action
-                # Look for "Hero" anywhere in the line (with word boundaries to avoid false matches)
-                # Format examples from sample:
-                # "Hero checks"
-                # "Hero bets (0.75)"
-                # "Hero calls (2.18)"
-                # "Hero folds"
-                # "Hero raises 20.26 to 20.26"
-                # "Hero is all-In"
-                # Also handle: "Player1 checks", "Hero checks" (Hero might not be first word)
-                
-                # Use word boundary to match "Hero" as a whole word (not part of another word)
-                # Try multiple patterns to catch different formats
-                hero_match = None
-                
-                # Pattern 1: "Hero " at start of line (most common)
-                if line.startswith('Hero '):
-                    hero_match = re.search(r'Hero\s+(\w+)', line, re.IGNORECASE)
-                # Pattern 2: "Hero " anywhere in line (for cases where there's whitespace before)
-                elif re.search(r'\bHero\s+', line, re.IGNORECASE):
-                    hero_match = re.search(r'\bHero\s+(\w+)', line, re.IGNORECASE)
-                
-                if hero_match:
-                    potential_action = hero_match.group(1).lower()
-                    
-                    # Check if it's a valid action word
-                    valid_actions = ['bet', 'bets', 'check', 'checks', 'call', 'calls', 'fold', 'folds', 'raise', 'raises', 'is']
-                    if potential_action in valid_actions:
-                        # Handle "Hero is all-In" case
-                        if potential_action == 'is' and 'all-in' in line.lower():
-                            # This is a bet or raise (all-in)
-                            # Check if there's a "raises" earlier in the line
-                            if 'raise' in line.lower():
-                                action_type = 'raise'
-                            else:
-                                action_type = 'bet'
-                            amount = 0.0  # All-in amount would be in previous action or summary
-                            hero_actions.append([action_type, amount])
-                        elif potential_action in ['bet', 'bets', 'check', 'checks', 'call', 'calls', 'fold', 'folds', 'raise', 'raises']:
-                            action_type = potential_action.rstrip('s')  # Remove plural 's' if present
-                            amount = 0.0
-                            
-                            # Try to extract amount from various formats
-                            # Format 1: "Hero bets (2.50)" or "Hero calls (1.00)"
-                            amount_match = re.search(r'\(([\d.]+)\)', line)
-                            if amount_match:
-                                try:
-                                    amount = float(amount_match.group(1))
-                                except:
-                                    amount = 0.0
-                            else:
-                                # Format 2: "Hero raises 1.00 to 2.00"
-                                raise_to_match = re.search(r'raises?\s+([\d.]+)\s+to\s+([\d.]+)', line, re.IGNORECASE)
-                                if raise_to_match:
-                                    try:
-                                        # Use the "to" amount (final bet size)
-                                        amount = float(raise_to_match.group(2))
-                                    except:
-                                        amount = 0.0
-                            
-                            hero_actions.append([action_type, amount])
-        
-        except Exception as e:
-            # If parsing fails, return empty list
-            pass
-        
-        return hero_actions
-
-    def _determine_position_from_raw_hand(self, raw_hand, street):
-        """Determine if Hero is IP or OOP from raw hand history by checking who acts FIRST on the street.
-        This is based STRICTLY on action order AFTER the board cards are dealt, not preflop position.
-        Returns True if Hero is IP (acts after at least one opponent), False if OOP (acts first), None if can't determine."""
-        try:
-            street_markers = {
-                'flop': '** Dealing Flop **',
-                'turn': '** Dealing Turn **',
-                'river': '** Dealing River **'
-            }
-            
-            next_street_markers = {
-                'flop': '** Dealing Turn **',
-                'turn': '** Dealing River **',
-                'river': '** Summary **'
-            }
-            
-            street_marker = street_markers.get(street)
-            next_marker = next_street_markers.get(street)
-            
-            if not street_marker or street_marker not in raw_hand:
-                return None
-            
-            start_idx = raw_hand.find(street_marker)
-            if start_idx == -1:
-                return None
-            
-            end_idx = raw_hand.find(next_marker, start_idx)
-            if end_idx == -1:
-                end_idx = raw_hand.find('** Summary **', start_idx)
-            
-            if end_idx == -1:
-                return None
-            
-            street_section = raw_hand[start_idx:end_idx]
-            
-            # Find the first ACTION line (skip board card lines which contain ':')
-            # Look for the first line that contains a player action (bet, check, call, fold, raise)
-            for line in street_section.split('\n'):
-                line = line.strip()
-                # Skip empty lines, headers, and board card lines (which contain ':')
-                if not line or line.startswith('**') or ':' in line:
-                    continue
-                
-                # This should be an action line - check who acts first
-                # Format: "PlayerName action" or "Hero action"
-                if line.startswith('Hero '):
-                    # Hero acts first on this street = OOP
-                    return False
-                elif line and not line.startswith('**'):
-                    # Someone else acts before Hero = Hero is IP (acts after at least one opponent)
-                    return True
-            
-            return None
-        except:
-            return None
-
     def calculate_hand_matrix_analysis(self, dataframe):
         """Calculate hand matrix analysis - grouped by Pairs, Suited, Offsuit"""
+        return self.hand_matrix_from_tally(self.hand_matrix_tally(dataframe))
+
+    def hand_matrix_tally(self, dataframe):
+        """Hands and unrounded BB earnings of every starting hand, before averaging"""
         analysis = {
             'Pairs': {},
             'Suited': {},
@@ -3670,27 +3789,27 @@ class LadbrooksPokerHandProcessor:
             analysis[hand_type][combo]['total_bb_earnings'] += bb_earnings
             analysis[hand_type][combo]['combos'][suit_combo]['total_hands'] += 1
             analysis[hand_type][combo]['combos'][suit_combo]['total_bb_earnings'] += bb_earnings
-        
-        # Calculate averages
+
+        return analysis
+
+    def hand_matrix_from_tally(self, analysis):
         for hand_type in analysis:
+            self._average_bb_earnings(analysis[hand_type])
+            # Averages for individual suit combos too
             for combo in analysis[hand_type]:
-                if analysis[hand_type][combo]['total_hands'] > 0:
-                    analysis[hand_type][combo]['avg_bb_per_hand'] = round(
-                        analysis[hand_type][combo]['total_bb_earnings'] / analysis[hand_type][combo]['total_hands'], 2
-                    )
-                    analysis[hand_type][combo]['total_bb_earnings'] = round(analysis[hand_type][combo]['total_bb_earnings'], 2)
-                
-                # Calculate averages for individual suit combos
-                for suit_combo in analysis[hand_type][combo]['combos']:
-                    suit_data = analysis[hand_type][combo]['combos'][suit_combo]
-                    if suit_data['total_hands'] > 0:
-                        suit_data['avg_bb_per_hand'] = round(
-                            suit_data['total_bb_earnings'] / suit_data['total_hands'], 2
-                        )
-                        suit_data['total_bb_earnings'] = round(suit_data['total_bb_earnings'], 2)
-        
+                self._average_bb_earnings(analysis[hand_type][combo]['combos'])
         return analysis
 
+    def _average_bb_earnings(self, groups):
+        """Fill in each group's BB per hand from its tallied totals, then round the totals"""
+        for data in groups.values():
+            if data['total_hands'] > 0:
+                data['avg_bb_per_hand'] = round(data['total_bb_earnings'] / data['total_hands'], 2)
+                data['total_bb_earnings'] = round(data['total_bb_earnings'], 2)
+                if 'total_earnings' in data:
+                    data['total_earnings'] = round(data['total_earnings'], 2)
+        return groups
+
     def calculate_action_matrix_analysis(self, dataframe, action_key, total_key):
         """Calculate hand matrix counts for a specific preflop action."""
         analysis = {}
@@ -3747,6 +3866,10 @@ class LadbrooksPokerHandProcessor:
         return analysis
 
     def calculate_ip_op_profitability(self, dataframe):
+        return self.ip_op_profitability_from_tally(self.ip_op_profitability_tally(dataframe))
+
+    def ip_op_profitability_tally(self, dataframe):
+        """Unrounded BB results of heads-up flops"""
         ip_profitability = 0
         op_profitability = 0
 
@@ -3758,7 +3881,10 @@ class LadbrooksPokerHandProcessor:
             else:  # In Position
                 ip_profitability += row['hand_result'] / row['bb_stake']
 
-        return round(ip_profitability, 2), round(op_profitability, 2)
+        return {'ip': ip_profitability, 'op': op_profitability}
+
+    def ip_op_profitability_from_tally(self, tally):
+        return round(tally['ip'], 2), round(tally['op'], 2)
 
     def _parse_card_rank(self, card_str):
         """Parse card string (e.g., 'As', 'Kd', 'Qh') and return rank value (A=14, K=13, Q=12, J=11, T=10, 9-2)"""
@@ -3776,102 +3902,6 @@ class LadbrooksPokerHandProcessor:
         except ValueError:
             return 0
 
-    def _get_board_cards_from_raw_hand(self, raw_hand):
-        """Extract board cards from raw hand history - improved version"""
-        board_cards = []
-        if not raw_hand or not isinstance(raw_hand, str):
-            return board_cards
-        
-        # Try to find all board cards by looking for the pattern in the summary section
-        # Summary often has the complete board: "Board: [ Qd, 4d, 8c, 2h, 9s ]"
-        if '** Summary **' in raw_hand:
-            summary = raw_hand.split('** Summary **')[1]
-            # Look for "Board:" pattern
-            board_match = re.search(r'Board[:\s]+\[([^\]]+)\]', summary, re.IGNORECASE)
-            if board_match:
-                cards_str = board_match.group(1)
-                cards = [c.strip() for c in cards_str.split(',') if c.strip()]
-                if len(cards) >= 3:
-                    return cards[:5]  # Return up to 5 cards (flop + turn + river)
-        
-        # Method 1: Extract flop cards
-        if '** Dealing Flop **' in raw_hand:
-            flop_section = raw_hand.split('** Dealing Flop **')[1]
-            if '** Dealing Turn **' in flop_section:
-                flop_section = flop_section.split('** Dealing Turn **')[0]
-            elif '** Summary **' in flop_section:
-                flop_section = flop_section.split('** Summary **')[0]
-            
-            # Look for pattern like "[ Qd, 4d, 8c ]" or ": [ Qd, 4d, 8c ]" or "** Dealing Flop ** : [ Qd, 4d, 8c ]"
-            patterns = [
-                r':\s*\[([^\]]+)\]',  # ": [ cards ]"
-                r'\[([^\]]+)\]',      # "[ cards ]"
-            ]
-            
-            for pattern in patterns:
-                flop_match = re.search(pattern, flop_section, re.MULTILINE | re.DOTALL)
-                if flop_match:
-                    cards_str = flop_match.group(1)
-                    cards = [c.strip() for c in cards_str.split(',') if c.strip()]
-                    if len(cards) >= 3:
-                        board_cards.extend(cards[:3])  # Flop has 3 cards
-                        break
-        
-        # Method 2: Extract turn card (4th card total)
-        if '** Dealing Turn **' in raw_hand:
-            turn_section = raw_hand.split('** Dealing Turn **')[1]
-            if '** Dealing River **' in turn_section:
-                turn_section = turn_section.split('** Dealing River **')[0]
-            elif '** Summary **' in turn_section:
-                turn_section = turn_section.split('** Summary **')[0]
-            
-            # Look for all cards up to turn (should be 4 cards total)
-            patterns = [
-                r':\s*\[([^\]]+)\]',  # ": [ cards ]"
-                r'\[([^\]]+)\]',      # "[ cards ]"
-            ]
-            
-            for pattern in patterns:
-                turn_match = re.search(pattern, turn_section, re.MULTILINE | re.DOTALL)
-                if turn_match:
-                    cards_str = turn_match.group(1)
-                    cards = [c.strip() for c in cards_str.split(',') if c.strip()]
-                    if len(cards) >= 4:
-                        if len(board_cards) < 3:
-                            # If we don't have flop cards yet, get all 4
-                            board_cards = cards[:4]
-                        else:
-                            # We have flop, just add turn (4th card)
-                            board_cards.append(cards[3])
-                        break
-        
-        # Method 3: Extract river card (5th card total)
-        if '** Dealing River **' in raw_hand:
-            river_section = raw_hand.split('** Dealing River **')[1]
-            if '** Summary **' in river_section:
-                river_section = river_section.split('** Summary **')[0]
-            
-            patterns = [
-                r':\s*\[([^\]]+)\]',  # ": [ cards ]"
-                r'\[([^\]]+)\]',      # "[ cards ]"
-            ]
-            
-            for pattern in patterns:
-                river_match = re.search(pattern, river_section, re.MULTILINE | re.DOTALL)
-                if river_match:
-                    cards_str = river_match.group(1)
-                    cards = [c.strip() for c in cards_str.split(',') if c.strip()]
-                    if len(cards) >= 5:
-                        if len(board_cards) < 4:
-                            # If we don't have all cards yet, get all 5
-                            board_cards = cards[:5]
-                        else:
-                            # We have flop+turn, just add river (5th card)
-                            board_cards.append(cards[4])
-                        break
-        
-        return board_cards
-
     def _get_street_cards(self, row, street):
         """Get cards for a specific street (flop, turn, river)"""
         cards = []
@@ -3913,11 +3943,10 @@ class LadbrooksPokerHandProcessor:
                         if len(all_cards) >= 5:
                             cards = [all_cards[4]]
         
-        # Fallback to raw hand parsing
+        # Fallback to the whole board
         if not cards:
-            raw_hand = row.get('Raw Hand', '')
-            if raw_hand:
-                board_cards = self._get_board_cards_from_raw_hand(raw_hand)
+            board_cards = self._board_cards(row)
+            if board_cards:
                 if street == 'flop' and len(board_cards) >= 3:
                     cards = board_cards[:3]
                 elif street == 'turn' and len(board_cards) >= 4:
@@ -3929,6 +3958,10 @@ class LadbrooksPokerHandProcessor:
 
     def calculate_street_high_card_analysis(self, dataframe, street):
         """Calculate high card analysis for a specific street (flop, turn, river)"""
+        return self._average_bb_earnings(self.street_high_card_tally(dataframe, street))
+
+    def street_high_card_tally(self, dataframe, street):
+        """Hands and unrounded BB earnings by the street's highest card, before averaging"""
         analysis = {}
         
         # Filter to hands that reached this street - check multiple sources
@@ -3950,20 +3983,8 @@ class LadbrooksPokerHandProcessor:
         elif street == 'river' and 'river_HU_with_hero' in dataframe.columns:
             street_mask = street_mask | (dataframe['river_HU_with_hero'] == True)
         
-        # Method 4: Check Raw Hand for street markers (most reliable)
-        def has_street_in_raw_hand(raw_hand, street_name):
-            if not raw_hand or not isinstance(raw_hand, str):
-                return False
-            if street_name == 'flop':
-                return '** Dealing Flop **' in raw_hand
-            elif street_name == 'turn':
-                return '** Dealing Turn **' in raw_hand
-            elif street_name == 'river':
-                return '** Dealing River **' in raw_hand
-            return False
-        
-        if 'Raw Hand' in dataframe.columns:
-            street_mask = street_mask | dataframe['Raw Hand'].apply(lambda x: has_street_in_raw_hand(x, street))
+        # Method 4: Check which streets the hand was dealt (most reliable)
+        street_mask = street_mask | self._street_dealt_mask(dataframe, street)
         
         street_df = dataframe[street_mask].copy()
         
@@ -3971,19 +3992,6 @@ class LadbrooksPokerHandProcessor:
         
         for _, row in street_df.iterrows():
             cards = self._get_street_cards(row, street)
-            
-            # If we couldn't get cards from structured data, try raw hand parsing
-            if not cards:
-                raw_hand = row.get('Raw Hand', '')
-                if raw_hand:
-                    board_cards = self._get_board_cards_from_raw_hand(raw_hand)
-                    if street == 'flop' and len(board_cards) >= 3:
-                        cards = board_cards[:3]
-                    elif street == 'turn' and len(board_cards) >= 4:
-                        cards = [board_cards[3]]
-                    elif street == 'river' and len(board_cards) >= 5:
-                        cards = [board_cards[4]]
-            
             if not cards:
                 continue
             
@@ -4009,19 +4017,15 @@ class LadbrooksPokerHandProcessor:
             bb_earnings = row['hand_result'] / row['bb_stake']
             analysis[high_card_label]['total_hands'] += 1
             analysis[high_card_label]['total_bb_earnings'] += bb_earnings
-        
-        # Calculate averages
-        for label in analysis:
-            if analysis[label]['total_hands'] > 0:
-                analysis[label]['avg_bb_per_hand'] = round(
-                    analysis[label]['total_bb_earnings'] / analysis[label]['total_hands'], 2
-                )
-                analysis[label]['total_bb_earnings'] = round(analysis[label]['total_bb_earnings'], 2)
-        
+
         return analysis
 
     def calculate_board_high_card_analysis(self, dataframe):
         """Calculate board high card analysis (highest card on the entire board)"""
+        return self._average_bb_earnings(self.board_high_card_tally(dataframe))
+
+    def board_high_card_tally(self, dataframe):
+        """Hands and unrounded BB earnings by the board's highest card, before averaging"""
         analysis = {}
         
         # Filter to hands that reached flop - check multiple sources
@@ -4031,14 +4035,8 @@ class LadbrooksPokerHandProcessor:
         if 'flop' in dataframe.columns:
             flop_mask = flop_mask | (dataframe['flop'] == True)
         
-        # Method 2: Check Raw Hand for flop marker (most reliable)
-        def has_flop_in_raw_hand(raw_hand):
-            if not raw_hand or not isinstance(raw_hand, str):
-                return False
-            return '** Dealing Flop **' in raw_hand
-        
-        if 'Raw Hand' in dataframe.columns:
-            flop_mask = flop_mask | dataframe['Raw Hand'].apply(has_flop_in_raw_hand)
+        # Method 2: Check whether the hand was dealt a flop (most reliable)
+        flop_mask = flop_mask | self._street_dealt_mask(dataframe, 'flop')
         
         flop_df = dataframe[flop_mask].copy()
         
@@ -4046,8 +4044,7 @@ class LadbrooksPokerHandProcessor:
         
         for _, row in flop_df.iterrows():
             # Get all board cards
-            raw_hand = row.get('Raw Hand', '')
-            board_cards = self._get_board_cards_from_raw_hand(raw_hand)
+            board_cards = self._board_cards(row)
             
             if not board_cards:
                 continue
@@ -4074,21 +4071,17 @@ class LadbrooksPokerHandProcessor:
             bb_earnings = row['hand_result'] / row['bb_stake']
             analysis[high_card_label]['total_hands'] += 1
             analysis[high_card_label]['total_bb_earnings'] += bb_earnings
-        
-        # Calculate averages
-        for label in analysis:
-            if analysis[label]['total_hands'] > 0:
-                analysis[label]['avg_bb_per_hand'] = round(
-                    analysis[label]['total_bb_earnings'] / analysis[label]['total_hands'], 2
-                )
-                analysis[label]['total_bb_earnings'] = round(analysis[label]['total_bb_earnings'], 2)
-        
+
         return analysis
 
     def calculate_street_positional_matchups(self, dataframe, street):
         """Calculate positional matchups for a specific street (flop, turn, river)
         Returns dict with matchup keys like 'UTG vs CO' and data: total_hands, total_bb_earnings, total_earnings, avg_bb_per_hand
         """
+        return self._average_bb_earnings(self.street_positional_matchups_tally(dataframe, street))
+
+    def street_positional_matchups_tally(self, dataframe, street):
+        """Hands and unrounded earnings of each matchup on a street, before averaging"""
         matchups = {}
         
         # Filter to hands that reached this street - check multiple sources
@@ -4110,20 +4103,8 @@ class LadbrooksPokerHandProcessor:
         elif street == 'river' and 'river_HU_with_hero' in dataframe.columns:
             street_mask = street_mask | (dataframe['river_HU_with_hero'] == True)
         
-        # Method 4: Check Raw Hand for street markers (most reliable)
-        def has_street_in_raw_hand(raw_hand, street_name):
-            if not raw_hand or not isinstance(raw_hand, str):
-                return False
-            if street_name == 'flop':
-                return '** Dealing Flop **' in raw_hand
-            elif street_name == 'turn':
-                return '** Dealing Turn **' in raw_hand
-            elif street_name == 'river':
-                return '** Dealing River **' in raw_hand
-            return False
-        
-        if 'Raw Hand' in dataframe.columns:
-            street_mask = street_mask | dataframe['Raw Hand'].apply(lambda x: has_street_in_raw_hand(x, street))
+        # Method 4: Check which streets the hand was dealt (most reliable)
+        street_mask = street_mask | self._street_dealt_mask(dataframe, street)
         
         street_df = dataframe[street_mask].copy()
         
@@ -4134,9 +4115,8 @@ class LadbrooksPokerHandProcessor:
             if hero_position == 'Unknown' or hero_position not in valid_positions:
                 continue
             
-            # Get villain position from raw hand - find who raised preflop or who we're heads-up against
-            raw_hand = row.get('Raw Hand', '')
-            villain_position = self._get_villain_position_from_raw_hand(raw_hand, hero_position)
+            # Get villain position - find who raised preflop or who we're heads-up against
+            villain_position = self._villain_position(row)
             
             if not villain_position or villain_position not in valid_positions:
                 continue
@@ -4157,20 +4137,15 @@ class LadbrooksPokerHandProcessor:
             matchups[matchup_key]['total_hands'] += 1
             matchups[matchup_key]['total_bb_earnings'] += bb_earnings
             matchups[matchup_key]['total_earnings'] += earnings
-        
-        # Calculate averages
-        for matchup_key in matchups:
-            if matchups[matchup_key]['total_hands'] > 0:
-                matchups[matchup_key]['avg_bb_per_hand'] = round(
-                    matchups[matchup_key]['total_bb_earnings'] / matchups[matchup_key]['total_hands'], 2
-                )
-                matchups[matchup_key]['total_bb_earnings'] = round(matchups[matchup_key]['total_bb_earnings'], 2)
-                matchups[matchup_key]['total_earnings'] = round(matchups[matchup_key]['total_earnings'], 2)
-        
+
         return matchups
     
     def calculate_overall_positional_matchups(self, dataframe):
         """Calculate overall positional matchups grouped by pot type (RFI, 3-bet, 4-bet)"""
+        return self.overall_positional_matchups_from_tally(self.overall_positional_matchups_tally(dataframe))
+
+    def overall_positional_matchups_tally(self, dataframe):
+        """Hands, unrounded earnings and hand ids of each matchup by pot type, before averaging"""
         matchups = {
             'RFI Pots': {},
             '3-Bet Pots': {},
@@ -4183,20 +4158,8 @@ class LadbrooksPokerHandProcessor:
             '4-Bet Multiway Pots': {}
         }
 
-        def _preflop_action_counts(raw_hand):
+        def _preflop_action_counts(preflop):
             """Return (raise_count, call_after_raise, call_after_3bet, call_after_4bet, call_after_5bet, limp_detected)."""
-            if not raw_hand or not isinstance(raw_hand, str):
-                return 0, 0, 0, 0, 0, False
-
-            preflop_section = raw_hand
-            if '** Dealing down cards **' in raw_hand:
-                preflop_section = raw_hand.split('** Dealing down cards **')[1]
-            if '** Dealing Flop **' in preflop_section:
-                preflop_section = preflop_section.split('** Dealing Flop **')[0]
-            elif '** Summary **' in preflop_section:
-                preflop_section = preflop_section.split('** Summary **')[0]
-
-            lines = [line.strip() for line in preflop_section.split('\n') if line.strip()]
             raise_count = 0
             saw_raise = False
             saw_3bet = False
@@ -4208,11 +4171,8 @@ class LadbrooksPokerHandProcessor:
             call_after_5bet = 0
             limp_detected = False
 
-            for line in lines:
-                lower_line = line.lower()
-                if ' posts ' in lower_line:
-                    continue
-                if ' raises ' in lower_line or ' bets ' in lower_line:
+            for _, kind, _ in preflop:
+                if kind == 'raise':
                     raise_count += 1
                     saw_raise = True
                     if raise_count >= 2:
@@ -4222,7 +4182,7 @@ class LadbrooksPokerHandProcessor:
                     if raise_count >= 4:
                         saw_5bet = True
                     continue
-                if ' calls ' in lower_line:
+                if kind == 'call':
                     if not saw_raise:
                         limp_detected = True
                     elif not saw_3bet:
@@ -4236,71 +4196,52 @@ class LadbrooksPokerHandProcessor:
 
             return raise_count, call_after_raise, call_after_3bet, call_after_4bet, call_after_5bet, limp_detected
 
-        def is_heads_up_srp(raw_hand):
+        def is_heads_up_srp(preflop):
             """Single-raised pot: no limps, one raise, one call (heads-up)."""
-            raise_count, call_after_raise, _, _, _, limp_detected = _preflop_action_counts(raw_hand)
+            raise_count, call_after_raise, _, _, _, limp_detected = _preflop_action_counts(preflop)
             return (raise_count == 1) and (call_after_raise == 1) and (not limp_detected)
 
-        def is_multiway_srp(raw_hand):
+        def is_multiway_srp(preflop):
             """Multiway SRP: one raise, two or more callers (limps allowed)."""
-            raise_count, call_after_raise, _, _, _, _ = _preflop_action_counts(raw_hand)
+            raise_count, call_after_raise, _, _, _, _ = _preflop_action_counts(preflop)
             return (raise_count == 1) and (call_after_raise >= 2)
 
-        def is_multiway_3bet(raw_hand):
+        def is_multiway_3bet(preflop):
             """Multiway 3-bet: at least one raise, at least one 3-bet, two or more callers of 3-bet."""
-            raise_count, _, call_after_3bet, _, _, _ = _preflop_action_counts(raw_hand)
+            raise_count, _, call_after_3bet, _, _, _ = _preflop_action_counts(preflop)
             return (raise_count >= 2) and (call_after_3bet >= 2)
 
-        def is_heads_up_3bet(raw_hand):
+        def is_heads_up_3bet(preflop):
             """3-bet pot: no limps, one open raise, one 3-bet, one caller of 3-bet (heads-up)."""
-            raise_count, _, call_after_3bet, _, _, limp_detected = _preflop_action_counts(raw_hand)
+            raise_count, _, call_after_3bet, _, _, limp_detected = _preflop_action_counts(preflop)
             return (raise_count == 2) and (call_after_3bet == 1) and (not limp_detected)
 
-        def is_multiway_3bet(raw_hand):
+        def is_multiway_3bet(preflop):
             """Multiway 3-bet: at least one raise, at least one 3-bet, two or more callers of 3-bet."""
-            raise_count, _, call_after_3bet, _, _, _ = _preflop_action_counts(raw_hand)
+            raise_count, _, call_after_3bet, _, _, _ = _preflop_action_counts(preflop)
             return (raise_count >= 2) and (call_after_3bet >= 2)
 
-        def is_heads_up_4bet(raw_hand):
+        def is_heads_up_4bet(preflop):
             """4-bet pot: no limps, one open raise, one 3-bet, one 4-bet, and at least one caller of 4-bet."""
-            raise_count, _, _, call_after_4bet, _, limp_detected = _preflop_action_counts(raw_hand)
+            raise_count, _, _, call_after_4bet, _, limp_detected = _preflop_action_counts(preflop)
             return (raise_count == 3) and (call_after_4bet >= 1) and (not limp_detected)
         
-        def is_heads_up_5bet(raw_hand):
+        def is_heads_up_5bet(preflop):
             """5-bet pot: no limps, one open raise, one 3-bet, one 4-bet, one 5-bet, one caller of 5-bet (heads-up)."""
-            raise_count, _, _, _, call_after_5bet, limp_detected = _preflop_action_counts(raw_hand)
+            raise_count, _, _, _, call_after_5bet, limp_detected = _preflop_action_counts(preflop)
             return (raise_count == 4) and (call_after_5bet == 1) and (not limp_detected)
 
-        def is_heads_up_limp(raw_hand):
+        def is_heads_up_limp(preflop):
             """Limped pot: no raises, exactly one limp (heads-up, BB checks)."""
-            raise_count, _, _, _, _, limp_detected = _preflop_action_counts(raw_hand)
+            raise_count, _, _, _, _, limp_detected = _preflop_action_counts(preflop)
             if raise_count != 0 or not limp_detected:
                 return False
 
-            preflop_section = raw_hand
-            if '** Dealing down cards **' in raw_hand:
-                preflop_section = raw_hand.split('** Dealing down cards **')[1]
-            if '** Dealing Flop **' in preflop_section:
-                preflop_section = preflop_section.split('** Dealing Flop **')[0]
-            elif '** Summary **' in preflop_section:
-                preflop_section = preflop_section.split('** Summary **')[0]
-
-            lines = [line.strip() for line in preflop_section.split('\n') if line.strip()]
-            limp_calls = 0
-            for line in lines:
-                lower_line = line.lower()
-                if ' posts ' in lower_line:
-                    continue
-                if ' calls ' in lower_line:
-                    limp_calls += 1
-                if ' raises ' in lower_line or ' bets ' in lower_line:
-                    return False
+            return sum(1 for _, kind, _ in preflop if kind == 'call') == 1
 
-            return limp_calls == 1
-
-        def is_heads_up_limp_raise_call(raw_hand):
+        def is_heads_up_limp_raise_call(preflop):
             """Limp-raise pot: at least one limp, one raise, one caller (heads-up)."""
-            raise_count, call_after_raise, _, _, _, limp_detected = _preflop_action_counts(raw_hand)
+            raise_count, call_after_raise, _, _, _, limp_detected = _preflop_action_counts(preflop)
             return (raise_count == 1) and (call_after_raise == 1) and limp_detected
         for _, row in dataframe.iterrows():
             hero_position = row.get('position', 'Unknown')
@@ -4309,36 +4250,37 @@ class LadbrooksPokerHandProcessor:
             if hero_position == 'Unknown' or hero_position not in valid_positions:
                 continue
             
-            raw_hand = row.get('Raw Hand', '')
-            if not raw_hand:
+            street_actions = self._street_actions(row)
+            if not street_actions:
                 continue
             
             # Only include hands where Hero saw the flop
             if not row.get('hero_saw_flop', False):
                 continue
                 
-            villain_position = self._get_villain_position_from_raw_hand(raw_hand, hero_position)
+            villain_position = self._villain_position(row)
+            preflop = self._preflop_actions(row)
             
             # Determine pot type from preflop action
             pot_type = None
             is_multiway = False
             
-            # Determine pot type from raw hand (not Hero-specific)
-            if is_heads_up_5bet(raw_hand):
+            # Determine pot type from everyone's preflop actions (not Hero-specific)
+            if is_heads_up_5bet(preflop):
                 pot_type = '5-Bet Pots'
-            elif is_heads_up_4bet(raw_hand):
+            elif is_heads_up_4bet(preflop):
                 pot_type = '4-Bet Pots'
-            elif is_heads_up_3bet(raw_hand):
+            elif is_heads_up_3bet(preflop):
                 pot_type = '3-Bet Pots'
-            elif is_multiway_srp(raw_hand):
+            elif is_multiway_srp(preflop):
                 pot_type = 'RFI Pots'
-            elif is_multiway_3bet(raw_hand):
+            elif is_multiway_3bet(preflop):
                 pot_type = '3-Bet Pots'
-            elif is_heads_up_srp(raw_hand):
+            elif is_heads_up_srp(preflop):
                 pot_type = 'RFI Pots'
-            elif is_heads_up_limp_raise_call(raw_hand):
+            elif is_heads_up_limp_raise_call(preflop):
                 pot_type = 'Limp-Raise Pots'
-            elif is_heads_up_limp(raw_hand):
+            elif is_heads_up_limp(preflop):
                 pot_type = 'Limp Pots'
             else:
                 # Not a valid SRP/3-bet/4-bet for matchups
@@ -4366,100 +4308,34 @@ class LadbrooksPokerHandProcessor:
             opponent_positions = []
             is_multiway = False
             
-            if '** Dealing Flop **' in raw_hand or '** Summary **' in raw_hand:
-                preflop_section = raw_hand.split('** Dealing Flop **')[0] if '** Dealing Flop **' in raw_hand else raw_hand.split('** Summary **')[0]
-                
-                # Get position map to find all opponent positions
-                try:
-                    if 'Total number of players :' in raw_hand:
-                        total_players = int(raw_hand.split('Total number of players :')[1].split('/')[0].strip())
-                        button_seat = self.get_button_seat(raw_hand)
-                        seat_info = self.get_seat_info(raw_hand)
-                        if seat_info:
-                            position_map = self.calculate_positions(seat_info, button_seat, total_players)
-                            
-                            # Get all players who acted preflop (excluding Hero)
-                            players_who_acted = set()
-                            for line in preflop_section.split('\n'):
-                                line = line.strip()
-                                if not line:
-                                    continue
-                                if any(word in line.lower() for word in ['calls', 'raises', 'bets', 'checks', 'all-in']):
-                                    # Extract player name
-                                    if ':' in line and 'Seat' in line:
-                                        try:
-                                            player_part = line.split(':')[1].strip()
-                                            player_name = player_part.split()[0] if player_part.split() else None
-                                            if player_name and player_name != 'Hero':
-                                                players_who_acted.add(player_name)
-                                        except:
-                                            pass
-                                    else:
-                                        parts = line.split()
-                                        if parts:
-                                            potential_name = parts[0]
-                                            if potential_name and potential_name != 'Hero':
-                                                players_who_acted.add(potential_name)
-                            
-                            # Get positions of all opponents who acted
-                            for player_name in players_who_acted:
-                                if player_name in position_map:
-                                    opp_position = position_map[player_name]
-                                    if opp_position in ['UTG', 'MP', 'CO', 'BTN', 'SB', 'BB']:
-                                        opponent_positions.append(opp_position)
-                            
-                            # Remove duplicates and sort
-                            opponent_positions = sorted(list(set(opponent_positions)))
-                            
-                            # Check if multiway (3+ players total who saw flop)
-                            # Count players who actually saw the flop, not just acted preflop
-                            players_saw_flop = set()
-                            if '** Dealing Flop **' in raw_hand:
-                                flop_section = raw_hand.split('** Dealing Flop **')[1] if '** Dealing Flop **' in raw_hand else ''
-                                # Check who was still in the hand at flop
-                                for line in flop_section.split('\n'):
-                                    line = line.strip()
-                                    if not line or '** Dealing Turn **' in line or '** Summary **' in line:
-                                        break
-                                    # Look for player actions on flop
-                                    if any(word in line.lower() for word in ['bets', 'checks', 'calls', 'raises', 'folds']):
-                                        # Extract player name
-                                        if ':' in line and 'Seat' in line:
-                                            try:
-                                                player_part = line.split(':')[1].strip()
-                                                player_name = player_part.split()[0] if player_part.split() else None
-                                                if player_name and player_name in position_map:
-                                                    players_saw_flop.add(player_name)
-                                            except:
-                                                pass
-                                        else:
-                                            parts = line.split()
-                                            if parts:
-                                                potential_name = parts[0]
-                                                if potential_name and potential_name in position_map:
-                                                    players_saw_flop.add(potential_name)
-                            
-                            # Add Hero to count
-                            total_players_saw_flop = len(players_saw_flop) + 1  # +1 for Hero
-                            
-                            # If no flop action found, use preflop count as fallback
-                            if total_players_saw_flop <= 1:
-                                total_players_saw_flop = len(players_who_acted) + 1
-                            
-                            # Multiway = 3+ players (Hero + 2+ opponents)
-                            if total_players_saw_flop >= 3 and len(opponent_positions) >= 2:
-                                is_multiway = True
-                                if 'Multiway' not in pot_type:
-                                    pot_type = pot_type.replace('Pots', 'Multiway Pots')
-                            else:
-                                # Heads-up pot - ensure it's not marked as multiway
-                                is_multiway = False
-                                if 'Multiway' in pot_type:
-                                    pot_type = pot_type.replace('Multiway Pots', 'Pots')
-                except Exception as e:
-                    print(f"Error extracting opponent positions: {e}")
-                    import traceback
-                    traceback.print_exc()
+            position_map = self._position_map(row)
+            if position_map:
+                # Positions of all opponents who put money in or checked preflop
+                players_who_acted = {player for player, kind, _ in preflop
+                                     if player != 'Hero' and kind in ('raise', 'call', 'check')}
+                opponent_positions = sorted({position_map[player] for player in players_who_acted
+                                             if position_map.get(player) in ['UTG', 'MP', 'CO', 'BTN', 'SB', 'BB']})
+
+                # Check if multiway (3+ players total who saw flop)
+                # Count players who actually acted on the flop, not just acted preflop
+                players_saw_flop = {player for player, _, _ in street_actions.get('flop', [])
+                                    if player in position_map}
+                total_players_saw_flop = len(players_saw_flop) + 1  # +1 for Hero
+
+                # If no flop action found, use preflop count as fallback
+                if total_players_saw_flop <= 1:
+                    total_players_saw_flop = len(players_who_acted) + 1
+
+                # Multiway = 3+ players (Hero + 2+ opponents)
+                if total_players_saw_flop >= 3 and len(opponent_positions) >= 2:
+                    is_multiway = True
+                    if 'Multiway' not in pot_type:
+                        pot_type = pot_type.replace('Pots', 'Multiway Pots')
+                else:
+                    # Heads-up pot - ensure it's not marked as multiway
+                    is_multiway = False
+                    if 'Multiway' in pot_type:
+                        pot_type = pot_type.replace('Multiway Pots', 'Pots')
             
             if is_multiway and pot_type == 'RFI Multiway Pots':
                 hero_saw_flop = row.get('hero_saw_flop', False)
@@ -4480,42 +4356,12 @@ class LadbrooksPokerHandProcessor:
             if pot_type == 'Limp Pots':
                 if is_multiway:
                     continue
-                try:
-                    if 'Total number of players :' in raw_hand:
-                        total_players = int(raw_hand.split('Total number of players :')[1].split('/')[0].strip())
-                        button_seat = self.get_button_seat(raw_hand)
-                        seat_info = self.get_seat_info(raw_hand)
-                        if seat_info:
-                            position_map = self.calculate_positions(seat_info, button_seat, total_players)
-                            preflop_section = raw_hand
-                            if '** Dealing down cards **' in raw_hand:
-                                preflop_section = raw_hand.split('** Dealing down cards **')[1]
-                            if '** Dealing Flop **' in preflop_section:
-                                preflop_section = preflop_section.split('** Dealing Flop **')[0]
-                            elif '** Summary **' in preflop_section:
-                                preflop_section = preflop_section.split('** Summary **')[0]
-
-                            limper_name = None
-                            for line in preflop_section.split('\n'):
-                                line = line.strip()
-                                if not line:
-                                    continue
-                                lower_line = line.lower()
-                                if ' posts ' in lower_line:
-                                    continue
-                                if ' calls ' in lower_line:
-                                    parts = line.split()
-                                    if parts:
-                                        limper_name = parts[0]
-                                        break
-
-                            if hero_position == 'BB':
-                                if limper_name and limper_name in position_map:
-                                    villain_position = position_map.get(limper_name)
-                            else:
-                                villain_position = 'BB'
-                except Exception:
-                    pass
+                if hero_position == 'BB':
+                    limper_name = next((player for player, kind, _ in preflop if kind == 'call'), None)
+                    if limper_name and limper_name in position_map:
+                        villain_position = position_map.get(limper_name)
+                else:
+                    villain_position = 'BB'
 
                 if hero_position != 'BB' and villain_position != 'BB':
                     continue
@@ -4565,7 +4411,8 @@ class LadbrooksPokerHandProcessor:
                 bb_earnings = float(hand_result) / float(bb_stake)
                 earnings = float(hand_result)
             except (ZeroDivisionError, TypeError, KeyError, ValueError) as e:
-                print(f"Error calculating BB earnings: {e}, hand_result={row.get('hand_result')}, bb_stake={row.get('bb_stake')}")
+                self.issues.record('had unreadable BB earnings', "Error calculating BB earnings: %s, hand_result=%r, bb_stake=%r",
+                                   e, row.get('hand_result'), row.get('bb_stake'))
                 bb_earnings = 0.0
                 earnings = 0.0
             
@@ -4576,29 +4423,24 @@ class LadbrooksPokerHandProcessor:
             hand_id = row.get('hand_id')
             if hand_id:
                 matchups[pot_type][matchup_key]['hand_ids'].append(hand_id)
-        
+
+        return matchups
+
+    def overall_positional_matchups_from_tally(self, matchups):
         # Calculate averages and round values
-        for pot_type in list(matchups.keys()):
-            if not matchups[pot_type]:
-                continue
-            
-            for matchup_key in matchups[pot_type]:
-                matchup_data = matchups[pot_type][matchup_key]
-                if matchup_data['total_hands'] > 0:
-                    matchup_data['avg_bb_per_hand'] = round(
-                        matchup_data['total_bb_earnings'] / matchup_data['total_hands'], 2
-                    )
-                matchup_data['total_bb_earnings'] = round(matchup_data['total_bb_earnings'], 2)
-                matchup_data['total_earnings'] = round(matchup_data['total_earnings'], 2)
-        
-        # Debug: Print summary of what was generated
-        total_hands = sum(sum(m.get('total_hands', 0) for m in pot.values()) for pot in matchups.values())
-        print(f"Positional matchups generated: {total_hands} total hands across {len([p for p in matchups.values() if p])} pot types")
-        for pot_type, pot_data in matchups.items():
-            if pot_data:
-                pot_hands = sum(m.get('total_hands', 0) for m in pot_data.values())
-                if pot_hands > 0:
-                    print(f"  {pot_type}: {pot_hands} hands, {len(pot_data)} matchups")
+        for pot_type in matchups:
+            self._average_bb_earnings(matchups[pot_type])
+
+        # Debug: Log a summary of what was generated
+        if logger.isEnabledFor(logging.DEBUG):
+            total_hands = sum(sum(m.get('total_hands', 0) for m in pot.values()) for pot in matchups.values())
+            logger.debug("Positional matchups generated: %s total hands across %s pot types",
+                         total_hands, len([p for p in matchups.values() if p]))
+            for pot_type, pot_data in matchups.items():
+                if pot_data:
+                    pot_hands = sum(m.get('total_hands', 0) for m in pot_data.values())
+                    if pot_hands > 0:
+                        logger.debug("  %s: %s hands, %s matchups", pot_type, pot_hands, len(pot_data))
         
         # Remove completely empty pot types only if ALL are empty
         # But keep at least one structure for the template
@@ -4609,144 +4451,33 @@ class LadbrooksPokerHandProcessor:
             # Return empty dict - template will handle this gracefully
             return {}
     
-    def _get_villain_position_from_raw_hand(self, raw_hand, hero_position):
-        """Extract villain position from raw hand - find the opponent who we're heads-up against"""
-        if not raw_hand or not isinstance(raw_hand, str):
-            return None
-        
-        try:
-            # Use the same methods that calculate hero position to get all positions
-            if 'Total number of players :' not in raw_hand:
-                return None
-                
-            total_players = int(raw_hand.split('Total number of players :')[1].split('/')[0].strip())
-            button_seat = self.get_button_seat(raw_hand)
-            seat_info = self.get_seat_info(raw_hand)  # Returns list of (seat_num, player_name) tuples
-            
-            if not seat_info:
-                return None
-                
-            position_map = self.calculate_positions(seat_info, button_seat, total_players)
-            
-            if not position_map:
-                return None
-            
-            # Get all player names from seat info (excluding Hero)
-            all_player_names = {name for _, name in seat_info if name != 'Hero'}
-            
-            # Find the villain - the other player in heads-up pots
-            # Look for players who acted preflop (not Hero)
-            villain_player_name = None
-            
-            # Extract preflop section
-            if '** Dealing Flop **' in raw_hand:
-                preflop_section = raw_hand.split('** Dealing Flop **')[0]
-            elif '** Summary **' in raw_hand:
-                preflop_section = raw_hand.split('** Summary **')[0]
-            else:
-                preflop_section = raw_hand  # Use entire hand if no markers found
-            
-            # Find who raised or called (the villain)
-            # Look for action lines with player names (not Hero)
-            players_who_acted = set()
-            action_words = ['raises', 'calls', 'bets', 'folds', 'checks', 'all-in']
-            
-            for line in preflop_section.split('\n'):
-                line = line.strip()
-                if not line:
-                    continue
-                
-                # Skip lines that are just Hero actions (but don't skip lines that mention Hero and others)
-                if line.startswith('Hero ') and any(word in line.lower() for word in action_words):
-                    continue
-                
-                # Look for patterns like "Seat X: PlayerName raises" or "PlayerName calls"
-                line_lower = line.lower()
-                if any(word in line_lower for word in action_words):
-                    # Extract player name from line
-                    # Format is usually "Seat X: PlayerName action" or "PlayerName action"
-                    if ':' in line and 'Seat' in line:
-                        # Format: "Seat X: PlayerName action"
-                        try:
-                            player_part = line.split(':')[1].strip()
-                            parts = player_part.split()
-                            if parts:
-                                player_name = parts[0]
-                                # Validate it's a known player name
-                                if player_name in all_player_names:
-                                    players_who_acted.add(player_name)
-                        except:
-                            pass
-                    else:
-                        # Try to extract from line directly (e.g., "PlayerName raises")
-                        parts = line.split()
-                        if parts and len(parts) > 0:
-                            potential_name = parts[0]
-                            # Validate it's a known player name and not an action word
-                            if (potential_name in all_player_names and 
-                                potential_name.lower() not in action_words):
-                                players_who_acted.add(potential_name)
-            
-            # If we found players who acted, prioritize those who raised/called (not just folded)
-            # First, try to find someone who raised or called (more likely to be the villain)
-            priority_players = []
-            for line in preflop_section.split('\n'):
-                line = line.strip()
-                if not line or line.startswith('Hero '):
-                    continue
-                for player_name in players_who_acted:
-                    if line.startswith(player_name + ' ') and ('raises' in line.lower() or 'calls' in line.lower()):
-                        if player_name in position_map:
-                            priority_players.append(player_name)
-            
-            # Use priority players first, then any player who acted
-            if priority_players:
-                villain_player_name = priority_players[0]
-            elif players_who_acted:
-                for player_name in players_who_acted:
-                    if player_name in position_map:
-                        villain_player_name = player_name
-                        break
-            
-            # Fallback: find any player that's not Hero (for hands where Hero folded early)
-            if not villain_player_name:
-                for seat_num, player_name in seat_info:
-                    if player_name != 'Hero' and player_name in position_map:
-                        villain_player_name = player_name
-                        break
-            
-            if villain_player_name and villain_player_name in position_map:
-                return position_map[villain_player_name]
-            
-            # If we still don't have villain, try a different approach:
-            # For heads-up pots, the villain is usually the other player
-            # Check summary for who won/lost (they must have been involved)
-            if '** Summary **' in raw_hand:
-                summary = raw_hand.split('** Summary **')[1]
-                # Look for player names in summary who actually bet (not Hero)
-                for seat_num, player_name in seat_info:
-                    if player_name != 'Hero' and player_name in summary:
-                        # Check if they actually bet (not just folded)
-                        if 'bet' in summary.lower() and player_name in summary:
-                            if player_name in position_map:
-                                return position_map[player_name]
-            
-        except Exception as e:
-            # Log the error so we can see what's failing
-            print(f"Error in _get_villain_position_from_raw_hand: {e}")
-            import traceback
-            traceback.print_exc()
+    def _villain_position(self, row):
+        """Position of the opponent Hero played the hand against.
+
+        That is the first other player to raise or call preflop, else one who checked
+        their option; failing that the first other player to act, or else the first
+        other player seated.
+        """
+        position_map = self._position_map(row)
+        if not position_map:
             return None
-        
-        return None
+        preflop = [(player, kind) for player, kind, _ in self._preflop_actions(row)
+                   if player != 'Hero' and player in position_map]
+        villain = next((player for player, kind in preflop if kind in ('raise', 'call')), None)
+        if villain is None:
+            villain = next((player for player, kind in preflop if kind == 'check'), None)
+        if villain is None and preflop:
+            villain = preflop[0][0]
+        if villain is None:
+            villain = next((player for player in position_map if player != 'Hero'), None)
+        return position_map.get(villain)
     
     def calculate_biggest_hands(self, dataframe):
         """Calculate biggest winning and losing hands"""
-        biggest_hands = {
-            'biggest_wins': [],
-            'biggest_losses': []
-        }
-        
+        return self.biggest_hands_from_tally(self.biggest_hands_tally(dataframe))
+
+    def biggest_hands_tally(self, dataframe):
+        """The biggest wins and losses of these hands, not yet formatted for display"""
         # Get hands with pot size information
         hands_with_pots = []
         
@@ -4756,17 +4487,10 @@ class LadbrooksPokerHandProcessor:
             bb_stake = row.get('bb_stake', 0.25)
             bb_earnings = hand_result / bb_stake if bb_stake > 0 else 0
             
-            # Try to extract pot size from raw hand or use calculated pot
-            pot_size = 0
-            if raw_hand and '** Summary **' in raw_hand:
-                # Try to extract pot size from summary
-                summary_section = raw_hand.split('** Summary **')[1]
-                pot_match = re.search(r'pot.*?(\d+\.?\d*)', summary_section, re.IGNORECASE)
-                if pot_match:
-                    try:
-                        pot_size = float(pot_match.group(1))
-                    except:
-                        pass
+            # Pot size from the hand's summary
+            pot_size = row.get('final_pot', 0) or 0
+            if pd.isna(pot_size):
+                pot_size = 0
             
             # If we couldn't get pot size, estimate from BB stake
             if pot_size == 0:
@@ -4777,20 +4501,28 @@ class LadbrooksPokerHandProcessor:
                 'bb_earnings': bb_earnings,
                 'pot_size': pot_size,
                 'raw_hand': raw_hand,
-                'formatted_hand': self._format_hand_for_display(raw_hand) if raw_hand else None
+                'formatted_hand': None
             })
-        
+        return self._top_biggest_hands({'biggest_wins': hands_with_pots, 'biggest_losses': hands_with_pots})
+
+    def _top_biggest_hands(self, tally):
+        """Keep the top 3 wins and losses of a biggest hands tally; ties go to the earlier hand"""
         # Sort by hand_result (positive = wins, negative = losses)
-        hands_with_pots.sort(key=lambda x: x['hand_result'], reverse=True)
-        
-        # Get top 3 wins
-        wins = [h for h in hands_with_pots if h['hand_result'] > 0]
-        biggest_hands['biggest_wins'] = wins[:3]
-        
-        # Get top 3 losses (most negative)
-        losses = [h for h in hands_with_pots if h['hand_result'] < 0]
-        losses.sort(key=lambda x: x['hand_result'])  # Sort ascending (most negative first)
-        biggest_hands['biggest_losses'] = losses[:3]
+        wins = [h for h in tally['biggest_wins'] if h['hand_result'] > 0]
+        wins.sort(key=lambda x: x['hand_result'], reverse=True)
+
+        # Top 3 losses (most negative first)
+        losses = [h for h in tally['biggest_losses'] if h['hand_result'] < 0]
+        losses.sort(key=lambda x: x['hand_result'])
+        return {'biggest_wins': wins[:3], 'biggest_losses': losses[:3]}
+
+    def biggest_hands_from_tally(self, tally):
+        biggest_hands = self._top_biggest_hands(tally)
+
+        # Only the hands that are shown need formatting
+        for hand in biggest_hands['biggest_wins'] + biggest_hands['biggest_losses']:
+            if hand['raw_hand']:
+                hand['formatted_hand'] = self._format_hand_for_display(hand['raw_hand'])
         
         return biggest_hands
     
@@ -4989,10 +4721,20 @@ class LadbrooksPokerHandProcessor:
 
     def calculate_leak_detection(self, dataframe):
         """Detect common poker leaks"""
-        leaks = []
+        return self.leak_detection_from_tally(self.leak_detection_tally(dataframe))
+
+    def leak_detection_tally(self, dataframe):
+        """Counts the leak checks are worked out from"""
         total_hands = len(dataframe)
+        tally = {
+            'hands': total_hands, 'vpip': 0, 'pfr': 0, 'call_rfi': 0, 'limp': 0, 'three_bet': 0,
+            'faced_3bet': 0, 'fold_to_3bet': 0, 'three_bet_opportunities': 0,
+            'position_hands': {'UTG': 0, 'MP': 0, 'SB': 0, 'BB': 0},
+            'position_vpip': {'UTG': 0, 'MP': 0},
+            'blind_bb': {'SB': 0.0, 'BB': 0.0},
+        }
         if total_hands == 0:
-            return leaks
+            return tally
 
         def _bool_series(series):
             return series.apply(lambda x: 1 if (x is True or x == True or str(x).lower() == 'true' or x == 1) else 0)
@@ -5004,43 +4746,67 @@ class LadbrooksPokerHandProcessor:
                 return dataframe[series_name].apply(self.is_dict).astype(int)
             return _bool_series(dataframe[series_name])
 
-        vpip_rate = _series_or_zeros('vpip').sum() / total_hands * 100
+        tally['vpip'] = int(_series_or_zeros('vpip').sum())
         rfi_series = _series_or_zeros('opened_pot') if 'opened_pot' in dataframe.columns else _series_or_zeros('rfi', as_dict=True)
         limp_series = _series_or_zeros('limped') if 'limped' in dataframe.columns else _series_or_zeros('limp', as_dict=True)
         three_bet_series = _series_or_zeros('did_3bet') if 'did_3bet' in dataframe.columns else _series_or_zeros('three_bet', as_dict=True)
         four_bet_series = _series_or_zeros('did_4bet') if 'did_4bet' in dataframe.columns else _series_or_zeros('four_bet', as_dict=True)
         five_bet_series = _series_or_zeros('five_bet', as_dict=True)
         six_bet_series = _series_or_zeros('six_bet', as_dict=True)
-        call_rfi_rate = _series_or_zeros('call_rfi', as_dict=True).sum() / total_hands * 100
+        tally['call_rfi'] = int(_series_or_zeros('call_rfi', as_dict=True).sum())
 
         pfr_mask = (rfi_series | three_bet_series | four_bet_series | five_bet_series | six_bet_series)
-        pfr_rate = pfr_mask.sum() / total_hands * 100
-        
-        # Leak 1: Over-folding to 3-bets
+        tally['pfr'] = int(pfr_mask.sum())
+        tally['limp'] = int(limp_series.sum())
+        tally['three_bet'] = int((three_bet_series == 1).sum())
+
         if 'faced_3bet' in dataframe.columns and 'fold' in dataframe.columns:
             faced_3bet_hands = dataframe[dataframe['faced_3bet'] == True]
-            if len(faced_3bet_hands) > 0:
-                fold_to_3bet = faced_3bet_hands[faced_3bet_hands['fold'] == True]
-                fold_rate = len(fold_to_3bet) / len(faced_3bet_hands) * 100
-                if fold_rate > 85:  # Optimal is around 60-70%
-                    leaks.append({
-                        'type': 'Preflop',
-                        'title': 'Over-folding to 3-bets',
-                        'severity': 'high' if fold_rate > 90 else 'medium',
-                        'description': f'You are folding {fold_rate:.1f}% of the time when facing a 3-bet. This is too high.',
-                        'suggestion': 'Consider calling or 4-betting more often, especially in position and with suited connectors or pocket pairs.',
-                        'impact': (fold_rate - 70) * 0.5,  # Rough estimate
-                        'hands': len(faced_3bet_hands),
-                        'bb_per_100': -abs((fold_rate - 70) * 0.3),
-                        'actual_freq': round(fold_rate, 1),
-                        'optimal_freq': 65.0
-                    })
+            tally['faced_3bet'] = len(faced_3bet_hands)
+            tally['fold_to_3bet'] = len(faced_3bet_hands[faced_3bet_hands['fold'] == True])
+        if 'had_3bet_opportunity' in dataframe.columns:
+            tally['three_bet_opportunities'] = int((dataframe['had_3bet_opportunity'] == True).sum())
+
+        for pos in tally['position_hands']:
+            pos_hands = dataframe[dataframe['position'] == pos]
+            tally['position_hands'][pos] = len(pos_hands)
+            if pos in tally['position_vpip']:
+                tally['position_vpip'][pos] = len(pos_hands[pos_hands['vpip'] == True])
+            if pos in tally['blind_bb']:
+                tally['blind_bb'][pos] = (pos_hands['hand_result'] / pos_hands['bb_stake']).sum()
+        return tally
+
+    def leak_detection_from_tally(self, tally):
+        leaks = []
+        total_hands = tally['hands']
+        if total_hands == 0:
+            return leaks
+
+        vpip_rate = tally['vpip'] / total_hands * 100
+        call_rfi_rate = tally['call_rfi'] / total_hands * 100
+        pfr_rate = tally['pfr'] / total_hands * 100
+
+        # Leak 1: Over-folding to 3-bets
+        if tally['faced_3bet'] > 0:
+            fold_rate = tally['fold_to_3bet'] / tally['faced_3bet'] * 100
+            if fold_rate > 85:  # Optimal is around 60-70%
+                leaks.append({
+                    'type': 'Preflop',
+                    'title': 'Over-folding to 3-bets',
+                    'severity': 'high' if fold_rate > 90 else 'medium',
+                    'description': f'You are folding {fold_rate:.1f}% of the time when facing a 3-bet. This is too high.',
+                    'suggestion': 'Consider calling or 4-betting more often, especially in position and with suited connectors or pocket pairs.',
+                    'impact': (fold_rate - 70) * 0.5,  # Rough estimate
+                    'hands': tally['faced_3bet'],
+                    'bb_per_100': -abs((fold_rate - 70) * 0.3),
+                    'actual_freq': round(fold_rate, 1),
+                    'optimal_freq': 65.0
+                })
         
         # Leak 2: Under-3-betting
-        three_bet_hands = dataframe[three_bet_series == 1]
-        three_bet_opportunities = dataframe[dataframe['had_3bet_opportunity'] == True] if 'had_3bet_opportunity' in dataframe.columns else pd.DataFrame()
-        if len(three_bet_opportunities) > 10:
-            three_bet_rate = len(three_bet_hands) / len(three_bet_opportunities) * 100
+        three_bet_opportunities = tally['three_bet_opportunities']
+        if three_bet_opportunities > 10:
+            three_bet_rate = tally['three_bet'] / three_bet_opportunities * 100
             if three_bet_rate < 5:  # Optimal is around 8-12%
                 leaks.append({
                     'type': 'Preflop',
@@ -5049,7 +4815,7 @@ class LadbrooksPokerHandProcessor:
                     'description': f'Your 3-bet frequency is {three_bet_rate:.1f}% when facing a raise. This is too low.',
                     'suggestion': 'Increase your 3-betting frequency to 8-12% with value hands (pairs, suited aces, broadways) and bluffs (suited connectors, suited aces).',
                     'impact': (8 - three_bet_rate) * 0.4,
-                    'hands': len(three_bet_opportunities),
+                    'hands': three_bet_opportunities,
                     'bb_per_100': -abs((8 - three_bet_rate) * 0.2),
                     'actual_freq': round(three_bet_rate, 1),
                     'optimal_freq': 10.0
@@ -5076,9 +4842,9 @@ class LadbrooksPokerHandProcessor:
         # Leak 5: VPIP too high from early positions
         early_positions = ['UTG', 'MP']
         for pos in early_positions:
-            pos_hands = dataframe[dataframe['position'] == pos]
-            if len(pos_hands) > 5:
-                vpip_rate = len(pos_hands[pos_hands['vpip'] == True]) / len(pos_hands) * 100
+            pos_hands = tally['position_hands'][pos]
+            if pos_hands > 5:
+                vpip_rate = tally['position_vpip'][pos] / pos_hands * 100
                 optimal_vpip = 15 if pos == 'UTG' else 18
                 if vpip_rate > optimal_vpip + 5:
                     leaks.append({
@@ -5088,7 +4854,7 @@ class LadbrooksPokerHandProcessor:
                         'description': f'Your VPIP from {pos} is {vpip_rate:.1f}%. Optimal is around {optimal_vpip}%.',
                         'suggestion': f'Tighten your {pos} range. Only play premium hands and strong suited connectors.',
                         'impact': (vpip_rate - optimal_vpip) * 0.2,
-                        'hands': len(pos_hands),
+                        'hands': pos_hands,
                         'bb_per_100': -abs((vpip_rate - optimal_vpip) * 0.1),
                         'actual_freq': round(vpip_rate, 1),
                         'optimal_freq': float(optimal_vpip)
@@ -5126,7 +4892,7 @@ class LadbrooksPokerHandProcessor:
             })
 
         # Leak 8: Over-limping
-        limp_rate = limp_series.sum() / total_hands * 100 if total_hands > 0 else 0
+        limp_rate = tally['limp'] / total_hands * 100 if total_hands > 0 else 0
         if limp_rate > 10:
             leaks.append({
                 'type': 'Preflop',
@@ -5142,7 +4908,7 @@ class LadbrooksPokerHandProcessor:
             })
 
         # Leak 9: Under-3-betting overall
-        did_3bet_rate = three_bet_series.sum() / total_hands * 100
+        did_3bet_rate = tally['three_bet'] / total_hands * 100
         if did_3bet_rate < 2 and total_hands > 100:
             leaks.append({
                 'type': 'Preflop',
@@ -5159,10 +4925,9 @@ class LadbrooksPokerHandProcessor:
 
         # Leak 10: Blind losses too high
         for blind in ['SB', 'BB']:
-            blind_hands = dataframe[dataframe['position'] == blind]
-            if len(blind_hands) > 20:
-                blind_bb = (blind_hands['hand_result'] / blind_hands['bb_stake']).sum()
-                blind_bb_per_hand = blind_bb / len(blind_hands)
+            blind_hands = tally['position_hands'][blind]
+            if blind_hands > 20:
+                blind_bb_per_hand = tally['blind_bb'][blind] / blind_hands
                 if blind_bb_per_hand < -0.6:
                     leaks.append({
                         'type': 'Preflop',
@@ -5171,7 +4936,7 @@ class LadbrooksPokerHandProcessor:
                         'description': f'Your {blind} results are {blind_bb_per_hand:.2f} BB/hand, which is too negative.',
                         'suggestion': f'Tighten your {blind} defense range and avoid marginal calls out of position.',
                         'impact': abs(blind_bb_per_hand) * 10,
-                        'hands': len(blind_hands),
+                        'hands': blind_hands,
                         'bb_per_100': round(blind_bb_per_hand * 100, 2),
                         'actual_freq': round(blind_bb_per_hand * 100, 1),
                         'optimal_freq': -35.0
@@ -5183,91 +4948,110 @@ class LadbrooksPokerHandProcessor:
         return leaks
 
     def advanced_processing(self, dataframe):
-        results = {}
+        """Work out every metric of a hands frame as the one-row results frame"""
+        if len(dataframe) == 0:
+            # Return empty results if no hands
+            return pd.DataFrame([{}])
+        return self.results_from_tallies(self.metric_tallies(dataframe))
 
-        df_six_players = dataframe[dataframe['no_players'] == 6]
+    def metric_tallies(self, dataframe, timer=None):
+        """The counts and unrounded sums every metric is worked out from.
 
+        Tallies of separate frames of hands add up with merge_metric_tallies,
+        so a file can be tallied a chunk at a time, or new hands added to a
+        finished run, without holding every row; results_from_tallies turns
+        them into the results frame. A metric that fails is tallied as None.
+        The frame gains the BB_earnings column saved with the hands.
+        """
+        timer = timer or self.timer
+        tallies = {}
         number_of_hands = len(dataframe)
         if number_of_hands == 0:
-            # Return empty results if no hands
-            return pd.DataFrame([{}])
-        
-        # Debug: Check hand_result column
-        if 'hand_result' not in dataframe.columns:
-            print("WARNING: hand_result column missing from dataframe!")
-            earnings = 0.0
-            BB_earnings = 0.0
-        else:
-            # Check for NaN values and replace with 0
-            dataframe['hand_result'] = dataframe['hand_result'].fillna(0.0)
-            earnings = dataframe['hand_result'].sum()
-            
-            # Debug output
-            non_zero_results = (dataframe['hand_result'] != 0).sum()
-            if non_zero_results == 0:
-                print(f"WARNING: All {number_of_hands} hands have hand_result = 0.0")
-                print(f"Sample hand_result values: {dataframe['hand_result'].head(10).tolist()}")
-            
-            # Calculate BB earnings (handle division by zero)
-            # Check bb_stake column
-            if 'bb_stake' not in dataframe.columns:
-                print("WARNING: bb_stake column missing from dataframe!")
-                bb_stakes = pd.Series([0.25] * len(dataframe))  # Default to 0.25 if missing
+            return tallies
+
+        df_six_players = dataframe[dataframe['no_players'] == 6]
+
+        with timer.stage('metrics.Session Earnings', number_of_hands):
+            # Debug: Check hand_result column
+            if 'hand_result' not in dataframe.columns:
+                logger.warning("hand_result column missing from dataframe")
+                earnings = 0.0
+                BB_earnings = 0.0
             else:
-                bb_stakes = dataframe['bb_stake'].fillna(0.25)  # Default to 0.25 if NaN
-                # Replace 0 with default to avoid division by zero
-                bb_stakes = bb_stakes.replace(0.0, 0.25)
-            
-            # Debug: Check bb_stake values
-            zero_bb_stakes = (bb_stakes == 0).sum()
-            if zero_bb_stakes > 0:
-                print(f"WARNING: {zero_bb_stakes} hands have bb_stake = 0, using default 0.25")
-            
-            dataframe['BB_earnings'] = dataframe['hand_result'] / bb_stakes
-            BB_earnings = dataframe['BB_earnings'].sum()
-            
-            # Debug output for BB earnings
-            if BB_earnings == 0.0 and earnings != 0.0:
-                print(f"WARNING: BB_earnings is 0.0 but earnings is {earnings}")
-                print(f"Sample bb_stake values: {bb_stakes.head(10).tolist()}")
-                print(f"Sample hand_result values: {dataframe['hand_result'].head(10).tolist()}")
-                print(f"Sample BB_earnings values: {dataframe['BB_earnings'].head(10).tolist()}")
-        
-        BB_earnings_per_100_hands = BB_earnings * 100 / number_of_hands if number_of_hands > 0 else 0
+                # Check for NaN values and replace with 0
+                dataframe['hand_result'] = dataframe['hand_result'].fillna(0.0)
+                earnings = dataframe['hand_result'].sum()
+
+                # Debug output
+                non_zero_results = (dataframe['hand_result'] != 0).sum()
+                if non_zero_results == 0:
+                    logger.warning("All %s hands have hand_result = 0.0", number_of_hands)
+                    logger.debug("Sample hand_result values: %s", dataframe['hand_result'].head(10).tolist())
+
+                # Calculate BB earnings (handle division by zero)
+                # Check bb_stake column
+                if 'bb_stake' not in dataframe.columns:
+                    logger.warning("bb_stake column missing from dataframe")
+                    bb_stakes = pd.Series([0.25] * len(dataframe))  # Default to 0.25 if missing
+                else:
+                    bb_stakes = dataframe['bb_stake'].fillna(0.25)  # Default to 0.25 if NaN
+                    # Replace 0 with default to avoid division by zero
+                    bb_stakes = bb_stakes.replace(0.0, 0.25)
+
+                # Debug: Check bb_stake values
+                zero_bb_stakes = (bb_stakes == 0).sum()
+                if zero_bb_stakes > 0:
+                    logger.warning("%s hands have bb_stake = 0, using default 0.25", zero_bb_stakes)
+
+                dataframe['BB_earnings'] = dataframe['hand_result'] / bb_stakes
+                BB_earnings = dataframe['BB_earnings'].sum()
+
+                # Debug output for BB earnings
+                if BB_earnings == 0.0 and earnings != 0.0:
+                    logger.warning("BB_earnings is 0.0 but earnings is %s", earnings)
+                    if logger.isEnabledFor(logging.DEBUG):
+                        logger.debug("Sample bb_stake values: %s", bb_stakes.head(10).tolist())
+                        logger.debug("Sample hand_result values: %s", dataframe['hand_result'].head(10).tolist())
+                        logger.debug("Sample BB_earnings values: %s", dataframe['BB_earnings'].head(10).tolist())
+
+            tallies['Session Earnings'] = {'hands': number_of_hands, 'earnings': earnings, 'bb_earnings': BB_earnings}
         # IMPORTANT: Always calculate VPIP on the FULL dataset, not filtered by flop/turn/river
         # VPIP is a preflop metric and should include all hands, not just those that saw postflop streets
-        vpip = self.calculate_vpip(dataframe)
-        vpip_rfi = self.calculate_rfi_vpip_metrics(dataframe)
-
-        # Include HJ (5-handed) and gracefully handle any unexpected positions
-        default_positions = ['UTG', 'HJ', 'MP', 'CO', 'BTN', 'SB', 'BB']
-        positional_profitability = {pos: 0 for pos in default_positions}
-
-        # Ensure any positions present in the data exist in the accumulator
-        for pos in dataframe['position'].dropna().unique():
-            positional_profitability.setdefault(pos, 0)
-
-        for _, row in dataframe.iterrows():
-            position = row.get('position')
-            if pd.isna(position):
-                continue
-            if position not in positional_profitability:
-                positional_profitability[position] = 0
-            positional_profitability[position] += row['hand_result'] / row['bb_stake']
+        with timer.stage('metrics.VPIP Info', number_of_hands):
+            tallies['VPIP Info'] = self.vpip_tally(dataframe)
+        with timer.stage('metrics.RFI VPIP Info', number_of_hands):
+            tallies['RFI VPIP Info'] = self.rfi_vpip_tally(dataframe)
+
+        with timer.stage('metrics.Positional Profitability', number_of_hands):
+            # Include HJ (5-handed) and gracefully handle any unexpected positions
+            default_positions = ['UTG', 'HJ', 'MP', 'CO', 'BTN', 'SB', 'BB']
+            positional_profitability = {pos: 0 for pos in default_positions}
+
+            # Ensure any positions present in the data exist in the accumulator
+            for pos in dataframe['position'].dropna().unique():
+                positional_profitability.setdefault(pos, 0)
+
+            for _, row in dataframe.iterrows():
+                position = row.get('position')
+                if pd.isna(position):
+                    continue
+                if position not in positional_profitability:
+                    positional_profitability[position] = 0
+                positional_profitability[position] += row['hand_result'] / row['bb_stake']
 
-        rounded_positional_profitability = {pos: round(profit, 2) for pos, profit in positional_profitability.items()}
+            tallies['Positional Profitability'] = positional_profitability
 
         # Calculate IP and OP profitability post-flop
-        ip_profitability, op_profitability = self.calculate_ip_op_profitability(dataframe)
+        with timer.stage('metrics.IP/OP Profitability', number_of_hands):
+            tallies['IP/OP Profitability'] = self.ip_op_profitability_tally(dataframe)
 
         # Calculate in position percentage
-        in_position_percentage, out_position_percentage = self.calculate_in_position_percentage(dataframe)
+        with timer.stage('metrics.In Position Percentage', number_of_hands):
+            tallies['In Position Percentage'] = self.in_position_tally(dataframe)
 
         # Calculate bet rates for flop, turn, and river
-        streets = ['flop', 'turn', 'river']
-        for street in streets:
-            bet_rates = self.calculate_bet_rates(dataframe, street)
-            results.update(bet_rates)
+        with timer.stage('metrics.Bet Rates', number_of_hands):
+            tallies['Bet Rates'] = {street: self.bet_rates_tally(dataframe, street) for street in ['flop', 'turn', 'river']}
 
         # Calculate total hands that reached each street (for Action Frequency metrics)
         def count_street_hands(df, street_name):
@@ -5290,67 +5074,21 @@ class LadbrooksPokerHandProcessor:
             elif street_name == 'river' and 'river_HU_with_hero' in df.columns:
                 street_mask = street_mask | (df['river_HU_with_hero'] == True)
             
-            # Method 4: Check Raw Hand for street markers (most reliable)
-            def has_street_in_raw_hand(raw_hand, street):
-                if not raw_hand or not isinstance(raw_hand, str):
-                    return False
-                if street == 'flop':
-                    return '** Dealing Flop **' in raw_hand
-                elif street == 'turn':
-                    return '** Dealing Turn **' in raw_hand
-                elif street == 'river':
-                    return '** Dealing River **' in raw_hand
-                return False
-            
-            if 'Raw Hand' in df.columns:
+            # Method 4: Check which streets the hand was dealt (most reliable)
+            street_actions = self._street_actions_column(df)
+            if street_actions is not None:
                 # For turn/river, only count hands where Hero reached that street
                 if street_name in ['turn', 'river']:
-                    def hero_reached_street(raw_hand):
-                        if not raw_hand or not isinstance(raw_hand, str):
-                            return False
-                        if '** Dealing Flop **' not in raw_hand:
-                            return False
-                        if street_name == 'turn' and '** Dealing Turn **' not in raw_hand:
-                            return False
-                        if street_name == 'river' and '** Dealing River **' not in raw_hand:
-                            return False
-
-                        # Preflop: Hero must not fold before flop
-                        if '** Dealing down cards **' in raw_hand:
-                            preflop = raw_hand.split('** Dealing down cards **')[1].split('** Dealing Flop **')[0]
-                            if 'Hero folds' in preflop:
-                                return False
-
-                        # Flop: Hero must not fold before turn/river
-                        flop_section = raw_hand.split('** Dealing Flop **')[1]
-                        if '** Dealing Turn **' in flop_section:
-                            flop_section = flop_section.split('** Dealing Turn **')[0]
-                        elif '** Summary **' in flop_section:
-                            flop_section = flop_section.split('** Summary **')[0]
-                        if 'Hero folds' in flop_section:
-                            return False
-
-                        if street_name == 'river':
-                            # Turn: Hero must not fold before river
-                            turn_section = raw_hand.split('** Dealing Turn **')[1]
-                            if '** Dealing River **' in turn_section:
-                                turn_section = turn_section.split('** Dealing River **')[0]
-                            elif '** Summary **' in turn_section:
-                                turn_section = turn_section.split('** Summary **')[0]
-                            if 'Hero folds' in turn_section:
-                                return False
-
-                        return True
-
-                    street_mask = street_mask | df['Raw Hand'].apply(hero_reached_street)
+                    street_mask = street_mask | street_actions.apply(
+                        lambda actions: self._hero_reached_street(actions, street_name)).astype(bool)
                 else:
-                    street_mask = street_mask | df['Raw Hand'].apply(lambda x: has_street_in_raw_hand(x, street_name))
+                    street_mask = street_mask | self._street_dealt_mask(df, street_name)
             
             return street_mask.sum()
         
         # Calculate detailed flop action frequency with IP/OOP/Multiway breakdown
-        def calculate_flop_action_frequency(df):
-            """Calculate flop action frequency broken down by IP/OOP/Multiway"""
+        def flop_action_frequency_tally(df):
+            """Count flop actions broken down by IP/OOP/Multiway; the overall counts are added up at the end"""
             stats = {
                 'total_hands': 0,
                 'ip': {
@@ -5387,42 +5125,26 @@ class LadbrooksPokerHandProcessor:
                 flop_mask = pd.Series([False] * len(df), index=df.index)
                 if 'flop' in df.columns:
                     flop_mask = flop_mask | (df['flop'] == True)
-                if 'Raw Hand' in df.columns:
-                    flop_mask = flop_mask | df['Raw Hand'].apply(lambda x: '** Dealing Flop **' in str(x) if x else False)
+                street_actions = self._street_actions_column(df)
+                if street_actions is not None:
+                    flop_mask = flop_mask | self._street_dealt_mask(df, 'flop')
                 
                 # CRITICAL: Only count hands where Hero is active on flop (didn't fold preflop)
                 if 'hero_is_active_on_flop' in df.columns:
                     flop_mask = flop_mask & (df['hero_is_active_on_flop'] == True)
                 elif 'hero_saw_flop' in df.columns:
                     flop_mask = flop_mask & (df['hero_saw_flop'] == True)
-                # Also verify from Raw Hand that Hero didn't fold preflop
-                if 'Raw Hand' in df.columns:
-                    def hero_active_on_flop(raw_hand):
-                        """Check if Hero is active on flop (didn't fold preflop)"""
-                        if not raw_hand or not isinstance(raw_hand, str):
-                            return False
-                        if '** Dealing Flop **' not in raw_hand:
-                            return False
-                        # Check if Hero folded before flop
-                        if '** Dealing down cards **' in raw_hand and '** Dealing Flop **' in raw_hand:
-                            preflop = raw_hand.split('** Dealing down cards **')[1].split('** Dealing Flop **')[0]
-                            # Look for Hero's actions in preflop
-                            hero_lines = [l.strip() for l in preflop.split('\n') if 'Hero' in l and l.strip()]
-                            for line in hero_lines:
-                                if 'folds' in line.lower() and 'Hero' in line:
-                                    return False  # Hero folded preflop
-                        return True  # Hero didn't fold preflop (or no fold found)
-                    
-                    hero_active_mask = df['Raw Hand'].apply(hero_active_on_flop)
+                # Also verify from the preflop actions that Hero didn't fold preflop
+                if street_actions is not None:
+                    hero_active_mask = street_actions.apply(
+                        lambda actions: self._hero_reached_street(actions, 'flop')).astype(bool)
                     flop_mask = flop_mask & hero_active_mask
                 
                 flop_df = df[flop_mask].copy()
                 if len(flop_df) == 0:
                     return stats
-            except Exception as e:
-                print(f"Error filtering flop hands: {e}")
-                import traceback
-                traceback.print_exc()
+            except Exception:
+                logger.exception("Error filtering flop hands")
                 return stats
             
             try:
@@ -5452,34 +5174,11 @@ class LadbrooksPokerHandProcessor:
                         except Exception:
                             pass
 
-                        # Fallback: derive multiway from raw hand by counting players remaining at flop
-                        if not is_multiway and 'Raw Hand' in flop_df.columns and pd.notna(row.get('Raw Hand', None)):
-                            raw_hand = str(row.get('Raw Hand', ''))
-                            if '** Dealing Flop **' in raw_hand:
-                                # Get all seated players
-                                players = []
-                                for line in raw_hand.split('\n'):
-                                    line = line.strip()
-                                    if line.startswith('Seat ') and ':' in line:
-                                        try:
-                                            name = line.split(':', 1)[1].strip().split(' ')[0]
-                                            if name:
-                                                players.append(name)
-                                        except Exception:
-                                            continue
-
-                                active_players = set(players)
-
-                                # Remove preflop folders
-                                if '** Dealing down cards **' in raw_hand:
-                                    preflop = raw_hand.split('** Dealing down cards **')[1].split('** Dealing Flop **')[0]
-                                    for line in preflop.split('\n'):
-                                        if 'folds' in line:
-                                            player = line.strip().split(' ')[0]
-                                            if player:
-                                                active_players.discard(player)
-
-                                is_multiway = len(active_players) >= 3
+                        # Fallback: derive multiway by counting players who hadn't folded before the flop
+                        if not is_multiway:
+                            street_actions = self._street_actions(row)
+                            if 'flop' in street_actions:
+                                is_multiway = len(self._players_left(street_actions, self._position_map(row), 'flop')) >= 3
                         
                         # Determine IP/OOP
                         is_ip = False
@@ -5533,31 +5232,9 @@ class LadbrooksPokerHandProcessor:
                         except Exception:
                             pass
                         
-                        # Also try to get from raw hand if available
-                        if not hero_first_action and 'Raw Hand' in flop_df.columns and pd.notna(row.get('Raw Hand', None)):
-                            raw_hand = str(row['Raw Hand'])
-                            if '** Dealing Flop **' in raw_hand:
-                                flop_section = raw_hand.split('** Dealing Flop **')[1]
-                                if '** Dealing Turn **' in flop_section:
-                                    flop_section = flop_section.split('** Dealing Turn **')[0]
-                                elif '** Summary **' in flop_section:
-                                    flop_section = flop_section.split('** Summary **')[0]
-                                
-                                # Look for Hero's first action
-                                for line in flop_section.split('\n'):
-                                    line = line.strip()
-                                    if 'Hero' in line:
-                                        if 'checks' in line.lower():
-                                            hero_first_action = 'checks'
-                                        elif 'bets' in line.lower():
-                                            hero_first_action = 'bets'
-                                        elif 'calls' in line.lower():
-                                            hero_first_action = 'calls'
-                                        elif 'folds' in line.lower():
-                                            hero_first_action = 'folds'
-                                        elif 'raises' in line.lower():
-                                            hero_first_action = 'raises'
-                                        break
+                        # Also try Hero's own actions on the flop
+                        if not hero_first_action:
+                            hero_first_action = self._hero_first_action(self._street_actions(row), 'flop')
                         
                         # Categorize and count
                         if is_multiway:
@@ -5602,24 +5279,15 @@ class LadbrooksPokerHandProcessor:
                     except Exception:
                         # Skip row-level failures but keep overall processing
                         continue
-            except Exception as e:
-                print(f"Error processing flop action rows: {e}")
-                import traceback
-                traceback.print_exc()
-            
-            # Ensure total_hands matches the categorized totals
-            stats['total_hands'] = stats['ip']['total'] + stats['oop']['total'] + stats['multiway']['total']
-            # Populate overall action counts from buckets
-            stats['bets'] = stats['ip']['bets'] + stats['oop']['bets'] + stats['multiway']['bets']
-            stats['checks'] = stats['ip']['checks'] + stats['oop']['checks'] + stats['multiway']['checks']
-            stats['calls'] = stats['ip']['calls'] + stats['oop']['calls'] + stats['multiway']['calls']
-            stats['folds'] = stats['ip']['folds'] + stats['oop']['folds'] + stats['multiway']['folds']
-            stats['raises'] = stats['ip']['raises'] + stats['oop']['raises'] + stats['multiway']['raises']
+            except Exception:
+                logger.exception("Error processing flop action rows")
             
+            # Overall counts are added up from the buckets once every hand is in
+            stats['rolled_up'] = 1
             return stats
 
-        def calculate_turn_action_frequency(df):
-            """Calculate turn action frequency broken down by IP/OOP"""
+        def count_turn_actions(turn_df):
+            """Count Hero's first turn action in each hand, broken down by IP/OOP"""
             stats = {
                 'total_hands': 0,
                 'bets': 0,
@@ -5667,41 +5335,6 @@ class LadbrooksPokerHandProcessor:
                 }
             }
 
-            if len(df) == 0:
-                return stats
-
-            # Filter to hands where Hero reached the turn
-            turn_mask = pd.Series([False] * len(df), index=df.index)
-            if 'hero_is_active_on_turn' in df.columns:
-                turn_mask = turn_mask | (df['hero_is_active_on_turn'] == True)
-            elif 'hero_saw_turn' in df.columns:
-                turn_mask = turn_mask | (df['hero_saw_turn'] == True)
-
-            if 'Raw Hand' in df.columns and not turn_mask.any():
-                def hero_reached_turn(raw_hand):
-                    if not raw_hand or not isinstance(raw_hand, str):
-                        return False
-                    if '** Dealing Flop **' not in raw_hand or '** Dealing Turn **' not in raw_hand:
-                        return False
-                    if '** Dealing down cards **' in raw_hand:
-                        preflop = raw_hand.split('** Dealing down cards **')[1].split('** Dealing Flop **')[0]
-                        if 'Hero folds' in preflop:
-                            return False
-                    flop_section = raw_hand.split('** Dealing Flop **')[1]
-                    if '** Dealing Turn **' in flop_section:
-                        flop_section = flop_section.split('** Dealing Turn **')[0]
-                    elif '** Summary **' in flop_section:
-                        flop_section = flop_section.split('** Summary **')[0]
-                    if 'Hero folds' in flop_section:
-                        return False
-                    return True
-
-                turn_mask = df['Raw Hand'].apply(hero_reached_turn)
-
-            turn_df = df[turn_mask].copy()
-            if len(turn_df) == 0:
-                return stats
-
             for _, row in turn_df.iterrows():
                 # Determine if multiway (3+ players active on turn)
                 is_multiway = False
@@ -5725,46 +5358,11 @@ class LadbrooksPokerHandProcessor:
                 except Exception:
                     pass
 
-                # Fallback: derive multiway from raw hand by counting players remaining at turn
-                if not is_multiway and 'Raw Hand' in turn_df.columns and pd.notna(row.get('Raw Hand', None)):
-                    raw_hand = str(row.get('Raw Hand', ''))
-                    if '** Dealing Flop **' in raw_hand and '** Dealing Turn **' in raw_hand:
-                        # Get all seated players
-                        players = []
-                        for line in raw_hand.split('\n'):
-                            line = line.strip()
-                            if line.startswith('Seat ') and ':' in line:
-                                try:
-                                    name = line.split(':', 1)[1].strip().split(' ')[0]
-                                    if name:
-                                        players.append(name)
-                                except Exception:
-                                    continue
-
-                        active_players = set(players)
-
-                        # Remove preflop folders
-                        if '** Dealing down cards **' in raw_hand:
-                            preflop = raw_hand.split('** Dealing down cards **')[1].split('** Dealing Flop **')[0]
-                            for line in preflop.split('\n'):
-                                if 'folds' in line:
-                                    player = line.strip().split(' ')[0]
-                                    if player:
-                                        active_players.discard(player)
-
-                        # Remove flop folders
-                        flop_section = raw_hand.split('** Dealing Flop **')[1]
-                        if '** Dealing Turn **' in flop_section:
-                            flop_section = flop_section.split('** Dealing Turn **')[0]
-                        elif '** Summary **' in flop_section:
-                            flop_section = flop_section.split('** Summary **')[0]
-                        for line in flop_section.split('\n'):
-                            if 'folds' in line:
-                                player = line.strip().split(' ')[0]
-                                if player:
-                                    active_players.discard(player)
-
-                        is_multiway = len(active_players) >= 3
+                # Fallback: derive multiway by counting players who hadn't folded before the turn
+                if not is_multiway:
+                    street_actions = self._street_actions(row)
+                    if 'turn' in street_actions:
+                        is_multiway = len(self._players_left(street_actions, self._position_map(row), 'turn')) >= 3
 
                 # Determine IP/OOP on turn
                 is_ip = None
@@ -5822,28 +5420,8 @@ class LadbrooksPokerHandProcessor:
                 except Exception:
                     pass
 
-                if not hero_first_action and 'Raw Hand' in turn_df.columns and pd.notna(row.get('Raw Hand', None)):
-                    raw_hand = str(row['Raw Hand'])
-                    if '** Dealing Turn **' in raw_hand:
-                        turn_section = raw_hand.split('** Dealing Turn **')[1]
-                        if '** Dealing River **' in turn_section:
-                            turn_section = turn_section.split('** Dealing River **')[0]
-                        elif '** Summary **' in turn_section:
-                            turn_section = turn_section.split('** Summary **')[0]
-                        for line in turn_section.split('\n'):
-                            line = line.strip()
-                            if 'Hero' in line:
-                                if 'checks' in line.lower():
-                                    hero_first_action = 'checks'
-                                elif 'bets' in line.lower():
-                                    hero_first_action = 'bets'
-                                elif 'calls' in line.lower():
-                                    hero_first_action = 'calls'
-                                elif 'folds' in line.lower():
-                                    hero_first_action = 'folds'
-                                elif 'raises' in line.lower():
-                                    hero_first_action = 'raises'
-                                break
+                if not hero_first_action:
+                    hero_first_action = self._hero_first_action(self._street_actions(row), 'turn')
 
                 if is_multiway:
                     target = stats['multiway']
@@ -5868,32 +5446,10 @@ class LadbrooksPokerHandProcessor:
                 else:
                     target['uncounted'] += 1
 
-            # Roll up totals
-            stats['total_hands'] = stats['ip']['total_hands'] + stats['oop']['total_hands'] + stats['multiway']['total_hands']
-            stats['bets'] = stats['ip']['bets'] + stats['oop']['bets'] + stats['multiway']['bets']
-            stats['checks'] = stats['ip']['checks'] + stats['oop']['checks'] + stats['multiway']['checks']
-            stats['calls'] = stats['ip']['calls'] + stats['oop']['calls'] + stats['multiway']['calls']
-            stats['folds'] = stats['ip']['folds'] + stats['oop']['folds'] + stats['multiway']['folds']
-            stats['raises'] = stats['ip']['raises'] + stats['oop']['raises'] + stats['multiway']['raises']
-
-            if stats['total_hands'] > 0:
-                stats['bet_pct'] = round((stats['bets'] / stats['total_hands']) * 100, 1)
-                stats['check_pct'] = round((stats['checks'] / stats['total_hands']) * 100, 1)
-
-            for key in ['ip', 'oop']:
-                total = stats[key]['total_hands']
-                if total > 0:
-                    stats[key]['bet_pct'] = round((stats[key]['bets'] / total) * 100, 1)
-                    stats[key]['check_pct'] = round((stats[key]['checks'] / total) * 100, 1)
-            total_multiway = stats['multiway']['total_hands']
-            if total_multiway > 0:
-                stats['multiway']['bet_pct'] = round((stats['multiway']['bets'] / total_multiway) * 100, 1)
-                stats['multiway']['check_pct'] = round((stats['multiway']['checks'] / total_multiway) * 100, 1)
-
             return stats
 
-        def calculate_river_action_frequency(df):
-            """Calculate river action frequency broken down by IP/OOP"""
+        def count_river_actions(river_df):
+            """Count Hero's first river action in each hand, broken down by IP/OOP"""
             stats = {
                 'total_hands': 0,
                 'bets': 0,
@@ -5941,47 +5497,6 @@ class LadbrooksPokerHandProcessor:
                 }
             }
 
-            if len(df) == 0:
-                return stats
-
-            river_mask = pd.Series([False] * len(df), index=df.index)
-            if 'hero_is_active_on_river' in df.columns:
-                river_mask = river_mask | (df['hero_is_active_on_river'] == True)
-            elif 'hero_saw_river' in df.columns:
-                river_mask = river_mask | (df['hero_saw_river'] == True)
-
-            if 'Raw Hand' in df.columns and not river_mask.any():
-                def hero_reached_river(raw_hand):
-                    if not raw_hand or not isinstance(raw_hand, str):
-                        return False
-                    if '** Dealing Flop **' not in raw_hand or '** Dealing River **' not in raw_hand:
-                        return False
-                    if '** Dealing down cards **' in raw_hand:
-                        preflop = raw_hand.split('** Dealing down cards **')[1].split('** Dealing Flop **')[0]
-                        if 'Hero folds' in preflop:
-                            return False
-                    flop_section = raw_hand.split('** Dealing Flop **')[1]
-                    if '** Dealing Turn **' in flop_section:
-                        flop_section = flop_section.split('** Dealing Turn **')[0]
-                    elif '** Summary **' in flop_section:
-                        flop_section = flop_section.split('** Summary **')[0]
-                    if 'Hero folds' in flop_section:
-                        return False
-                    turn_section = raw_hand.split('** Dealing Turn **')[1]
-                    if '** Dealing River **' in turn_section:
-                        turn_section = turn_section.split('** Dealing River **')[0]
-                    elif '** Summary **' in turn_section:
-                        turn_section = turn_section.split('** Summary **')[0]
-                    if 'Hero folds' in turn_section:
-                        return False
-                    return True
-
-                river_mask = df['Raw Hand'].apply(hero_reached_river)
-
-            river_df = df[river_mask].copy()
-            if len(river_df) == 0:
-                return stats
-
             for _, row in river_df.iterrows():
                 # Determine if multiway (3+ players active on river)
                 is_multiway = False
@@ -6005,53 +5520,11 @@ class LadbrooksPokerHandProcessor:
                 except Exception:
                     pass
 
-                if not is_multiway and 'Raw Hand' in river_df.columns and pd.notna(row.get('Raw Hand', None)):
-                    raw_hand = str(row.get('Raw Hand', ''))
-                    if '** Dealing Flop **' in raw_hand and '** Dealing River **' in raw_hand:
-                        players = []
-                        for line in raw_hand.split('\n'):
-                            line = line.strip()
-                            if line.startswith('Seat ') and ':' in line:
-                                try:
-                                    name = line.split(':', 1)[1].strip().split(' ')[0]
-                                    if name:
-                                        players.append(name)
-                                except Exception:
-                                    continue
-
-                        active_players = set(players)
-
-                        if '** Dealing down cards **' in raw_hand:
-                            preflop = raw_hand.split('** Dealing down cards **')[1].split('** Dealing Flop **')[0]
-                            for line in preflop.split('\n'):
-                                if 'folds' in line:
-                                    player = line.strip().split(' ')[0]
-                                    if player:
-                                        active_players.discard(player)
-
-                        flop_section = raw_hand.split('** Dealing Flop **')[1]
-                        if '** Dealing Turn **' in flop_section:
-                            flop_section = flop_section.split('** Dealing Turn **')[0]
-                        elif '** Summary **' in flop_section:
-                            flop_section = flop_section.split('** Summary **')[0]
-                        for line in flop_section.split('\n'):
-                            if 'folds' in line:
-                                player = line.strip().split(' ')[0]
-                                if player:
-                                    active_players.discard(player)
-
-                        turn_section = raw_hand.split('** Dealing Turn **')[1]
-                        if '** Dealing River **' in turn_section:
-                            turn_section = turn_section.split('** Dealing River **')[0]
-                        elif '** Summary **' in turn_section:
-                            turn_section = turn_section.split('** Summary **')[0]
-                        for line in turn_section.split('\n'):
-                            if 'folds' in line:
-                                player = line.strip().split(' ')[0]
-                                if player:
-                                    active_players.discard(player)
-
-                        is_multiway = len(active_players) >= 3
+                # Fallback: derive multiway by counting players who hadn't folded before the river
+                if not is_multiway:
+                    street_actions = self._street_actions(row)
+                    if 'river' in street_actions:
+                        is_multiway = len(self._players_left(street_actions, self._position_map(row), 'river')) >= 3
 
                 # Determine IP/OOP on river
                 is_ip = None
@@ -6107,26 +5580,8 @@ class LadbrooksPokerHandProcessor:
                 except Exception:
                     pass
 
-                if not hero_first_action and 'Raw Hand' in river_df.columns and pd.notna(row.get('Raw Hand', None)):
-                    raw_hand = str(row['Raw Hand'])
-                    if '** Dealing River **' in raw_hand:
-                        river_section = raw_hand.split('** Dealing River **')[1]
-                        if '** Summary **' in river_section:
-                            river_section = river_section.split('** Summary **')[0]
-                        for line in river_section.split('\n'):
-                            line = line.strip()
-                            if 'Hero' in line:
-                                if 'checks' in line.lower():
-                                    hero_first_action = 'checks'
-                                elif 'bets' in line.lower():
-                                    hero_first_action = 'bets'
-                                elif 'calls' in line.lower():
-                                    hero_first_action = 'calls'
-                                elif 'folds' in line.lower():
-                                    hero_first_action = 'folds'
-                                elif 'raises' in line.lower():
-                                    hero_first_action = 'raises'
-                                break
+                if not hero_first_action:
+                    hero_first_action = self._hero_first_action(self._street_actions(row), 'river')
 
                 if is_multiway:
                     target = stats['multiway']
@@ -6151,375 +5606,353 @@ class LadbrooksPokerHandProcessor:
                 else:
                     target['uncounted'] += 1
 
-            # Roll up totals
-            stats['total_hands'] = stats['ip']['total_hands'] + stats['oop']['total_hands'] + stats['multiway']['total_hands']
-            stats['bets'] = stats['ip']['bets'] + stats['oop']['bets'] + stats['multiway']['bets']
-            stats['checks'] = stats['ip']['checks'] + stats['oop']['checks'] + stats['multiway']['checks']
-            stats['calls'] = stats['ip']['calls'] + stats['oop']['calls'] + stats['multiway']['calls']
-            stats['folds'] = stats['ip']['folds'] + stats['oop']['folds'] + stats['multiway']['folds']
-            stats['raises'] = stats['ip']['raises'] + stats['oop']['raises'] + stats['multiway']['raises']
+            return stats
 
-            if stats['total_hands'] > 0:
-                stats['bet_pct'] = round((stats['bets'] / stats['total_hands']) * 100, 1)
-                stats['check_pct'] = round((stats['checks'] / stats['total_hands']) * 100, 1)
+        def street_action_tally(df, street, count_actions):
+            """Turn or river action counts for the hands where Hero reached the street.
 
-            for key in ['ip', 'oop', 'multiway']:
-                total = stats[key]['total_hands']
-                if total > 0:
-                    stats[key]['bet_pct'] = round((stats[key]['bets'] / total) * 100, 1)
-                    stats[key]['check_pct'] = round((stats[key]['checks'] / total) * 100, 1)
+            Those are the hands the hero_is_active column marks; only when it
+            marks none of the run's hands are they worked out from the actions,
+            so counts over those are kept aside until every hand is in.
+            """
+            street_mask = pd.Series([False] * len(df), index=df.index)
+            if f'hero_is_active_on_{street}' in df.columns:
+                street_mask = street_mask | (df[f'hero_is_active_on_{street}'] == True)
+            elif f'hero_saw_{street}' in df.columns:
+                street_mask = street_mask | (df[f'hero_saw_{street}'] == True)
+
+            tally = {
+                'active_hands': int(street_mask.sum()),
+                'counts': count_actions(df[street_mask].copy()),
+                'fallback_counts': count_actions(df.iloc[0:0]),
+            }
+            street_actions = self._street_actions_column(df)
+            if street_actions is not None and not street_mask.any():
+                reached_mask = street_actions.apply(
+                    lambda actions: self._hero_reached_street(actions, street)).astype(bool)
+                tally['fallback_counts'] = count_actions(df[reached_mask].copy())
+            return tally
 
-            return stats
-        
         # Calculate flop action frequency
-        try:
-            flop_action_freq = calculate_flop_action_frequency(dataframe)
-            # Ensure it always has the expected structure
-            if not isinstance(flop_action_freq, dict):
-                flop_action_freq = {'total_hands': 0, 'ip': {'total': 0, 'checks': 0, 'bets': 0, 'calls': 0, 'folds': 0, 'raises': 0},
-                                   'oop': {'total': 0, 'checks': 0, 'bets': 0, 'calls': 0, 'folds': 0, 'raises': 0},
-                                   'multiway': {'total': 0, 'checks': 0, 'bets': 0, 'calls': 0, 'folds': 0, 'raises': 0}}
-            # Always prefer the sum of categorized totals to avoid inconsistencies
-            derived_total = (
-                int(flop_action_freq.get('ip', {}).get('total', 0)) +
-                int(flop_action_freq.get('oop', {}).get('total', 0)) +
-                int(flop_action_freq.get('multiway', {}).get('total', 0))
-            )
-            if derived_total > 0:
-                flop_action_freq['total_hands'] = derived_total
-            print(f"Flop Action Frequency calculated: {flop_action_freq.get('total_hands', 0)} total flops")
-        except Exception as e:
-            print(f"Error calculating flop action frequency: {e}")
-            import traceback
-            traceback.print_exc()
-            flop_action_freq = {'total_hands': 0, 'ip': {'total': 0, 'checks': 0, 'bets': 0, 'calls': 0, 'folds': 0, 'raises': 0},
-                               'oop': {'total': 0, 'checks': 0, 'bets': 0, 'calls': 0, 'folds': 0, 'raises': 0},
-                               'multiway': {'total': 0, 'checks': 0, 'bets': 0, 'calls': 0, 'folds': 0, 'raises': 0}}
+        with timer.stage('metrics.Flop Action Frequency', number_of_hands) as stage:
+            try:
+                tallies['Flop Action Frequency'] = flop_action_frequency_tally(dataframe)
+            except Exception as e:
+                stage['failures'] += 1
+                logger.exception("Error calculating flop action frequency")
+                tallies['Flop Action Frequency'] = None
 
         # Calculate turn action frequency
-        try:
-            turn_action_freq = calculate_turn_action_frequency(dataframe)
-            if not isinstance(turn_action_freq, dict):
-                turn_action_freq = {
-                    'total_hands': 0,
-                    'bets': 0,
-                    'checks': 0,
-                    'calls': 0,
-                    'folds': 0,
-                    'raises': 0,
-                    'bet_pct': 0,
-                    'check_pct': 0,
-                    'ip': {'total_hands': 0, 'bets': 0, 'checks': 0, 'calls': 0, 'folds': 0, 'raises': 0, 'bet_pct': 0, 'check_pct': 0, 'uncounted': 0},
-                    'oop': {'total_hands': 0, 'bets': 0, 'checks': 0, 'calls': 0, 'folds': 0, 'raises': 0, 'bet_pct': 0, 'check_pct': 0, 'uncounted': 0}
-                }
-        except Exception as e:
-            print(f"Error calculating turn action frequency: {e}")
-            import traceback
-            traceback.print_exc()
-            turn_action_freq = {
-                'total_hands': 0,
-                'bets': 0,
-                'checks': 0,
-                'calls': 0,
-                'folds': 0,
-                'raises': 0,
-                'bet_pct': 0,
-                'check_pct': 0,
-                'ip': {'total_hands': 0, 'bets': 0, 'checks': 0, 'calls': 0, 'folds': 0, 'raises': 0, 'bet_pct': 0, 'check_pct': 0, 'uncounted': 0},
-                'oop': {'total_hands': 0, 'bets': 0, 'checks': 0, 'calls': 0, 'folds': 0, 'raises': 0, 'bet_pct': 0, 'check_pct': 0, 'uncounted': 0}
-            }
+        with timer.stage('metrics.Turn Action Frequency', number_of_hands) as stage:
+            try:
+                tallies['Turn Action Frequency'] = street_action_tally(dataframe, 'turn', count_turn_actions)
+            except Exception as e:
+                stage['failures'] += 1
+                logger.exception("Error calculating turn action frequency")
+                tallies['Turn Action Frequency'] = None
 
         # Calculate river action frequency
-        try:
-            river_action_freq = calculate_river_action_frequency(dataframe)
-            if not isinstance(river_action_freq, dict):
-                river_action_freq = {
-                    'total_hands': 0,
-                    'bets': 0,
-                    'checks': 0,
-                    'calls': 0,
-                    'folds': 0,
-                    'raises': 0,
-                    'bet_pct': 0,
-                    'check_pct': 0,
-                    'ip': {'total_hands': 0, 'bets': 0, 'checks': 0, 'calls': 0, 'folds': 0, 'raises': 0, 'bet_pct': 0, 'check_pct': 0, 'uncounted': 0},
-                    'oop': {'total_hands': 0, 'bets': 0, 'checks': 0, 'calls': 0, 'folds': 0, 'raises': 0, 'bet_pct': 0, 'check_pct': 0, 'uncounted': 0},
-                    'multiway': {'total_hands': 0, 'bets': 0, 'checks': 0, 'calls': 0, 'folds': 0, 'raises': 0, 'bet_pct': 0, 'check_pct': 0, 'uncounted': 0},
-                    'unknown': {'total_hands': 0}
-                }
-        except Exception as e:
-            print(f"Error calculating river action frequency: {e}")
-            import traceback
-            traceback.print_exc()
-            river_action_freq = {
-                'total_hands': 0,
-                'bets': 0,
-                'checks': 0,
-                'calls': 0,
-                'folds': 0,
-                'raises': 0,
-                'bet_pct': 0,
-                'check_pct': 0,
-                'ip': {'total_hands': 0, 'bets': 0, 'checks': 0, 'calls': 0, 'folds': 0, 'raises': 0, 'bet_pct': 0, 'check_pct': 0, 'uncounted': 0},
-                'oop': {'total_hands': 0, 'bets': 0, 'checks': 0, 'calls': 0, 'folds': 0, 'raises': 0, 'bet_pct': 0, 'check_pct': 0, 'uncounted': 0},
-                'multiway': {'total_hands': 0, 'bets': 0, 'checks': 0, 'calls': 0, 'folds': 0, 'raises': 0, 'bet_pct': 0, 'check_pct': 0, 'uncounted': 0},
-                'unknown': {'total_hands': 0}
-            }
-        
-        # Calculate and store Action Frequency for each street
+        with timer.stage('metrics.River Action Frequency', number_of_hands) as stage:
+            try:
+                tallies['River Action Frequency'] = street_action_tally(dataframe, 'river', count_river_actions)
+            except Exception as e:
+                stage['failures'] += 1
+                logger.exception("Error calculating river action frequency")
+                tallies['River Action Frequency'] = None
+
+        # Count the hands that reached each street, for streets whose action counts come up empty
         # For flop totals, count only hands where Hero is active on the flop
-        flop_total = None
-        try:
-            if 'hero_is_active_on_flop' in dataframe.columns:
-                flop_total = int((dataframe['hero_is_active_on_flop'] == True).sum())
-            elif 'hero_saw_flop' in dataframe.columns:
-                flop_total = int((dataframe['hero_saw_flop'] == True).sum())
-        except Exception:
+        with timer.stage('metrics.Action Frequency Totals', number_of_hands):
             flop_total = None
-
-        if flop_total is None:
-            flop_total = count_street_hands(dataframe, 'flop')
-        # For turn totals, count only hands where Hero reached the turn via the flop
-        turn_total = None
-        try:
-            has_turn_active = 'hero_is_active_on_turn' in dataframe.columns
-            has_turn_saw = 'hero_saw_turn' in dataframe.columns
-            has_flop_active = 'hero_is_active_on_flop' in dataframe.columns
-            has_flop_saw = 'hero_saw_flop' in dataframe.columns
-
-            if has_turn_active or has_turn_saw:
-                if has_turn_active:
-                    turn_mask = (dataframe['hero_is_active_on_turn'] == True)
-                else:
-                    turn_mask = (dataframe['hero_saw_turn'] == True)
-
-                # Ensure Hero also reached the flop first
-                if has_flop_active:
-                    turn_mask = turn_mask & (dataframe['hero_is_active_on_flop'] == True)
-                elif has_flop_saw:
-                    turn_mask = turn_mask & (dataframe['hero_saw_flop'] == True)
-
-                turn_total = int(turn_mask.sum())
-        except Exception:
+            try:
+                if 'hero_is_active_on_flop' in dataframe.columns:
+                    flop_total = int((dataframe['hero_is_active_on_flop'] == True).sum())
+                elif 'hero_saw_flop' in dataframe.columns:
+                    flop_total = int((dataframe['hero_saw_flop'] == True).sum())
+            except Exception:
+                flop_total = None
+
+            if flop_total is None:
+                flop_total = count_street_hands(dataframe, 'flop')
+            # For turn totals, count only hands where Hero reached the turn via the flop
             turn_total = None
+            try:
+                has_turn_active = 'hero_is_active_on_turn' in dataframe.columns
+                has_turn_saw = 'hero_saw_turn' in dataframe.columns
+                has_flop_active = 'hero_is_active_on_flop' in dataframe.columns
+                has_flop_saw = 'hero_saw_flop' in dataframe.columns
+
+                if has_turn_active or has_turn_saw:
+                    if has_turn_active:
+                        turn_mask = (dataframe['hero_is_active_on_turn'] == True)
+                    else:
+                        turn_mask = (dataframe['hero_saw_turn'] == True)
+
+                    # Ensure Hero also reached the flop first
+                    if has_flop_active:
+                        turn_mask = turn_mask & (dataframe['hero_is_active_on_flop'] == True)
+                    elif has_flop_saw:
+                        turn_mask = turn_mask & (dataframe['hero_saw_flop'] == True)
+
+                    turn_total = int(turn_mask.sum())
+            except Exception:
+                turn_total = None
+
+            if turn_total is None:
+                turn_total = count_street_hands(dataframe, 'turn')
+            river_total = count_street_hands(dataframe, 'river')
+
+            tallies['Action Frequency Totals'] = {'flop': int(flop_total), 'turn': int(turn_total), 'river': int(river_total)}
+
+        # Metrics whose failure only empties that metric
+        guarded = [
+            ('Flop High Card Analysis', lambda: self.street_high_card_tally(dataframe, 'flop')),
+            ('Turn High Card Analysis', lambda: self.street_high_card_tally(dataframe, 'turn')),
+            ('River High Card Analysis', lambda: self.street_high_card_tally(dataframe, 'river')),
+            ('Board High Card Analysis', lambda: self.board_high_card_tally(dataframe)),
+            ('Hand Matrix Analysis', lambda: self.hand_matrix_tally(dataframe)),
+            ('RFI Matrix Analysis', lambda: self.calculate_action_matrix_analysis(dataframe, 'rfi', 'total_rfi')),
+            ('3-Bet Matrix Analysis', lambda: self.calculate_action_matrix_analysis(dataframe, 'three_bet', 'total_three_bet')),
+            ('4-Bet Matrix Analysis', lambda: self.calculate_action_matrix_analysis(dataframe, 'four_bet', 'total_four_bet')),
+            ('Leak Detection', lambda: self.leak_detection_tally(dataframe)),
+            ('Flop Positional Matchups', lambda: self.street_positional_matchups_tally(dataframe, 'flop')),
+            ('Turn Positional Matchups', lambda: self.street_positional_matchups_tally(dataframe, 'turn')),
+            ('River Positional Matchups', lambda: self.street_positional_matchups_tally(dataframe, 'river')),
+            ('Positional Matchups', lambda: self.overall_positional_matchups_tally(dataframe)),
+            ('Biggest Hands', lambda: self.biggest_hands_tally(dataframe)),
+        ]
+        for name, tally in guarded:
+            with timer.stage(f'metrics.{name}', number_of_hands) as stage:
+                try:
+                    tallies[name] = tally()
+                except Exception:
+                    stage['failures'] += 1
+                    logger.exception("Error calculating %s", name)
+                    tallies[name] = None
+
+        with timer.stage('metrics.Three bet info', len(df_six_players)):
+            tallies['Three bet info'] = self.three_bet_tally(df_six_players)
+        with timer.stage('metrics.Four bet info', len(df_six_players)):
+            tallies['Four bet info'] = self.four_bet_tally(df_six_players)
+        with timer.stage('metrics.Iso Raise info', number_of_hands):
+            tallies['Iso Raise info'] = self.iso_raise_tally(dataframe)
+        return tallies
+
+    def merge_metric_tallies(self, total, tally):
+        """Add one frame's metric tallies into another's (see metric_tallies) and return the sum"""
+        total = _add_tallies(total, tally)
+        if total.get('Biggest Hands') is not None:
+            total['Biggest Hands'] = self._top_biggest_hands(total['Biggest Hands'])
+        return total
+
+    def results_from_tallies(self, tallies):
+        """The one-row results frame for a run's metric tallies"""
+        if not tallies:
+            return pd.DataFrame([{}])
+        # Finishing rounds and fills in the tallies in place; callers may still be adding to theirs
+        tallies = copy.deepcopy(tallies)
+        results = {}
+        number_of_hands = tallies['Session Earnings']['hands']
 
-        if turn_total is None:
-            turn_total = count_street_hands(dataframe, 'turn')
-        river_total = count_street_hands(dataframe, 'river')
-        
-        # Ensure flop_action_freq has total_hands set correctly
-        if isinstance(flop_action_freq, dict):
-            if flop_action_freq.get('total_hands', 0) == 0:
-                flop_action_freq['total_hands'] = int(flop_total)
-        
+        for street in ['flop', 'turn', 'river']:
+            results.update(self.bet_rates_from_tally(tallies['Bet Rates'][street], street))
+
+        street_totals = tallies['Action Frequency Totals']
+        flop_action_freq = tallies['Flop Action Frequency']
+        if flop_action_freq is None:
+            flop_action_freq = {'total_hands': 0, 'ip': {'total': 0, 'checks': 0, 'bets': 0, 'calls': 0, 'folds': 0, 'raises': 0},
+                                'oop': {'total': 0, 'checks': 0, 'bets': 0, 'calls': 0, 'folds': 0, 'raises': 0},
+                                'multiway': {'total': 0, 'checks': 0, 'bets': 0, 'calls': 0, 'folds': 0, 'raises': 0}}
+        if flop_action_freq.pop('rolled_up', 0):
+            # Populate overall action counts from buckets
+            for action in ['bets', 'checks', 'calls', 'folds', 'raises']:
+                flop_action_freq[action] = (flop_action_freq['ip'][action] + flop_action_freq['oop'][action]
+                                            + flop_action_freq['multiway'][action])
+        # Always prefer the sum of categorized totals to avoid inconsistencies
+        flop_action_freq['total_hands'] = (
+            flop_action_freq['ip']['total'] + flop_action_freq['oop']['total'] + flop_action_freq['multiway']['total']
+        ) or street_totals['flop']
         results['Flop Action Frequency'] = flop_action_freq
-        print(f"Stored Flop Action Frequency in results: {results.get('Flop Action Frequency', {}).get('total_hands', 'NOT FOUND')}")
-        if isinstance(turn_action_freq, dict) and turn_action_freq.get('total_hands', 0) == 0:
-            turn_action_freq['total_hands'] = int(turn_total)
-        results['Turn Action Frequency'] = turn_action_freq
-        if isinstance(river_action_freq, dict) and river_action_freq.get('total_hands', 0) == 0:
-            river_action_freq['total_hands'] = int(river_total)
-        results['River Action Frequency'] = river_action_freq
-
-        # Calculate high card analysis for each street
-        try:
-            flop_high_card = self.calculate_street_high_card_analysis(dataframe, 'flop')
-        except Exception as e:
-            print(f"Error calculating flop high card: {e}")
-            flop_high_card = {}
-        
-        try:
-            turn_high_card = self.calculate_street_high_card_analysis(dataframe, 'turn')
-        except Exception as e:
-            print(f"Error calculating turn high card: {e}")
-            turn_high_card = {}
-        
-        try:
-            river_high_card = self.calculate_street_high_card_analysis(dataframe, 'river')
-        except Exception as e:
-            print(f"Error calculating river high card: {e}")
-            river_high_card = {}
-        
-        # Calculate board high card analysis
-        try:
-            board_high_card = self.calculate_board_high_card_analysis(dataframe)
-        except Exception as e:
-            print(f"Error calculating board high card: {e}")
-            board_high_card = {}
-        
-        # Calculate hand matrix analysis
-        try:
-            hand_matrix = self.calculate_hand_matrix_analysis(dataframe)
-            # Debug: print how many hands were found
-            total_hands_in_matrix = sum(
-                sum(combo_data.get('total_hands', 0) for combo_data in group.values() if isinstance(combo_data, dict))
-                for group in hand_matrix.values() if isinstance(group, dict)
-            )
-            if total_hands_in_matrix > 0:
-                print(f"Generated hand matrix with {total_hands_in_matrix} total hands")
-        except Exception as e:
-            print(f"Error calculating hand matrix: {e}")
-            import traceback
-            traceback.print_exc()
-            hand_matrix = {'Pairs': {}, 'Suited': {}, 'Offsuit': {}}
+        logger.debug("Stored Flop Action Frequency in results: %s", flop_action_freq['total_hands'])
+
+        empty_counts = {'total_hands': 0, 'bets': 0, 'checks': 0, 'calls': 0, 'folds': 0, 'raises': 0, 'bet_pct': 0, 'check_pct': 0, 'uncounted': 0}
+        for street in ['turn', 'river']:
+            tally = tallies[f'{street.capitalize()} Action Frequency']
+            if tally is None:
+                stats = {'total_hands': 0, 'bets': 0, 'checks': 0, 'calls': 0, 'folds': 0, 'raises': 0, 'bet_pct': 0, 'check_pct': 0,
+                         'ip': dict(empty_counts), 'oop': dict(empty_counts)}
+                if street == 'river':
+                    stats.update({'multiway': dict(empty_counts), 'unknown': {'total_hands': 0}})
+            else:
+                stats = tally['counts'] if tally['active_hands'] else tally['fallback_counts']
+                # Roll up totals
+                for key in ['total_hands', 'bets', 'checks', 'calls', 'folds', 'raises']:
+                    stats[key] = stats['ip'][key] + stats['oop'][key] + stats['multiway'][key]
+                for group in [stats, stats['ip'], stats['oop'], stats['multiway']]:
+                    if group['total_hands'] > 0:
+                        group['bet_pct'] = round((group['bets'] / group['total_hands']) * 100, 1)
+                        group['check_pct'] = round((group['checks'] / group['total_hands']) * 100, 1)
+            if stats['total_hands'] == 0:
+                stats['total_hands'] = street_totals[street]
+            results[f'{street.capitalize()} Action Frequency'] = stats
+
+        earnings = tallies['Session Earnings']['earnings']
+        BB_earnings = tallies['Session Earnings']['bb_earnings']
+        BB_earnings_per_100_hands = BB_earnings * 100 / number_of_hands if number_of_hands > 0 else 0
+        ip_profitability, op_profitability = self.ip_op_profitability_from_tally(tallies['IP/OP Profitability'])
+        in_position_percentage, out_position_percentage = self.in_position_from_tally(tallies['In Position Percentage'])
 
-        # Calculate RFI/3-bet/4-bet matrices (counts)
-        try:
-            rfi_matrix = self.calculate_action_matrix_analysis(dataframe, 'rfi', 'total_rfi')
-        except Exception as e:
-            print(f"Error calculating RFI matrix: {e}")
-            rfi_matrix = {}
+        def finish(name, from_tally, default):
+            tally = tallies[name]
+            return default if tally is None else from_tally(tally)
 
-        try:
-            three_bet_matrix = self.calculate_action_matrix_analysis(dataframe, 'three_bet', 'total_three_bet')
-        except Exception as e:
-            print(f"Error calculating 3-bet matrix: {e}")
-            three_bet_matrix = {}
+        hand_matrix = finish('Hand Matrix Analysis', self.hand_matrix_from_tally, {'Pairs': {}, 'Suited': {}, 'Offsuit': {}})
+        total_hands_in_matrix = sum(
+            sum(combo_data.get('total_hands', 0) for combo_data in group.values() if isinstance(combo_data, dict))
+            for group in hand_matrix.values() if isinstance(group, dict)
+        )
+        if total_hands_in_matrix > 0:
+            logger.debug("Generated hand matrix with %s total hands", total_hands_in_matrix)
 
-        try:
-            four_bet_matrix = self.calculate_action_matrix_analysis(dataframe, 'four_bet', 'total_four_bet')
-        except Exception as e:
-            print(f"Error calculating 4-bet matrix: {e}")
-            four_bet_matrix = {}
-        
-        # Calculate leak detection
-        try:
-            leaks = self.calculate_leak_detection(dataframe)
-        except Exception as e:
-            print(f"Error calculating leaks: {e}")
-            leaks = []
-        
-        # Calculate positional matchups for each street
-        try:
-            flop_positional_matchups = self.calculate_street_positional_matchups(dataframe, 'flop')
-        except Exception as e:
-            print(f"Error calculating flop positional matchups: {e}")
-            flop_positional_matchups = {}
-        
-        try:
-            turn_positional_matchups = self.calculate_street_positional_matchups(dataframe, 'turn')
-        except Exception as e:
-            print(f"Error calculating turn positional matchups: {e}")
-            turn_positional_matchups = {}
-        
-        try:
-            river_positional_matchups = self.calculate_street_positional_matchups(dataframe, 'river')
-        except Exception as e:
-            print(f"Error calculating river positional matchups: {e}")
-            river_positional_matchups = {}
-        
-        # Calculate overall positional matchups (combine all streets, use flop as primary since most hands reach flop)
-        try:
-            overall_positional_matchups = self.calculate_overall_positional_matchups(dataframe)
-            # Ensure we always return a dict structure even if empty
-            if not overall_positional_matchups:
-                overall_positional_matchups = {}
-            # If no pot types found or all are empty, use flop matchups as fallback
-            if not overall_positional_matchups or all(not v or (isinstance(v, dict) and len(v) == 0) for v in overall_positional_matchups.values()):
-                # Use flop matchups as overall, wrap in RFI Pots structure
-                if flop_positional_matchups and isinstance(flop_positional_matchups, dict) and len(flop_positional_matchups) > 0:
-                    overall_positional_matchups = {'RFI Pots': flop_positional_matchups}
-                else:
-                    # If even flop is empty, return empty dict (not a dict with empty dict inside)
-                    overall_positional_matchups = {}
-            # If no pot types found, at least return empty structure
-            if not isinstance(overall_positional_matchups, dict):
-                overall_positional_matchups = {}
-            # Debug: print how many matchups were found
-            total_matchups = sum(len(v) if isinstance(v, dict) else 0 for v in overall_positional_matchups.values())
-            if total_matchups > 0:
-                print(f"Generated {total_matchups} positional matchups across {len(overall_positional_matchups)} pot types")
-        except Exception as e:
-            print(f"Error calculating overall positional matchups: {e}")
-            import traceback
-            traceback.print_exc()
-            # Fallback: use flop matchups as overall, but wrap in RFI Pots structure
-            if flop_positional_matchups and isinstance(flop_positional_matchups, dict) and len(flop_positional_matchups) > 0:
-                overall_positional_matchups = {'RFI Pots': flop_positional_matchups}
-            else:
-                overall_positional_matchups = {}
-        
-        # Calculate biggest hands
-        try:
-            biggest_hands = self.calculate_biggest_hands(dataframe)
-            # Debug: print how many hands were found
-            total_biggest = len(biggest_hands.get('biggest_wins', [])) + len(biggest_hands.get('biggest_losses', []))
-            if total_biggest > 0:
-                print(f"Generated {len(biggest_hands.get('biggest_wins', []))} biggest wins and {len(biggest_hands.get('biggest_losses', []))} biggest losses")
-        except Exception as e:
-            print(f"Error calculating biggest hands: {e}")
-            import traceback
-            traceback.print_exc()
-            biggest_hands = {'biggest_wins': [], 'biggest_losses': []}
+        flop_positional_matchups = finish('Flop Positional Matchups', self._average_bb_earnings, {})
+        overall_positional_matchups = finish('Positional Matchups', self.overall_positional_matchups_from_tally, {})
+        # If no pot types found or all are empty, use flop matchups as overall, wrapped in the RFI Pots structure
+        if not overall_positional_matchups or all(not v for v in overall_positional_matchups.values()):
+            overall_positional_matchups = {'RFI Pots': flop_positional_matchups} if flop_positional_matchups else {}
+
+        biggest_hands = finish('Biggest Hands', self.biggest_hands_from_tally, {'biggest_wins': [], 'biggest_losses': []})
+        if biggest_hands['biggest_wins'] or biggest_hands['biggest_losses']:
+            logger.debug("Generated %s biggest wins and %s biggest losses",
+                         len(biggest_hands['biggest_wins']), len(biggest_hands['biggest_losses']))
 
         results['Session Earnings'] = round(earnings, 2)
         results['Session BB Earnings'] = round(BB_earnings, 2)
         results['BB per 100 hands'] = round(BB_earnings_per_100_hands, 2)
         results['Total Hands'] = number_of_hands  # Total hands in dataset
-        results['VPIP Info'] = vpip
-        results['RFI VPIP Info'] = vpip_rfi
-        results['Positional Profitability'] = rounded_positional_profitability
-        results['Three bet info'] = self.get_three_bet_metrics(df_six_players)
-        results['Four bet info'] = self.get_four_bet_metrics(df_six_players)
+        results['VPIP Info'] = self.vpip_from_tally(tallies['VPIP Info'])
+        results['RFI VPIP Info'] = self.rfi_vpip_from_tally(tallies['RFI VPIP Info'])
+        results['Positional Profitability'] = {pos: round(profit, 2) for pos, profit in tallies['Positional Profitability'].items()}
+        results['Three bet info'] = self.three_bet_from_tally(tallies['Three bet info'])
+        results['Four bet info'] = self.four_bet_from_tally(tallies['Four bet info'])
         results['IP Profitability'] = ip_profitability
         results['OP Profitability'] = op_profitability
         results['In Position Percentage'] = in_position_percentage
         results['Out Of Position Percentage'] = out_position_percentage
-        results['Iso Raise info'] = self.get_iso_raise_metrics(dataframe)
-        results['Flop High Card Analysis'] = flop_high_card
-        results['Turn High Card Analysis'] = turn_high_card
-        results['River High Card Analysis'] = river_high_card
-        results['Board High Card Analysis'] = board_high_card
+        results['Iso Raise info'] = self.iso_raise_from_tally(tallies['Iso Raise info'])
+        results['Flop High Card Analysis'] = finish('Flop High Card Analysis', self._average_bb_earnings, {})
+        results['Turn High Card Analysis'] = finish('Turn High Card Analysis', self._average_bb_earnings, {})
+        results['River High Card Analysis'] = finish('River High Card Analysis', self._average_bb_earnings, {})
+        results['Board High Card Analysis'] = finish('Board High Card Analysis', self._average_bb_earnings, {})
         results['Hand Matrix Analysis'] = hand_matrix
-        results['RFI Matrix Analysis'] = rfi_matrix
-        results['3-Bet Matrix Analysis'] = three_bet_matrix
-        results['4-Bet Matrix Analysis'] = four_bet_matrix
-        results['Leak Detection'] = leaks
+        results['RFI Matrix Analysis'] = finish('RFI Matrix Analysis', dict, {})
+        results['3-Bet Matrix Analysis'] = finish('3-Bet Matrix Analysis', dict, {})
+        results['4-Bet Matrix Analysis'] = finish('4-Bet Matrix Analysis', dict, {})
+        results['Leak Detection'] = finish('Leak Detection', self.leak_detection_from_tally, [])
         results['Positional Matchups'] = overall_positional_matchups  # Overall matchups for boards and hands section
         results['Flop Positional Matchups'] = flop_positional_matchups
-        results['Turn Positional Matchups'] = turn_positional_matchups
-        results['River Positional Matchups'] = river_positional_matchups
+        results['Turn Positional Matchups'] = finish('Turn Positional Matchups', self._average_bb_earnings, {})
+        results['River Positional Matchups'] = finish('River Positional Matchups', self._average_bb_earnings, {})
         results['Biggest Hands'] = biggest_hands
 
-        # Convert nested dicts to JSON strings so pandas can serialize them properly
-        import json
-        nested_keys = ['Flop High Card Analysis', 'Turn High Card Analysis', 'River High Card Analysis', 
-                      'Board High Card Analysis', 'Hand Matrix Analysis', 'RFI Matrix Analysis',
-                      '3-Bet Matrix Analysis', '4-Bet Matrix Analysis', 'Leak Detection',
-                      'Positional Matchups', 'Flop Positional Matchups', 'Turn Positional Matchups', 'River Positional Matchups',
-                      'Biggest Hands',
-                      'VPIP Info', 'RFI VPIP Info', 'Three bet info', 'Four bet info', 'Iso Raise info', 'Positional Profitability',
-                      'Flop Action Frequency', 'Turn Action Frequency', 'River Action Frequency']
-        
+        return pd.DataFrame([self.serialize_results(results)])
+
+    def serialize_results(self, results):
+        """Convert nested dicts to JSON strings so pandas can serialize them properly"""
         results_for_df = {}
         for key, value in results.items():
-            if key in nested_keys and isinstance(value, (dict, list)):
+            if key in self.NESTED_RESULT_KEYS and isinstance(value, (dict, list)):
                 results_for_df[key] = json.dumps(value)
             else:
                 results_for_df[key] = value
-        
-        results_df = pd.DataFrame([results_for_df])
+        return results_for_df
 
-        return results_df
+    def calculate_standalone_metric(self, name, dataframe):
+        """Recompute one metric from a stored hand frame.
 
-    def process_ladbrooks(self):
+        Returns the results entries for the metric, or None when the metric
+        only comes out of a full advanced_processing run (it depends on other
+        metrics or gives different answers on a stored frame).
+        """
+        calculators = {
+            'VPIP Info': lambda: self.calculate_vpip(dataframe),
+            'RFI VPIP Info': lambda: self.calculate_rfi_vpip_metrics(dataframe),
+            'Four bet info': lambda: self.get_four_bet_metrics(dataframe[dataframe['no_players'] == 6]),
+            'Iso Raise info': lambda: self.get_iso_raise_metrics(dataframe),
+            'IP Profitability': lambda: self.calculate_ip_op_profitability(dataframe)[0],
+            'OP Profitability': lambda: self.calculate_ip_op_profitability(dataframe)[1],
+            'In Position Percentage': lambda: self.calculate_in_position_percentage(dataframe)[0],
+            'Out Of Position Percentage': lambda: self.calculate_in_position_percentage(dataframe)[1],
+            'Flop High Card Analysis': lambda: self.calculate_street_high_card_analysis(dataframe, 'flop'),
+            'Turn High Card Analysis': lambda: self.calculate_street_high_card_analysis(dataframe, 'turn'),
+            'River High Card Analysis': lambda: self.calculate_street_high_card_analysis(dataframe, 'river'),
+            'Board High Card Analysis': lambda: self.calculate_board_high_card_analysis(dataframe),
+            'RFI Matrix Analysis': lambda: self.calculate_action_matrix_analysis(dataframe, 'rfi', 'total_rfi'),
+            '3-Bet Matrix Analysis': lambda: self.calculate_action_matrix_analysis(dataframe, 'three_bet', 'total_three_bet'),
+            '4-Bet Matrix Analysis': lambda: self.calculate_action_matrix_analysis(dataframe, 'four_bet', 'total_four_bet'),
+            'Leak Detection': lambda: self.calculate_leak_detection(dataframe),
+            'Turn Positional Matchups': lambda: self.calculate_street_positional_matchups(dataframe, 'turn'),
+            'River Positional Matchups': lambda: self.calculate_street_positional_matchups(dataframe, 'river'),
+            'Biggest Hands': lambda: self.calculate_biggest_hands(dataframe),
+        }
+        if name == 'Bet Rates':
+            bet_rates = {}
+            for street in ['flop', 'turn', 'river']:
+                bet_rates.update(self.calculate_bet_rates(dataframe, street))
+            return bet_rates
+        if name not in calculators:
+            return None
+        return {name: calculators[name]()}
+
+    def validate_hands(self, validate):
+        """Run a site's is_*_hands check as the timed validation stage"""
+        with self.timer.stage('validation', len(self.HAND_START_PATTERN.findall(self.data))) as stage:
+            is_valid, reason, valid_hands = validate()
+            stage['rows_out'] = len(valid_hands) if is_valid else 0
+            stage['failures'] = max((stage['rows_in'] or 0) - stage['rows_out'], 0)
+        return is_valid, reason, valid_hands
+
+    def finish_run(self, outcome):
+        """Log the run's hand problems and attach its stage timings to the results of a process_* call"""
+        self.issues.log_summary(f"{type(self).__name__} ({outcome[1]})")
+        results_df = outcome[3]
+        if not isinstance(results_df, pd.DataFrame):
+            results_df = pd.DataFrame()
+        results_df.attrs['stage_timings'] = self.timer.summary()
+        return outcome[:3] + (results_df,)
+
+    def validate(self):
+        """This site's check of the whole file: (is valid, reason, the valid hands)"""
+        return self.is_ladbrooks_hands()
+
+    def process(self):
+        """Validate, parse and analyse the file: (is valid, reason, hands dataframe, results dataframe).
+
+        The hands of a file over the memory budget come back as StoredHandRows,
+        already referenced to the file, instead of a dataframe.
+        """
         try:
-            is_valid, reason, processed_data = self.is_ladbrooks_hands()
+            is_valid, reason, valid_hands = self.validate_hands(self.validate)
             if not is_valid:
-                return is_valid, reason, processed_data, 0
-            dataframe = self.process_hands(processed_data)
+                return self.finish_run((False, reason, pd.DataFrame(), pd.DataFrame()))
+            chunk_size = self.chunk_size(len(valid_hands))
+            if chunk_size:
+                dataframe, self.tallies = self.process_hands_in_chunks(valid_hands, chunk_size)
+            else:
+                dataframe = self.process_hands(valid_hands)
+                if dataframe is not None and not dataframe.empty:
+                    self.tallies = self.metric_tallies(dataframe)
             if dataframe is None or dataframe.empty:
-                return False, "No valid hands could be processed", pd.DataFrame(), pd.DataFrame()
-            results_df = self.advanced_processing(dataframe)
+                return self.finish_run((False, "No valid hands could be processed", pd.DataFrame(), pd.DataFrame()))
+            results_df = self.results_from_tallies(self.tallies)
             if results_df is None or results_df.empty:
-                return False, "Failed to generate results", dataframe, pd.DataFrame()
-            return is_valid, reason, dataframe, results_df
+                return self.finish_run((False, "Failed to generate results", dataframe, pd.DataFrame()))
+            return self.finish_run((is_valid, reason, dataframe, results_df))
         except Exception as e:
-            import traceback
-            error_details = traceback.format_exc()
-            print(f"Error in process_ladbrooks: {str(e)}")
-            print(f"Traceback: {error_details}")
-            return False, f"Processing error: {str(e)}", pd.DataFrame(), pd.DataFrame()
+            logger.exception("Error processing %s hands", type(self).__name__)
+            return self.finish_run((False, f"Processing error: {str(e)}", pd.DataFrame(), pd.DataFrame()))
+
+    def process_ladbrooks(self):
+        return self.process()
 
 
 
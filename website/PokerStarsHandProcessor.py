@@ -1,11 +1,13 @@
+import logging
 import re
-import pandas as pd
 from datetime import datetime
 from typing import List, Dict, Optional, Any
 from .LadbrooksPokerHandProcessor import (
     LadbrooksPokerHandProcessor, HandHistory, SeatInfo, Action, PlayerResult
 )
 
+logger = logging.getLogger(__name__)
+
 
 class PokerStarsHandProcessor(LadbrooksPokerHandProcessor):
     """Processor for PokerStars cash-game hand histories (6-max).
@@ -15,8 +17,8 @@ class PokerStarsHandProcessor(LadbrooksPokerHandProcessor):
     Tournament hands and non-6-max tables are automatically filtered out.
     """
 
-    def __init__(self, data, hero_name=None):
-        super().__init__(data)
+    def __init__(self, data, hero_name=None, timer=None, memory_budget_mb=None):
+        super().__init__(data, timer, memory_budget_mb)
         self.hero_name = hero_name
 
     # ------------------------------------------------------------------ #
@@ -34,10 +36,19 @@ class PokerStarsHandProcessor(LadbrooksPokerHandProcessor):
     #  Splitting & Validation                                              #
     # ------------------------------------------------------------------ #
 
+    HAND_START_PATTERN = re.compile(r'PokerStars Hand #')
+    HAND_SEPARATOR = "\n\n\n"
+
     def split_hands(self):
         parts = re.split(r'(?=PokerStars Hand #)', self.data)
         return [p for p in parts if p.strip()]
 
+    def raw_hand_from_source(self, hand):
+        hero_name = self.hero_name or self._detect_hero_name(hand)
+        if hero_name:
+            hand = self._replace_hero_name(hand, hero_name)
+        return hand
+
     def _extract_stakes_from_hand(self, hand):
         m = re.search(r'\(\$?([\d.]+)/\$?([\d.]+)\s*(?:USD|EUR|GBP)?\)', hand)
         if m:
@@ -584,20 +595,20 @@ class PokerStarsHandProcessor(LadbrooksPokerHandProcessor):
         return summary
 
     # ------------------------------------------------------------------ #
-    #  Raw Hand normalization (Ladbrokes compat for downstream analytics)  #
+    #  Raw Hand normalization (Ladbrokes layout for the hand display)     #
     # ------------------------------------------------------------------ #
 
     def _normalize_raw_hand(self, raw_hand):
         """Convert PokerStars section markers and action lines to Ladbrokes
-        format so that downstream analytics (flop action freq, biggest hands,
-        VPIP fallback, etc.) work without modification."""
+        format so the biggest hands can be shown by the Ladbrokes formatter.
+        Analytics read the structured per-hand columns instead."""
         if not raw_hand:
             return raw_hand
 
         text = raw_hand
 
-        # Inject "Total number of players :" before seat lines (needed by
-        # get_seat_info, _get_villain_position_from_raw_hand, etc.)
+        # Inject "Total number of players :" before seat lines (the
+        # formatter reads the seats after it)
         active_count = 0
         for line in text.split('\n'):
             line = line.strip()
@@ -659,11 +670,8 @@ class PokerStarsHandProcessor(LadbrooksPokerHandProcessor):
         text = '\n'.join(normalised_lines)
         return text
 
-    def parse_hand_to_history(self, hand):
-        hh = super().parse_hand_to_history(hand)
-        if hh and hh.raw_hand:
-            hh.raw_hand = self._normalize_raw_hand(hh.raw_hand)
-        return hh
+    def _format_hand_for_display(self, raw_hand):
+        return super()._format_hand_for_display(self._normalize_raw_hand(raw_hand))
 
     def get_button_seat(self, hand):
         m = re.search(r'Seat #?(\d+) is the button', hand)
@@ -685,20 +693,8 @@ class PokerStarsHandProcessor(LadbrooksPokerHandProcessor):
     #  Main entry point                                                    #
     # ------------------------------------------------------------------ #
 
+    def validate(self):
+        return self.is_pokerstars_hands()
+
     def process_pokerstars(self):
-        try:
-            is_valid, reason, valid_hands = self.is_pokerstars_hands()
-            if not is_valid:
-                return False, reason, pd.DataFrame(), {}
-            dataframe = self.process_hands(valid_hands)
-            if dataframe is None or dataframe.empty:
-                return False, "No valid hands could be processed", pd.DataFrame(), pd.DataFrame()
-            results_df = self.advanced_processing(dataframe)
-            if results_df is None or results_df.empty:
-                return False, "Failed to generate results", dataframe, pd.DataFrame()
-            return is_valid, reason, dataframe, results_df
-        except Exception as e:
-            import traceback
-            print(f"Error in process_pokerstars: {str(e)}")
-            print(f"Traceback: {traceback.format_exc()}")
-            return False, f"Processing error: {str(e)}", pd.DataFrame(), pd.DataFrame()
+        return self.process()
@@ -20,6 +20,11 @@ def create_app():
     db_path = path.join(app.instance_path, DB_NAME)
     app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{db_path}'
     app.config['UPLOAD_FOLDER'] = 'uploads'
+
+    # Module loggers log at LOG_LEVEL (INFO unless set) through Flask's handler
+    from .processing_log import configure_logging
+    configure_logging(app)
+
     db.init_app(app)
 
     migrate = Migrate(app, db)  # Initialize Flask-Migrate
@@ -30,13 +35,40 @@ def create_app():
     app.register_blueprint(views, url_prefix="/")
     app.register_blueprint(auth, url_prefix="/")
 
+    # Background jobs (uploads are processed by the worker pool)
+    from .jobs import init_job_workers
+    from . import uploads, reprocess  # Registers the job handlers
+    init_job_workers(app)
+
+    # .zip/.gz uploads are capped at MAX_ARCHIVE_MB as uploaded and MAX_UNPACKED_MB unpacked
+    from .uploads import init_uploads
+    init_uploads(app)
+
+    # A sample of processing runs is repeated with an alternative engine and compared (SHADOW_FRACTION, SHADOW_ENGINE)
+    from .shadow_mode import init_shadow_mode
+    init_shadow_mode(app)
+
+    from .commands import init_commands
+    init_commands(app)
+
+    # Admin-only request profiling (?profile=1, or PROFILE_REQUESTS for every admin request)
+    from .request_profiler import init_request_profiler
+    init_request_profiler(app)
+
     # Template helper to safely parse JSON strings when needed
     app.jinja_env.filters['fromjson'] = json.loads
 
-    from .models import User, Post, Comment, QuantMathResult, LiveSession  # Include your models
+    from .models import User, Post, Comment, QuantMathResult, LiveSession, UserStats, PostMatchup, Job, ImportedFile, LiveTail  # Include your models
 
     create_database(app)
 
+    # Bring older databases up to date with the post summary columns
+    from .post_summary import ensure_post_columns, backfill_post_summaries
+    with app.app_context():
+        db.create_all()  # Adds tables introduced after the database was created
+        ensure_post_columns()
+        backfill_post_summaries()
+
     login_manager = LoginManager()
     login_manager.login_view = "auth.login"
     login_manager.init_app(app)
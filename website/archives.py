@@ -0,0 +1,188 @@
+# This file unpacks uploaded .zip, .gz and .tar.gz archives of hand history files.
+# Each file is decompressed and split into hands a chunk at a time, and recognised by its site from its first few KB.
+# Hands are grouped by site and stake, and a hand found in more than one file (e.g. overlapping exports) is kept once.
+import codecs
+import gzip
+import io
+import os
+import tarfile
+import zipfile
+import zlib
+from dataclasses import dataclass, field
+
+from .sites import SNIFF_BYTES, UPLOAD_SITES, site_processor, sniff_category
+
+
+ARCHIVE_EXTENSIONS = ('.zip', '.gz', '.tgz')
+READ_CHUNK_BYTES = 1024 * 1024
+# Per-file notes kept in an upload's messages; the totals still cover every file
+FILE_NOTES = 5
+# What a corrupt or truncated archive raises while it is being read
+UNPACK_ERRORS = (zipfile.BadZipFile, tarfile.TarError, gzip.BadGzipFile, EOFError, zlib.error)
+
+
+class ArchiveError(ValueError):
+    """An archive that can't be read, or that unpacks to more than allowed"""
+
+
+def is_archive(filename):
+    return (filename or '').lower().endswith(ARCHIVE_EXTENSIONS)
+
+
+def _read_chunks(stream, budget):
+    """Read a member a chunk at a time, counting what it unpacks to against the budget"""
+    while True:
+        try:
+            chunk = stream.read(READ_CHUNK_BYTES)
+        except UNPACK_ERRORS as e:
+            raise ArchiveError(f"Could not unpack the archive: {e}") from e
+        if not chunk:
+            return
+        budget['left'] -= len(chunk)
+        if budget['left'] < 0:
+            raise ArchiveError(f"The archive unpacks to more than {budget['limit'] / (1024 * 1024):g}MB")
+        yield chunk
+
+
+def _skipped_member(name):
+    base = os.path.basename(name.rstrip('/'))
+    return not base or base.startswith('.') or name.startswith('__MACOSX/')
+
+
+def iter_archive_members(filename, data, max_bytes):
+    """Yield (file name, chunk iterator) for each file in a .zip, .tar.gz/.tgz or .gz upload.
+
+    Nothing is unpacked up front: each chunk iterator decompresses its file as
+    it is read, and stops with ArchiveError once the archive as a whole has
+    unpacked to more than max_bytes.
+    """
+    budget = {'left': max_bytes, 'limit': max_bytes}
+    lower = filename.lower()
+    try:
+        if lower.endswith('.zip'):
+            with zipfile.ZipFile(io.BytesIO(data)) as archive:
+                for info in archive.infolist():
+                    if info.is_dir() or _skipped_member(info.filename):
+                        continue
+                    with archive.open(info) as member:
+                        yield info.filename, _read_chunks(member, budget)
+        elif lower.endswith(('.tar.gz', '.tgz')):
+            # Stream mode reads the members in order without seeking back
+            with tarfile.open(fileobj=io.BytesIO(data), mode='r|gz') as archive:
+                for info in archive:
+                    if not info.isfile() or _skipped_member(info.name):
+                        continue
+                    yield info.name, _read_chunks(archive.extractfile(info), budget)
+        elif lower.endswith('.gz'):
+            with gzip.GzipFile(fileobj=io.BytesIO(data)) as member:
+                yield os.path.basename(filename)[:-3], _read_chunks(member, budget)
+        else:
+            raise ArchiveError(f"{filename} is not a .zip, .gz or .tar.gz archive")
+    except UNPACK_ERRORS as e:
+        raise ArchiveError(f"Could not unpack {filename}: {e}") from e
+
+
+def iter_file_hands(chunks):
+    """Split one file's chunks into hands as they arrive.
+
+    Returns (site category, hand iterator), or (None, None) if the opening
+    text isn't a supported site's hand history.
+    """
+    decoder = codecs.getincrementaldecoder('utf-8-sig')()
+    head = ''
+    for chunk in chunks:
+        head += decoder.decode(chunk)
+        if len(head) >= SNIFF_BYTES:
+            break
+    category = sniff_category(head)
+    if category is None:
+        return None, None
+    pattern = UPLOAD_SITES[category]['processor'].HAND_START_PATTERN
+
+    def hands():
+        text = head
+        for chunk in chunks:
+            text += decoder.decode(chunk)
+            starts = [m.start() for m in pattern.finditer(text)]
+            # The text after the last start may be a hand still being read
+            for start, end in zip(starts, starts[1:]):
+                yield text[start:end]
+            if starts:
+                text = text[starts[-1]:]
+        text += decoder.decode(b'', final=True)
+        starts = [m.start() for m in pattern.finditer(text)] + [len(text)]
+        for start, end in zip(starts, starts[1:]):
+            yield text[start:end]
+
+    return category, hands()
+
+
+@dataclass
+class UnpackedHands:
+    """The hands of an archive grouped by site and stake, with what was found in each file"""
+    stake_hands: dict = field(default_factory=dict)  # (category, stake key) -> [hand text]
+    seen: set = field(default_factory=set)  # (category, hand id)
+    files: list = field(default_factory=list)
+    duplicates: int = 0
+
+    def stake_files(self):
+        """(category, stake key, file text) for every site and stake found"""
+        return [(category, stake_key, UPLOAD_SITES[category]['processor'].HAND_SEPARATOR.join(hands))
+                for (category, stake_key), hands in self.stake_hands.items()]
+
+    def messages(self):
+        """Flash messages summing up what was read from the archive"""
+        used = [record for record in self.files if record['hands']]
+        skipped = [record for record in self.files if not record['hands']]
+        hands = sum(record['hands'] for record in used)
+        messages = [[f"Read {hands} hand(s) from {len(used)} of {len(self.files)} file(s) in the archive"
+                     + (f"; {self.duplicates} duplicate hand(s) were only counted once" if self.duplicates else ''),
+                     'info']]
+        for record in skipped[:FILE_NOTES]:
+            messages.append([f"Skipped {record['name']}: {record['reason']}", 'warning'])
+        if len(skipped) > FILE_NOTES:
+            messages.append([f"Skipped {len(skipped) - FILE_NOTES} more file(s)", 'warning'])
+        return messages
+
+
+def unpack_hands(filename, data, max_bytes, progress=None):
+    """Read every hand history file in an archive into hands grouped by site and stake.
+
+    Raises ArchiveError if the archive can't be read or is too big unpacked.
+    progress, if given, is called with each file's name as it is read.
+    """
+    unpacked = UnpackedHands()
+    processors = {}
+    for name, chunks in iter_archive_members(filename, data, max_bytes):
+        if progress:
+            progress(name)
+        record = {'name': name, 'category': None, 'hands': 0, 'duplicates': 0, 'reason': None}
+        unpacked.files.append(record)
+        try:
+            category, hands = iter_file_hands(chunks)
+            if category is None:
+                record['reason'] = f"not a {' or '.join(site['label'] for site in UPLOAD_SITES.values())} hand history"
+                continue
+            record['category'] = category
+            processor = processors.setdefault(category, site_processor(category))
+            for hand in hands:
+                stake_key = processor.stake_key(hand)
+                if not stake_key:
+                    continue
+                try:
+                    hand_id = processor.parse_hand_header(hand).get('hand_id')
+                except Exception:
+                    hand_id = None
+                if hand_id:
+                    if (category, str(hand_id)) in unpacked.seen:
+                        record['duplicates'] += 1
+                        unpacked.duplicates += 1
+                        continue
+                    unpacked.seen.add((category, str(hand_id)))
+                unpacked.stake_hands.setdefault((category, stake_key), []).append(hand)
+                record['hands'] += 1
+            if not record['hands']:
+                record['reason'] = 'only duplicate hands' if record['duplicates'] else 'no hands with a stake level'
+        except UnicodeDecodeError:
+            record['reason'] = 'not a UTF-8 text file'
+    return unpacked
@@ -0,0 +1,169 @@
+# This file works out the bankroll page numbers and graph data.
+# It reads each session's earnings from the summary columns saved on its post and adds them up with pandas.
+# Results are kept per user until one of their posts or live sessions changes the totals.
+import datetime
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+from . import db
+from .downsampling import BANKROLL_CHART_POINTS, earnings_chart
+from .models import Post, LiveSession
+from .post_summary import normalize_stake
+from .user_stats import USD_TO_EUR_RATE, totals_updated_at
+
+
+# Currency conversion rate (EUR to USD) - inverse of USD_TO_EUR_RATE
+EUR_TO_USD_RATE = 1 / USD_TO_EUR_RATE
+BANKROLL_CACHE_SIZE = 64
+
+_bankroll_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def calculate_bankroll_data(user_id):
+    """Calculate comprehensive bankroll data for cash games only (online + live)"""
+    now = datetime.datetime.now()
+    current_month_start = datetime.datetime(now.year, now.month, 1)
+
+    # The overall totals are stamped on every post or live session change
+    version = (totals_updated_at(user_id), current_month_start)
+    with _cache_lock:
+        cached = _bankroll_cache.get(user_id)
+        if cached and cached[0] == version:
+            _bankroll_cache.move_to_end(user_id)
+            return cached[1]
+
+    bankroll_data = _build_bankroll_data(user_id, current_month_start)
+
+    with _cache_lock:
+        _bankroll_cache[user_id] = (version, bankroll_data)
+        _bankroll_cache.move_to_end(user_id)
+        while len(_bankroll_cache) > BANKROLL_CACHE_SIZE:
+            _bankroll_cache.popitem(last=False)
+    return bankroll_data
+
+
+def _online_sessions(user_id):
+    """One row per post with results: date, earnings, BB earnings, hands and stake"""
+    online = pd.DataFrame(
+        db.session.query(Post.id, Post.date_created, Post.stake, Post.stake_normalized,
+                         Post.earnings, Post.bb_earnings, Post.hand_count)
+        .filter(Post.author == user_id, Post.earnings.isnot(None))
+        .all(),
+        columns=['post_id', 'date', 'stake_raw', 'stake', 'earnings', 'bb_earnings', 'hands'],
+    )
+    missing_stake = online['stake'].isna()
+    if missing_stake.any():
+        online.loc[missing_stake, 'stake'] = online.loc[missing_stake, 'stake_raw'].map(normalize_stake)
+    online = online.sort_values(['date', 'post_id'], kind='stable')
+    online['hands'] = online['hands'].fillna(0).astype(int)
+    online['type'] = 'online'
+    return online[['date', 'earnings', 'bb_earnings', 'hands', 'stake', 'type']]
+
+
+def _live_sessions(user_id):
+    """One row per live session, converted to USD and tagged with its stakes"""
+    live = pd.DataFrame(
+        db.session.query(LiveSession.session_date, LiveSession.buy_in, LiveSession.cash_out, LiveSession.stakes)
+        .filter(LiveSession.user_id == user_id)
+        .order_by(LiveSession.session_date.asc(), LiveSession.id.asc())
+        .all(),
+        columns=['date', 'buy_in', 'cash_out', 'stakes'],
+    )
+    profit_loss = live['cash_out'] - live['buy_in']
+    big_blind = pd.to_numeric(live['stakes'].str.split('/').str[1], errors='coerce')
+    big_blind = big_blind.where(big_blind > 0)
+    return pd.DataFrame({
+        'date': live['date'],
+        'earnings': profit_loss * EUR_TO_USD_RATE,
+        # Stakes without a readable big blind count as 0 BB, like the profile totals
+        'bb_earnings': (profit_loss / big_blind).fillna(0.0),
+        'hands': 0,
+        'stake': 'Live: ' + live['stakes'].astype(str),
+        'type': 'live',
+    })
+
+
+def _build_bankroll_data(user_id, current_month_start):
+    online = _online_sessions(user_id)
+    live = _live_sessions(user_id)
+    if online.empty and live.empty:
+        return None
+
+    total_hands = int(online['hands'].sum())
+    if total_hands == 0 and live.empty:
+        return None
+
+    # Online sessions first, then live sessions, each in date order
+    sessions = pd.concat([frame for frame in (online, live) if not frame.empty], ignore_index=True)
+    sessions['earnings'] = sessions['earnings'].astype(float)
+    sessions['bb_earnings'] = sessions['bb_earnings'].astype(float)
+
+    this_month = sessions[sessions['date'] >= current_month_start]
+
+    # Stake breakdown
+    by_stake = sessions.groupby('stake', sort=False).agg(
+        hands=('hands', 'sum'),
+        earnings=('earnings', 'sum'),
+        bb_earnings=('bb_earnings', 'sum'),
+        sessions=('earnings', 'size'),
+        winning_sessions=('earnings', lambda earnings: int((earnings > 0).sum())),
+    )
+    stake_data = {}
+    for stake, row in by_stake.iterrows():
+        hands = int(row['hands'])
+        session_count = int(row['sessions'])
+        stake_data[stake] = {
+            'hands': hands,
+            'earnings': float(row['earnings']),
+            'bb_earnings': float(row['bb_earnings']),
+            'sessions': session_count,
+            'winning_sessions': int(row['winning_sessions']),
+            # Live sessions don't have hands, so BB/100 is not applicable
+            'bb_per_100': (float(row['bb_earnings']) / hands) * 100 if hands > 0 else None,
+            'winrate': (int(row['winning_sessions']) / session_count * 100) if session_count > 0 else 0,
+        }
+
+    total_earnings = float(sessions['earnings'].sum())
+    total_bb_earnings = float(sessions['bb_earnings'].sum())
+    overall_bb_per_100 = (total_bb_earnings / total_hands) * 100 if total_hands > 0 else 0
+
+    # Running bankroll for the graph
+    dates = sessions['date'].map(lambda value: value.isoformat())
+    cumulative_earnings = sessions['earnings'].cumsum()
+    cumulative_bb = sessions['bb_earnings'].cumsum()
+    session_data = []
+    for date, earnings, bb_earnings, stake, kind in zip(
+            dates, sessions['earnings'], sessions['bb_earnings'], sessions['stake'], sessions['type']):
+        entry = {'date': date, 'earnings': earnings, 'bb_earnings': bb_earnings, 'stake': stake}
+        if kind == 'live':
+            entry['type'] = 'live'  # Mark as live session
+        session_data.append(entry)
+    running_bankroll = [
+        {'date': date, 'bankroll': bankroll, 'bankroll_bb': bankroll_bb}
+        for date, bankroll, bankroll_bb in zip(dates, cumulative_earnings, cumulative_bb)
+    ]
+
+    # Chart lines for all stakes and for each stake on its own, thinned for drawing
+    chart_series = {'all': earnings_chart(dates.tolist(), sessions['earnings'], BANKROLL_CHART_POINTS, sessions['bb_earnings'])}
+    for stake, stake_sessions in sessions.groupby('stake', sort=False):
+        chart_series[stake] = earnings_chart(dates[stake_sessions.index].tolist(), stake_sessions['earnings'],
+                                             BANKROLL_CHART_POINTS, stake_sessions['bb_earnings'])
+
+    return {
+        'current_bankroll': float(cumulative_earnings.iloc[-1]),
+        'current_bankroll_bb': float(cumulative_bb.iloc[-1]),
+        'total_profit_loss': total_earnings,
+        'total_profit_loss_bb': total_bb_earnings,
+        'month_profit_loss': float(this_month['earnings'].sum()),
+        'month_profit_loss_bb': float(this_month['bb_earnings'].sum()),
+        'month_hands': int(this_month['hands'].sum()),
+        'total_hands': total_hands,
+        'overall_bb_per_100': overall_bb_per_100,
+        'stake_breakdown': stake_data,
+        'session_data': session_data,
+        'running_bankroll': running_bankroll,
+        'chart_series': chart_series,
+    }
@@ -0,0 +1,283 @@
+# This file adds maintenance commands to the flask command line.
+# Run them from the project folder, for example: flask --app app reprocess --stale-only
+# They work on the same database and code as the website.
+import datetime
+import os
+import time
+from collections import Counter
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+
+from . import db
+from .hand_import import (DEFAULT_IMPORT_TEXT, DEFAULT_POST_HANDS, file_digest, imported_digests, index_files,
+                          iter_hand_files, plan_posts, record_imported_files, save_posts)
+from .live_tail import DEFAULT_LIVE_TEXT, SETTLE_SECONDS, LiveTailer
+from .models import User
+from .reprocess import (DEFAULT_REPROCESS_WORKERS, REPROCESS_BATCH_SIZE, iter_post_id_batches, process_pool,
+                        reprocess_batch, reprocess_counts, reprocess_query)
+from .request_profiler import count_queries
+from .sites import UPLOAD_SITES
+
+
+def _find_user(value):
+    user = User.query.filter_by(username=value).first()
+    if user is None and value.isdigit():
+        user = db.session.get(User, int(value))
+    if user is None:
+        raise click.BadParameter(f"No user '{value}'", param_hint='--user')
+    return user
+
+
+def _rate(count, seconds):
+    return count / seconds if seconds > 0 else 0.0
+
+
+@click.command('reprocess')
+@click.option('--user', 'username', help='Only posts by this username (or user id).')
+@click.option('--since', type=click.DateTime(formats=['%Y-%m-%d', '%Y-%m-%d %H:%M:%S']),
+              help='Only posts uploaded on or after this date.')
+@click.option('--site', 'sites', multiple=True, type=click.Choice(sorted(UPLOAD_SITES)),
+              help='Only posts from this site (repeatable). Defaults to every supported site.')
+@click.option('--stale-only', is_flag=True, help='Skip posts already made by the current parser and metrics.')
+@click.option('--dry-run', is_flag=True, help='Process posts and report the outcome without saving anything.')
+@click.option('--workers', type=int, default=DEFAULT_REPROCESS_WORKERS, show_default=True,
+              help='Processes parsing hand files; 1 parses in this process.')
+@click.option('--batch-size', type=int, default=20, show_default=True, help='Posts saved per commit.')
+@with_appcontext
+def reprocess_command(username, since, sites, stale_only, dry_run, workers, batch_size):
+    """Reprocess stored hand histories with the current parser."""
+    user = _find_user(username) if username else None
+    query = reprocess_query(user.id if user else None, sites or tuple(UPLOAD_SITES), since)
+    total = query.count()
+    click.echo(f"{total} post(s) to check" + (" (dry run, nothing is saved)" if dry_run else ""))
+    if not total:
+        return
+
+    posts = []
+    hands = 0
+    started = time.perf_counter()
+    executor = process_pool(min(workers, total))
+    try:
+        for batch in iter_post_id_batches(query, batch_size):
+            records = reprocess_batch(batch, stale_only, executor)
+            if dry_run:
+                db.session.rollback()
+            else:
+                db.session.commit()
+            # Drop the batch's hand data from the session before loading the next one
+            db.session.expunge_all()
+
+            posts.extend(records)
+            hands += sum(record.get('hands', 0) for record in records)
+            elapsed = time.perf_counter() - started
+            for record in records:
+                if record['status'] == 'failed':
+                    click.echo(f"  post {record['post_id']} failed: {record['error']}", err=True)
+            click.echo(f"{len(posts)}/{total} posts  {_rate(len(posts), elapsed):.2f} posts/s  "
+                       f"{_rate(hands, elapsed):.1f} hands/s")
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    elapsed = time.perf_counter() - started
+    counts = reprocess_counts(posts)
+    click.echo(
+        f"Done in {datetime.timedelta(seconds=round(elapsed))}: "
+        f"{counts['reprocessed']} reprocessed, {counts['refreshed']} refreshed, "
+        f"{counts['up_to_date']} up to date, {counts['failed']} failed; "
+        f"{hands} hands at {_rate(hands, elapsed):.1f} hands/s, {_rate(len(posts), elapsed):.2f} posts/s"
+    )
+
+
+@click.command('import-hands')
+@click.option('--user', 'username', required=True, help='Add the hands to this username\'s (or user id\'s) posts.')
+@click.option('--text', default=DEFAULT_IMPORT_TEXT, show_default=True,
+              help='Text of the posts the hands go to; the hands are shared out by site and stake.')
+@click.option('--dry-run', is_flag=True, help='Read and process the files and report the outcome without saving anything.')
+@click.option('--workers', type=int, default=DEFAULT_REPROCESS_WORKERS, show_default=True,
+              help='Processes reading and parsing hand files; 1 does it all in this process.')
+@click.option('--post-hands', type=int, default=DEFAULT_POST_HANDS, show_default=True,
+              help='Most hands in one post; a site and stake with more is split over several posts.')
+@click.option('--batch-size', type=int, default=REPROCESS_BATCH_SIZE, show_default=True,
+              help='Posts saved per commit. Each post is processed once, with all its hands.')
+@click.argument('directory', type=click.Path(exists=True, file_okay=False))
+@with_appcontext
+def import_hands_command(username, text, dry_run, workers, post_hands, batch_size, directory):
+    """Import every hand history file under a directory into a user's posts.
+
+    Files already imported for the user (by content) are skipped, so an
+    import that stops part way can simply be run again.
+    """
+    user_id = _find_user(username).id  # The user is detached from the session after the first commit
+    paths = list(iter_hand_files(directory))
+    done = imported_digests(user_id)
+    files = {}
+    already = 0
+    for path in paths:
+        digest = file_digest(path)
+        if digest in done:
+            already += 1
+        else:
+            # The same file twice in the folder is only read once
+            files.setdefault(digest, path)
+    files = [(path, digest) for digest, path in files.items()]
+    copies = len(paths) - already - len(files)
+    click.echo(f"{len(paths)} file(s) found, {already} already imported, "
+               + (f"{copies} duplicate file(s), " if copies else "") + f"{len(files)} to read"
+               + (" (dry run, nothing is saved)" if dry_run else ""))
+    if not files:
+        return
+
+    totals = Counter()
+    posts = []
+    started = time.perf_counter()
+    executor = process_pool(min(workers, len(files)))
+    try:
+        file_records, stake_hands = index_files(files, executor)
+        plans = plan_posts(user_id, text, file_records, stake_hands, post_hands)
+        for record in file_records:
+            totals['bytes'] += os.path.getsize(record['path'])
+            totals['duplicates'] += record['duplicates']
+        elapsed = time.perf_counter() - started
+        click.echo(f"Read {len(files)} file(s) in {elapsed:.1f}s ({_rate(totals['bytes'] / 1024 / 1024, elapsed):.1f} MB/s): "
+                   f"{sum(record['hands'] for record in file_records)} new hands for {len(plans)} post(s)")
+
+        for start in range(0, len(plans), batch_size):
+            batch = plans[start:start + batch_size]
+            post_records = save_posts(user_id, text, batch, file_records, executor)
+            record_imported_files(user_id, file_records, plans[start + batch_size:])
+            if dry_run:
+                db.session.rollback()
+            else:
+                db.session.commit()
+            db.session.expunge_all()
+
+            posts.extend(post_records)
+            for record in post_records:
+                if record['status'] == 'failed':
+                    click.echo(f"  {record['category']} {record['stake']} failed: {record['error']}", err=True)
+                else:
+                    totals['hands'] += record.get('hands', 0)
+            elapsed = time.perf_counter() - started
+            click.echo(f"{len(posts)}/{len(plans)} posts  {_rate(totals['hands'], elapsed):.1f} hands/s")
+        # Files whose hands were all duplicates have no post to wait for
+        record_imported_files(user_id, file_records, [])
+        if dry_run:
+            db.session.rollback()
+        else:
+            db.session.commit()
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    for record in file_records:
+        if record.get('failed') or not record['category']:
+            totals['not imported'] += 1
+            click.echo(f"  {record['path']}: {record['reason']}", err=True)
+    elapsed = time.perf_counter() - started
+    statuses = Counter(record['status'] for record in posts)
+    click.echo(
+        f"Done in {datetime.timedelta(seconds=round(elapsed))}: "
+        f"{len(file_records) - totals['not imported']} file(s) imported, {totals['not imported']} not imported; "
+        f"{sum(record['hands'] for record in file_records)} new hands ({totals['duplicates']} duplicates skipped); "
+        f"{statuses['created']} post(s) created, {statuses['reprocessed']} updated, {statuses['failed']} failed; "
+        f"{totals['bytes'] / 1024 / 1024:.1f} MB at {_rate(totals['bytes'] / 1024 / 1024, elapsed):.1f} MB/s, "
+        f"{_rate(totals['hands'], elapsed):.1f} hands/s"
+    )
+
+
+@click.command('tail-hands')
+@click.option('--user', 'username', required=True, help='Post the hands as this username (or user id).')
+@click.option('--text', default=DEFAULT_LIVE_TEXT, show_default=True, help='Text of a new live post.')
+@click.option('--new-post', is_flag=True, help='Start a new live post even if this file was followed before.')
+@click.option('--from-end', is_flag=True, help='For a new live post, skip the hands already in the file.')
+@click.option('--interval', type=float, default=1.0, show_default=True, help='Seconds between checks of the file.')
+@click.option('--settle', type=float, default=SETTLE_SECONDS, show_default=True,
+              help='Seconds the file must stop growing before its last hand is read.')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@with_appcontext
+def tail_hands_command(username, text, new_post, from_end, interval, settle, path):
+    """Follow a hand history file the poker client is writing to and keep a live post up to date.
+
+    Open metrics pages of the post update as hands arrive. Stop with Ctrl+C;
+    running it again on the same file carries on where it stopped.
+    """
+    user = _find_user(username)
+    tailer = LiveTailer.start(user.id, os.path.abspath(path), text, new_post, from_end, settle)
+    post = tailer.tail.post
+    click.echo(f"Following {tailer.tail.path} from byte {tailer.tail.offset}"
+               + (f" into post {post.id} ({post.hand_count} hands)" if post else "") + "; Ctrl+C to stop")
+
+    started = time.perf_counter()
+    try:
+        while True:
+            update = tailer.poll()
+            if update:
+                click.echo(f"+{update['hands']} hands  post {update['post_id']}: {update['hand_count']} hands  "
+                           f"${update['earnings']:.2f}  {update['bb_per_100']:.1f} BB/100  ({update['seconds']:.2f}s)")
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        tailer.stop()
+    click.echo(f"Stopped after {datetime.timedelta(seconds=round(time.perf_counter() - started))}: "
+               f"{tailer.tail.hands} hands added in all, {tailer.skipped} skipped this run")
+
+
+# Pages query-counts loads when none are given; {username} is the --user option
+QUERY_COUNT_PATHS = ('/posts', '/posts/{username}', '/filter', '/user/{username}', '/dashboard', '/view_analytics')
+# One statement run more often than this on a page is usually being run once per post
+DEFAULT_MAX_REPEATS = 2
+
+
+@click.command('query-counts')
+@click.option('--user', 'username', required=True, help='Load the pages signed in as this username (or user id).')
+@click.option('--max-queries', type=int, help='Fail if a page runs more queries than this.')
+@click.option('--max-repeats', type=int, default=DEFAULT_MAX_REPEATS, show_default=True,
+              help='Fail if a page runs the same statement more times than this.')
+@click.argument('paths', nargs=-1)
+@with_appcontext
+def query_counts_command(username, max_queries, max_repeats, paths):
+    """Count the database queries each page runs.
+
+    A page whose query count grows with the number of posts loads something
+    once per post; run this before and after adding posts, or use --max-repeats
+    to catch the repeated statement directly.
+    """
+    user = _find_user(username)
+    app = current_app._get_current_object()
+    # Pages are loaded in this process; it shouldn't start job workers of its own
+    app.config['JOB_WORKERS'] = 0
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user.id)
+        session['_fresh'] = True
+
+    failures = 0
+    for path in paths or QUERY_COUNT_PATHS:
+        path = path.format(username=user.username)
+        with count_queries() as counter:
+            response = client.get(path)
+        statement, repeats = (Counter(counter['statements']).most_common(1) or [(None, 0)])[0]
+        problems = []
+        if max_queries is not None and counter['count'] > max_queries:
+            problems.append(f"more than {max_queries} queries")
+        if repeats > max_repeats:
+            problems.append(f"one statement ran {repeats} times")
+        click.echo(f"{path:<40} {response.status_code}  {counter['count']:>4} queries"
+                   + (f"  FAIL: {', '.join(problems)}" if problems else ""))
+        if repeats > max_repeats:
+            click.echo(f"    {' '.join(statement.split())[:200]}")
+        failures += bool(problems)
+
+    if failures:
+        raise click.ClickException(f"{failures} page(s) over the query limits")
+
+
+def init_commands(app):
+    app.cli.add_command(reprocess_command)
+    app.cli.add_command(import_hands_command)
+    app.cli.add_command(tail_hands_command)
+    app.cli.add_command(query_counts_command)
@@ -0,0 +1,131 @@
+# This file checks a stored hand file one processing stage at a time.
+# Each stage reports how long it took, how many hands got through, a few failures and memory used.
+# Full analytics only run when asked, so checking a post stays cheap.
+import time
+import traceback
+import tracemalloc
+
+from .sites import UPLOAD_SITES, site_processor
+
+
+FAILURE_SAMPLES = 3
+
+
+def _first_line(hand):
+    return next((line.strip() for line in hand.split('\n') if line.strip()), '')[:200]
+
+
+class _Stage:
+    """Times one stage and records its peak memory into a dict"""
+
+    def __init__(self, stages, name):
+        self.record = {'name': name, 'ok': True}
+        stages.append(self.record)
+
+    def __enter__(self):
+        tracemalloc.reset_peak()
+        self.started = time.perf_counter()
+        return self.record
+
+    def __exit__(self, exc_type, exc, tb):
+        self.record['seconds'] = round(time.perf_counter() - self.started, 4)
+        self.record['peak_memory_kb'] = round(tracemalloc.get_traced_memory()[1] / 1024, 1)
+        if exc is not None:
+            self.record['ok'] = False
+            self.record['error'] = f"{type(exc).__name__}: {exc}"
+            self.record['traceback'] = traceback.format_exc()[-1500:]
+        return True  # The failure is reported in the stage, not raised
+
+
+def diagnose_hand_file(category, file_data, run_analytics=False):
+    """Run a hand file through processing stage by stage without saving anything.
+
+    Stops at the first stage that fails or lets no hands through. The
+    analytics stage only runs with run_analytics.
+    """
+    if category not in UPLOAD_SITES:
+        return {'healthy': False, 'stopped_at': None, 'stages': [],
+                'error': f"No processor for category '{category}'"}
+
+    stages = []
+    processor = None
+    tracing = tracemalloc.is_tracing()
+    if not tracing:
+        tracemalloc.start()
+    try:
+        with _Stage(stages, 'split') as stage:
+            processor = site_processor(category, file_data)
+            hands = processor.split_hands()
+            stage['hands'] = stage['rows_out'] = len(hands)
+            stage['ok'] = bool(hands)
+
+        if stages[-1]['ok']:
+            with _Stage(stages, 'validate') as stage:
+                is_valid, reason, valid_hands = processor.validate()
+                stage['reason'] = reason
+                stage['ok'] = bool(is_valid and valid_hands)
+                stage['valid_hands'] = len(valid_hands) if is_valid else 0
+                stage['rejected_hands'] = len(hands) - stage['valid_hands']
+                stage['rows_in'], stage['rows_out'] = len(hands), stage['valid_hands']
+                stage['rejected_samples'] = [
+                    _first_line(hand) for hand in hands if not processor.validate_hand(hand)
+                ][:FAILURE_SAMPLES]
+
+        if stages[-1]['ok']:
+            with _Stage(stages, 'parse') as stage:
+                rows = []
+                skipped = 0
+                failures = []
+                for hand in valid_hands:
+                    if "Hero" not in hand:
+                        skipped += 1
+                        continue
+                    try:
+                        row = processor.parse_hand_row(hand)
+                    except Exception as e:
+                        row = None
+                        error = f"{type(e).__name__}: {e}"
+                    else:
+                        error = 'Could not be parsed'
+                    if row is None:
+                        failures.append({'hand': _first_line(hand), 'error': error})
+                    else:
+                        rows.append(row)
+                stage.update({
+                    'parsed_hands': len(rows),
+                    'failed_hands': len(failures),
+                    'skipped_without_hero': skipped,
+                    'failure_samples': failures[:FAILURE_SAMPLES],
+                    'rows_in': len(valid_hands),
+                    'rows_out': len(rows),
+                    'ok': bool(rows),
+                })
+
+        if stages[-1]['ok']:
+            with _Stage(stages, 'build_dataframe') as stage:
+                dataframe = processor.csv_process_poker_hand(rows)
+                stage['rows'] = stage['rows_out'] = 0 if dataframe is None else len(dataframe)
+                stage['rows_in'] = len(rows)
+                stage['columns'] = 0 if dataframe is None else len(dataframe.columns)
+                stage['ok'] = bool(stage['rows'])
+
+        if stages[-1]['ok'] and run_analytics:
+            with _Stage(stages, 'analytics') as stage:
+                results = processor.advanced_processing(dataframe)
+                stage['results_rows'] = 0 if results is None else len(results)
+                stage['metrics'] = 0 if results is None else len(results.columns)
+                stage['metric_stages'] = processor.timer.summary()
+                stage['ok'] = bool(stage['results_rows'])
+    finally:
+        if not tracing:
+            tracemalloc.stop()
+
+    failed = next((stage['name'] for stage in stages if not stage['ok']), None)
+    return {
+        'healthy': failed is None,
+        'stopped_at': failed,
+        'analytics_run': run_analytics and failed is None,
+        'total_seconds': round(sum(stage.get('seconds', 0) for stage in stages), 4),
+        'stages': stages,
+        'hand_problems': processor.issues.summary() if processor is not None else {},
+    }
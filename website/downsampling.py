@@ -0,0 +1,107 @@
+# This file thins out long earnings graphs before they are sent to the browser.
+# It keeps the points that shape the line (largest-triangle-three-buckets) up to a set count.
+# Zoomed-in views can still ask for every session in a date range.
+import math
+
+import numpy as np
+
+
+# Points drawn per chart; longer series are thinned to this many
+# (the profile and dashboard graphs share one series)
+PROFILE_CHART_POINTS = 300
+BANKROLL_CHART_POINTS = 500
+
+
+def lttb_indices(values, threshold):
+    """Indices of the points to keep when drawing values with at most threshold points.
+
+    Uses largest-triangle-three-buckets over evenly spaced x values. The first and
+    last points are always kept.
+    """
+    count = len(values)
+    if threshold >= count or threshold < 3:
+        return list(range(count))
+
+    y = np.asarray(values, dtype=float)
+    x = np.arange(count, dtype=float)
+    bucket_size = (count - 2) / (threshold - 2)
+
+    indices = [0]
+    anchor = 0
+    for bucket in range(threshold - 2):
+        start = int(math.floor(bucket * bucket_size)) + 1
+        end = int(math.floor((bucket + 1) * bucket_size)) + 1
+        next_end = min(int(math.floor((bucket + 2) * bucket_size)) + 1, count)
+        # The average of the next bucket is the third corner of the triangle
+        avg_x = x[end:next_end].mean()
+        avg_y = y[end:next_end].mean()
+        areas = np.abs(
+            (x[anchor] - avg_x) * (y[start:end] - y[anchor])
+            - (x[anchor] - x[start:end]) * (avg_y - y[anchor])
+        )
+        anchor = start + int(np.argmax(areas))
+        indices.append(anchor)
+    indices.append(count - 1)
+    return indices
+
+
+def earnings_chart(dates, earnings, target_points, bb_earnings=None):
+    """Per-session and cumulative series for a chart, each thinned to target_points.
+
+    The cumulative line is thinned on its own shape and the per-session line on
+    its own, so spikes in either survive. Dates should already be labels.
+    """
+    earnings = [float(value or 0) for value in earnings]
+    cumulative = np.cumsum(earnings).tolist() if earnings else []
+    bb_earnings = [float(value or 0) for value in bb_earnings] if bb_earnings is not None else None
+    cumulative_bb = np.cumsum(bb_earnings).tolist() if bb_earnings else []
+
+    def pick(series, indices):
+        return [series[index] for index in indices]
+
+    cumulative_indices = lttb_indices(cumulative, target_points)
+    session_indices = lttb_indices(earnings, target_points)
+    chart = {
+        'total_points': len(earnings),
+        'cumulative': {
+            'dates': pick(dates, cumulative_indices),
+            'values': pick(cumulative, cumulative_indices),
+        },
+        'session': {
+            'dates': pick(dates, session_indices),
+            'values': pick(earnings, session_indices),
+        },
+    }
+    if bb_earnings is not None:
+        chart['cumulative']['values_bb'] = pick(cumulative_bb, cumulative_indices)
+        chart['session']['values_bb'] = pick(bb_earnings, session_indices)
+    return chart
+
+
+def earnings_range(dates, earnings, start=None, end=None, bb_earnings=None):
+    """Every session between start and end (inclusive), with running totals.
+
+    Running totals carry on from the sessions before start, so a zoomed view
+    lines up with the overview. Dates are compared as given (datetimes or ISO strings).
+    """
+    result = {'dates': [], 'session': [], 'cumulative': []}
+    if bb_earnings is not None:
+        result['session_bb'] = []
+        result['cumulative_bb'] = []
+
+    running = 0.0
+    running_bb = 0.0
+    for position, (date, value) in enumerate(zip(dates, earnings)):
+        value = float(value or 0)
+        bb_value = float(bb_earnings[position] or 0) if bb_earnings is not None else 0.0
+        running += value
+        running_bb += bb_value
+        if (start is not None and date < start) or (end is not None and date > end):
+            continue
+        result['dates'].append(date)
+        result['session'].append(value)
+        result['cumulative'].append(running)
+        if bb_earnings is not None:
+            result['session_bb'].append(bb_value)
+            result['cumulative_bb'].append(running_bb)
+    return result
@@ -0,0 +1,263 @@
+# This file imports folders of hand history files kept on disk into a user's posts.
+# Files are memory-mapped and split into hands by byte offset, so a file is never decoded whole.
+# Each file's content hash is saved with its hands, so running an import again skips what is done.
+import hashlib
+import logging
+import mmap
+import os
+import re
+
+from . import db
+from .models import ImportedFile, Post
+from .reprocess import _failure, _save_outcome, process_hand_file
+from .sites import SNIFF_BYTES, UPLOAD_SITES, site_processor, sniff_category
+
+logger = logging.getLogger(__name__)
+
+IMPORT_EXTENSIONS = ('.txt',)
+# Imported hands go to the user's posts with this text for their site and stake, unless another is given
+DEFAULT_IMPORT_TEXT = 'Imported hand histories'
+# A post takes at most this many imported hands; the rest start another post with the same text
+DEFAULT_POST_HANDS = 20000
+
+
+def iter_hand_files(directory):
+    """Every hand history file under a directory, in a stable order; hidden files and folders are skipped"""
+    for root, dirs, files in os.walk(directory):
+        dirs[:] = sorted(name for name in dirs if not name.startswith('.'))
+        for name in sorted(files):
+            if not name.startswith('.') and name.lower().endswith(IMPORT_EXTENSIONS):
+                yield os.path.join(root, name)
+
+
+def _mapped(handle):
+    """The file's contents memory-mapped for reading, or b'' for an empty file (which can't be mapped)"""
+    if not os.fstat(handle.fileno()).st_size:
+        return b''
+    return mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def file_digest(path):
+    with open(path, 'rb') as handle:
+        contents = _mapped(handle)
+        try:
+            return hashlib.sha256(contents).hexdigest()
+        finally:
+            if contents:
+                contents.close()
+
+
+def byte_pattern(pattern):
+    """A str hand start pattern compiled for searching bytes"""
+    return re.compile(pattern.pattern.encode('ascii'), pattern.flags & ~re.UNICODE)
+
+
+def index_hand_file(path):
+    """Find the hands in a file on disk and group them by stake, without decoding the whole file.
+
+    Runs in a worker process. Returns {'path', 'category', 'stakes', 'skipped',
+    'reason'}, where stakes maps each stake key to the (hand id, start byte,
+    end byte) of its hands. Only one hand at a time is decoded, to read its
+    stake and id.
+    """
+    index = {'path': path, 'category': None, 'stakes': {}, 'skipped': 0, 'reason': None}
+    with open(path, 'rb') as handle:
+        contents = _mapped(handle)
+        try:
+            if not contents:
+                index['reason'] = 'empty file'
+                return index
+            category = sniff_category(contents[:SNIFF_BYTES])
+            if category is None:
+                index['reason'] = f"not a {' or '.join(site['label'] for site in UPLOAD_SITES.values())} hand history"
+                return index
+            index['category'] = category
+            processor = site_processor(category)
+            starts = [m.start() for m in byte_pattern(processor.HAND_START_PATTERN).finditer(contents)]
+            for start, end in zip(starts, starts[1:] + [len(contents)]):
+                try:
+                    hand = contents[start:end].decode('utf-8')
+                except UnicodeDecodeError:
+                    index['skipped'] += 1
+                    continue
+                stake_key = processor.stake_key(hand)
+                if not stake_key:
+                    index['skipped'] += 1
+                    continue
+                try:
+                    hand_id = processor.parse_hand_header(hand).get('hand_id')
+                except Exception:
+                    hand_id = None
+                index['stakes'].setdefault(stake_key, []).append((str(hand_id) if hand_id else None, start, end))
+        finally:
+            if contents:
+                contents.close()
+    if not any(index['stakes'].values()):
+        index['reason'] = 'no hands with a stake level'
+    return index
+
+
+def _read_hands(path, spans):
+    with open(path, 'rb') as handle:
+        contents = _mapped(handle)
+        try:
+            return [contents[start:end].decode('utf-8') for start, end in spans]
+        finally:
+            if contents:
+                contents.close()
+
+
+def _run(executor, function, *args):
+    """Call function in the pool, or here when there is none; returns a callable giving (result, error)"""
+    if executor is None:
+        try:
+            result = function(*args)
+        except Exception as e:
+            return lambda: (None, e)
+        return lambda: (result, None)
+    future = executor.submit(function, *args)
+
+    def outcome():
+        try:
+            return future.result(), None
+        except Exception as e:
+            return None, e
+    return outcome
+
+
+def index_files(files, executor):
+    """Index a list of (path, digest) files, several at once in the pool.
+
+    Returns the per-file records and, for each (category, stake key), the
+    (path, hand id, start byte, end byte) of its hands in file order.
+    """
+    indexes = [_run(executor, index_hand_file, path) for path, _ in files]
+    file_records = []
+    stake_hands = {}
+    for (path, digest), outcome in zip(files, indexes):
+        index, error = outcome()
+        record = {'path': path, 'digest': digest, 'category': None, 'hands': 0, 'duplicates': 0,
+                  'skipped': 0, 'reason': None}
+        file_records.append(record)
+        if error is not None:
+            record['reason'] = f"{type(error).__name__} - {error}"
+            continue
+        record.update(category=index['category'], skipped=index['skipped'], reason=index['reason'])
+        for stake_key, spans in index['stakes'].items():
+            stake_hands.setdefault((index['category'], stake_key), []).extend(
+                (path, hand_id, start, end) for hand_id, start, end in spans)
+    return file_records, stake_hands
+
+
+def plan_posts(user_id, text, file_records, stake_hands, max_hands=DEFAULT_POST_HANDS):
+    """Share the new hands out among the user's posts with the given text, at most max_hands to a post.
+
+    A hand (by id) that one of those posts already has, or that comes up
+    earlier in the import, is counted as a duplicate. The newest post for a
+    site and stake is filled up to max_hands first and the rest start new
+    posts, so no post ever has to be processed with more than max_hands
+    hands. Existing posts are only read for their hand ids, once per import.
+    Returns a list of {'category', 'stake', 'post_id' (None for a new post),
+    'hands', 'spans': {path: [(start, end)]}}.
+    """
+    by_path = {record['path']: record for record in file_records}
+    plans = []
+    for (category, stake_key), hands in stake_hands.items():
+        post_ids = [post_id for (post_id,) in db.session.query(Post.id).filter_by(
+            author=user_id, category=category, stake=stake_key, text=text).order_by(Post.id)]
+        seen = set()
+        located = {}
+        for post_id in post_ids:
+            file_data = db.session.query(Post.file_data).filter_by(id=post_id).scalar()
+            located = site_processor(category, file_data.decode('utf-8')).locate_hands() if file_data else {}
+            seen.update(located)
+        plan = None
+        if post_ids and len(located) < max_hands:
+            plan = {'category': category, 'stake': stake_key, 'post_id': post_ids[-1], 'hands': len(located),
+                    'spans': {}}
+            plans.append(plan)
+        for path, hand_id, start, end in hands:
+            if hand_id and hand_id in seen:
+                by_path[path]['duplicates'] += 1
+                continue
+            if hand_id:
+                seen.add(hand_id)
+            if plan is None or plan['hands'] >= max_hands:
+                plan = {'category': category, 'stake': stake_key, 'post_id': None, 'hands': 0, 'spans': {}}
+                plans.append(plan)
+            plan['hands'] += 1
+            plan['spans'].setdefault(path, []).append((start, end))
+            by_path[path]['hands'] += 1
+    return [plan for plan in plans if plan['spans']]
+
+
+def save_posts(user_id, text, plans, file_records, executor):
+    """Process each planned post once, with its hands, and save it in the session (not committed).
+
+    A new post gets only the planned hands; an existing one gets them added
+    to its file. When a post fails to process it is left as it was, and the
+    files with hands in it are marked failed so the next import tries them
+    again. Returns the per-post records.
+    """
+    by_path = {record['path']: record for record in file_records}
+    pending = []
+    for plan in plans:
+        post = db.session.get(Post, plan['post_id']) if plan['post_id'] is not None else None
+        original = post.file_data if post is not None else None
+        hands = ([original.decode('utf-8')] if original else []) + [
+            hand for path, spans in plan['spans'].items() for hand in _read_hands(path, spans)]
+        file_data = UPLOAD_SITES[plan['category']]['processor'].HAND_SEPARATOR.join(hands).encode('utf-8')
+        if post is None:
+            post = Post(text=text, author=user_id, category=plan['category'], stake=plan['stake'])
+            db.session.add(post)
+        post.file_data = file_data
+        pending.append((post, original, plan, _run(executor, process_hand_file, plan['category'], file_data)))
+
+    post_records = []
+    for post, original, plan, outcome in pending:
+        run, error = outcome()
+        if error is not None:
+            record = _failure(post.id, f"{type(error).__name__} - {error}")
+        else:
+            try:
+                record = _save_outcome(post, *run)
+            except Exception as e:
+                logger.exception("Could not save imported post %s", post.id)
+                record = _failure(post.id, f"{type(e).__name__} - {e}", run[0])
+        if record['status'] == 'failed':
+            # Leave the post as it was and the files unrecorded, so the next import tries them again
+            if original is not None:
+                post.file_data = original
+            elif post in db.session.new:
+                db.session.expunge(post)
+            else:
+                db.session.delete(post)
+            for path in plan['spans']:
+                by_path[path]['failed'] = True
+                by_path[path]['reason'] = by_path[path]['reason'] or f"processing failed: {record['error']}"
+        elif original is None:
+            record['status'] = 'created'
+        post_records.append((post, record))
+    db.session.flush()
+    for post, record in post_records:
+        record.update(post_id=post.id, category=post.category, stake=post.stake)
+    return [record for _, record in post_records]
+
+
+def record_imported_files(user_id, file_records, pending_plans):
+    """Note each file whose hands are all saved, so a later import skips it (in the session, not committed).
+
+    pending_plans are the posts still to be saved; a file with hands in one
+    of them waits for it. Files that failed or are not hand histories are
+    left out, to be tried again.
+    """
+    waiting = {path for plan in pending_plans for path in plan['spans']}
+    for record in file_records:
+        if record['category'] and not record.get('failed') and not record.get('recorded') and record['path'] not in waiting:
+            db.session.add(ImportedFile(user_id=user_id, digest=record['digest'], path=record['path'],
+                                        category=record['category'], hands=record['hands']))
+            record['recorded'] = True
+
+
+def imported_digests(user_id):
+    return {digest for (digest,) in db.session.query(ImportedFile.digest).filter_by(user_id=user_id)}
@@ -0,0 +1,184 @@
+# This file runs slow work in the background so pages answer right away.
+# Jobs are rows in the database; a small pool of worker threads picks them up one at a time.
+# Pages poll a job's status to show progress and the outcome when it finishes.
+import datetime
+import json
+import logging
+import threading
+import traceback
+
+from flask import current_app
+
+from . import db
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WORKERS = 2
+POLL_SECONDS = 1.0
+# A running job whose worker has not reported for this long is assumed lost and queued again
+STALE_AFTER = datetime.timedelta(minutes=15)
+
+JOB_HANDLERS = {}
+
+_wake_workers = threading.Event()
+_started_apps = set()
+_start_lock = threading.Lock()
+
+
+def job_handler(kind):
+    """Register the function that runs jobs of one kind. It is called with the Job row."""
+    def register(func):
+        JOB_HANDLERS[kind] = func
+        return func
+    return register
+
+
+def init_job_workers(app):
+    """Start the worker pool the first time the app serves a request."""
+    app.config.setdefault('JOB_WORKERS', DEFAULT_WORKERS)
+
+    @app.before_request
+    def _start_job_workers():
+        start_job_workers(app)
+
+
+def start_job_workers(app):
+    workers = app.config.get('JOB_WORKERS', DEFAULT_WORKERS)
+    if not workers:
+        return
+    with _start_lock:
+        if id(app) in _started_apps:
+            return
+        _started_apps.add(id(app))
+    for number in range(workers):
+        thread = threading.Thread(target=_worker_loop, args=(app,), name=f"job-worker-{number}", daemon=True)
+        thread.start()
+
+
+def enqueue_job(kind, user_id=None, payload=None, data=None):
+    """Save a new job and hand it to the workers.
+
+    With JOB_WORKERS set to 0 the job runs straight away in the caller instead.
+    """
+    job = Job(kind=kind, user_id=user_id, payload=json.dumps(payload or {}), data=data, status='queued')
+    db.session.add(job)
+    db.session.commit()
+    if not current_app.config.get('JOB_WORKERS', DEFAULT_WORKERS):
+        if _claim_job(job.id):
+            run_job(job.id)
+    else:
+        start_job_workers(current_app._get_current_object())
+        _wake_workers.set()
+    return job
+
+
+def report_progress(job, progress=None, message=None):
+    """Record how far a job has got; also tells the queue the worker is still alive."""
+    if progress is not None:
+        job.progress = max(0.0, min(1.0, float(progress)))
+    if message is not None:
+        job.message = message[:255]
+    job.heartbeat_at = datetime.datetime.now()
+    db.session.commit()
+
+
+def job_payload(job):
+    return json.loads(job.payload or '{}')
+
+
+def job_result(job):
+    return json.loads(job.result or '{}')
+
+
+def job_status(job):
+    """What the status endpoint returns for a job"""
+    return {
+        'id': job.id,
+        'kind': job.kind,
+        'status': job.status,
+        'progress': round(job.progress or 0.0, 3),
+        'message': job.message,
+        'result': job_result(job),
+        'error': job.error,
+        'created_at': job.created_at.isoformat() if job.created_at else None,
+        'started_at': job.started_at.isoformat() if job.started_at else None,
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None,
+    }
+
+
+def run_job(job_id):
+    """Run one claimed job and store its result or error."""
+    job = db.session.get(Job, job_id)
+    handler = JOB_HANDLERS.get(job.kind)
+    try:
+        if handler is None:
+            raise ValueError(f"No handler for job kind '{job.kind}'")
+        result = handler(job)
+    except Exception as e:
+        db.session.rollback()
+        job = db.session.get(Job, job_id)
+        job.status = 'failed'
+        job.error = traceback.format_exc()
+        job.message = f"Failed: {e}"[:255]
+        job.finished_at = datetime.datetime.now()
+        db.session.commit()
+        return job
+
+    job.status = 'done'
+    job.message = 'Finished'
+    job.progress = 1.0
+    job.result = json.dumps(result or {})
+    job.finished_at = datetime.datetime.now()
+    job.heartbeat_at = job.finished_at
+    job.data = None  # The upload is stored on the posts now
+    db.session.commit()
+    return job
+
+
+def _claim_job(job_id):
+    """Mark a queued job as running; False if another worker got there first."""
+    now = datetime.datetime.now()
+    claimed = Job.query.filter_by(id=job_id, status='queued').update(
+        {'status': 'running', 'started_at': now, 'heartbeat_at': now, 'attempts': Job.attempts + 1},
+        synchronize_session=False,
+    )
+    db.session.commit()
+    return claimed == 1
+
+
+def _requeue_stale_jobs():
+    cutoff = datetime.datetime.now() - STALE_AFTER
+    Job.query.filter(Job.status == 'running', Job.heartbeat_at < cutoff).update(
+        {'status': 'queued', 'message': 'Restarting after the worker stopped'}, synchronize_session=False
+    )
+    db.session.commit()
+
+
+def _next_job_id():
+    row = db.session.query(Job.id).filter(Job.status == 'queued').order_by(Job.id).first()
+    return row[0] if row else None
+
+
+def _worker_loop(app):
+    with app.app_context():
+        last_stale_check = None
+        while True:
+            try:
+                now = datetime.datetime.now()
+                if last_stale_check is None or now - last_stale_check > datetime.timedelta(minutes=1):
+                    _requeue_stale_jobs()
+                    last_stale_check = now
+                job_id = _next_job_id()
+                if job_id is None:
+                    db.session.remove()
+                    _wake_workers.wait(POLL_SECONDS)
+                    _wake_workers.clear()
+                    continue
+                if _claim_job(job_id):
+                    run_job(job_id)
+            except Exception:
+                db.session.rollback()
+                logger.exception("Job worker failed")
+            finally:
+                db.session.remove()
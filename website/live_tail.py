@@ -0,0 +1,231 @@
+# This file follows a hand history file the poker client is still writing to, for `flask tail-hands`.
+# Only the complete hands added since the last byte read are parsed, and their metric tallies join the running ones.
+# The new text and rows are appended to the live post, and open metrics pages hear about it over server-sent events.
+import json
+import os
+import time
+
+import pandas as pd
+
+from . import db
+from .hand_import import byte_pattern
+from .models import LiveTail, Post
+from .post_summary import append_processing_results, apply_processing_results
+from .raw_hands import reference_raw_hands
+from .sites import UPLOAD_SITES, site_processor, sniff_category
+from .stage_timer import record_stage_timings
+
+
+DEFAULT_LIVE_TEXT = 'Live session'
+# The last hand in the file is only read once the file has not grown for this long
+SETTLE_SECONDS = 2.0
+# How often a live metrics stream checks for new hands, and how long one lasts before the browser reconnects
+LIVE_POLL_SECONDS = 1.0
+LIVE_STREAM_SECONDS = 300
+LIVE_KEEPALIVE_SECONDS = 15
+
+
+class LiveTailer:
+    """Follows one file into one live post.
+
+    Only the post's running metric tallies are kept in memory. Each new batch
+    of hands is parsed, tallied and referenced on its own; its tallies are
+    added to the running ones and its text and rows are appended to the post,
+    so a poll costs the same however long the session has gone on. The post's
+    stake is taken from its first hand; hands at other stakes are skipped.
+    """
+
+    def __init__(self, tail, text=DEFAULT_LIVE_TEXT, settle_seconds=SETTLE_SECONDS):
+        self.tail = tail
+        self.text = text
+        self.settle_seconds = settle_seconds
+        self.category = None
+        self.stake = None
+        self.tallies = None
+        # Size and last byte of the post's saved file, so new text is appended without loading it
+        self.file_length = 0
+        self.file_tail = b''
+        self.seen = set()
+        self.skipped = 0
+        self.last_size = None
+        self.last_change = time.monotonic()
+        if tail.post is not None and tail.post.file_data:
+            self._load_post(tail.post)
+
+    @classmethod
+    def start(cls, user_id, path, text=DEFAULT_LIVE_TEXT, new_post=False, from_end=False,
+              settle_seconds=SETTLE_SECONDS):
+        """Pick up the user's last tail of this file, or start a new one"""
+        tail = None
+        if not new_post:
+            tail = (LiveTail.query.filter_by(user_id=user_id, path=path)
+                    .order_by(LiveTail.id.desc()).first())
+        if tail is None:
+            tail = LiveTail(user_id=user_id, path=path, offset=os.path.getsize(path) if from_end else 0)
+            db.session.add(tail)
+        tail.active = True
+        db.session.commit()
+        return cls(tail, text, settle_seconds)
+
+    def stop(self):
+        # Drop whatever a failed poll left in the session, so only the offset of saved hands is kept
+        db.session.rollback()
+        self.tail.active = False
+        db.session.commit()
+
+    def _load_post(self, post):
+        """Parse the post's hands once, to carry on from them"""
+        self.category, self.stake = post.category, post.stake
+        processor = site_processor(post.category, post.file_data.decode('utf-8'))
+        is_real_dataset, reason, processed_dataframe, results = processor.process()
+        if is_real_dataset:
+            self.tallies = processor.tallies
+        self.seen = set(processor.locate_hands())
+        self.file_length, self.file_tail = len(post.file_data), post.file_data[-1:]
+
+    def read_new_hands(self):
+        """Complete hands written since the last read, and the offset just past them.
+
+        The tail's offset is left alone; poll moves it in the commit that saves the hands.
+        """
+        path = self.tail.path
+        size = os.path.getsize(path)
+        now = time.monotonic()
+        offset = self.tail.offset
+        if size < offset:
+            # The file was cut short or replaced; read the new one from the start (hands already seen are skipped)
+            offset = 0
+        if size != self.last_size:
+            self.last_size, self.last_change = size, now
+        if size <= offset:
+            return [], offset
+
+        with open(path, 'rb') as handle:
+            handle.seek(offset)
+            data = handle.read(size - offset)
+        if self.category is None:
+            self.category = sniff_category(data)
+            if self.category is None:
+                return [], offset
+        pattern = byte_pattern(UPLOAD_SITES[self.category]['processor'].HAND_START_PATTERN)
+        starts = [m.start() for m in pattern.finditer(data)]
+        if not starts:
+            return [], offset
+        # A hand is complete once the next one starts, or once the client has stopped writing
+        ends = starts[1:]
+        if now - self.last_change >= self.settle_seconds:
+            ends.append(len(data))
+        hands = [data[start:end].decode('utf-8', errors='replace') for start, end in zip(starts, ends)]
+        return hands, offset + (ends[-1] if ends else starts[0])
+
+    def poll(self):
+        """Add any new complete hands to the live post.
+
+        The tail's offset only moves in the commit that saves the hands before
+        it. Returns a summary of the update, or None when there was nothing new.
+        """
+        hands, offset = self.read_new_hands()
+        if not hands:
+            self.tail.offset = offset
+            db.session.commit()  # Keeps the offset when only text before the first hand was passed over
+            return None
+
+        started = time.perf_counter()
+        processor = site_processor(self.category)
+        stake = self.stake
+        new_hands = []
+        new_ids = set()
+        skipped = 0
+        for hand in hands:
+            stake_key = processor.stake_key(hand)
+            if stake is None:
+                stake = stake_key
+            try:
+                hand_id = str(processor.parse_hand_header(hand).get('hand_id') or '')
+            except Exception:
+                hand_id = ''
+            if not stake_key or stake_key != stake or hand_id in self.seen or hand_id in new_ids:
+                skipped += 1
+                continue
+            if hand_id:
+                new_ids.add(hand_id)
+            new_hands.append(hand)
+
+        # The hands are slices of the file that follow on from each other, so they already end in its separators
+        text = ''.join(new_hands)
+        processor = site_processor(self.category, text)
+        rows = pd.DataFrame()
+        if new_hands:
+            is_valid, reason, valid_hands = processor.validate_hands(processor.validate)
+            if is_valid:
+                rows = processor.process_hands(valid_hands)
+        if rows is None or rows.empty:
+            self.tail.offset = offset
+            db.session.commit()
+            self.skipped += skipped + len(new_hands)
+            return None
+
+        tally = processor.metric_tallies(rows)
+        tallies = processor.merge_metric_tallies(self.tallies, tally) if self.tallies else tally
+        outcome = processor.finish_run((True, reason, rows, processor.results_from_tallies(tallies)))
+        record_stage_timings(outcome[3])
+
+        post = self.tail.post
+        if post is None:
+            post = Post(text=self.text, author=self.tail.user_id, category=self.category, stake=stake)
+            db.session.add(post)
+            self.tail.post = post
+            appended = text.encode('utf-8')
+            post.file_data = appended
+            apply_processing_results(post, rows, outcome[3], stored_hands=reference_raw_hands(rows, text, self.category))
+        else:
+            separator = '' if self.file_tail == b'\n' else UPLOAD_SITES[self.category]['processor'].HAND_SEPARATOR
+            base_offset = self.file_length + len(separator.encode('utf-8'))
+            appended = (separator + text).encode('utf-8')
+            # Only the new rows are referenced, against the new text; the saved rows' offsets still hold
+            append_processing_results(post, appended, reference_raw_hands(rows, text, self.category, base_offset),
+                                      outcome[3])
+        self.tail.hands += len(rows)
+        self.tail.offset = offset
+        db.session.commit()
+
+        self.stake = stake
+        self.tallies = tallies
+        self.file_length += len(appended)
+        self.file_tail = appended[-1:]
+        self.seen |= new_ids
+        self.skipped += skipped
+        return {'post_id': post.id, 'hands': len(rows), 'hand_count': post.hand_count,
+                'earnings': post.earnings, 'bb_per_100': post.bb_per_100,
+                'seconds': round(time.perf_counter() - started, 3)}
+
+
+def live_metrics_events(post_id):
+    """Server-sent events for a metrics page open on a live post.
+
+    A 'metrics' event with the post's summary numbers is sent straight away
+    and whenever the tail adds hands, and 'end' once the tail stops.
+    """
+    last_hands = None
+    started = last_sent = time.monotonic()
+    while time.monotonic() - started < LIVE_STREAM_SECONDS:
+        row = (db.session.query(LiveTail.hands, LiveTail.active, Post.hand_count, Post.earnings,
+                                Post.bb_earnings, Post.bb_per_100)
+               .join(Post, Post.id == LiveTail.post_id)
+               .filter(LiveTail.post_id == post_id)
+               .order_by(LiveTail.id.desc()).first())
+        # End the read so the next check sees what the tailer has committed since
+        db.session.rollback()
+        if row is None or not row.active:
+            yield "event: end\ndata: {}\n\n"
+            return
+        if row.hands != last_hands:
+            last_hands = row.hands
+            last_sent = time.monotonic()
+            update = {'hands': row.hands, 'hand_count': row.hand_count, 'earnings': row.earnings,
+                      'bb_earnings': row.bb_earnings, 'bb_per_100': row.bb_per_100}
+            yield f"event: metrics\ndata: {json.dumps(update)}\n\n"
+        elif time.monotonic() - last_sent >= LIVE_KEEPALIVE_SECONDS:
+            last_sent = time.monotonic()
+            yield ": keep-alive\n\n"
+        time.sleep(LIVE_POLL_SECONDS)
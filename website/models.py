@@ -4,6 +4,7 @@
 from . import db
 from flask_login import UserMixin
 from sqlalchemy.sql import func
+from sqlalchemy.orm import deferred
 from sqlalchemy.dialects.sqlite import JSON
 
 # View analytics
@@ -38,9 +39,10 @@ class Post(db.Model):
     date_created = db.Column(db.DateTime(timezone=True), default=func.now())
     author = db.Column(db.Integer, db.ForeignKey('user.id', ondelete="CASCADE"), nullable=False)
     comments = db.relationship('Comment', backref='post', passive_deletes=True)
-    file_data = db.Column(db.LargeBinary, nullable=True)  # New field for file contents
-    data_frame = db.Column(db.Text, nullable=True)  # Field for DataFrame JSON string
-    data_frame_results = db.Column(db.Text, nullable=True)
+    # Large payloads are only loaded when a page actually reads them
+    file_data = deferred(db.Column(db.LargeBinary, nullable=True))  # New field for file contents
+    data_frame = deferred(db.Column(db.Text, nullable=True))  # Field for DataFrame JSON string
+    data_frame_results = deferred(db.Column(db.Text, nullable=True))
     category = db.Column(db.String(50), nullable=False)  # New field for category
     stake = db.Column(db.String(50), nullable=False)
     game_type = db.Column(db.String(20), nullable=True)  # 'cash' or 'tournament'
@@ -49,6 +51,27 @@ class Post(db.Model):
     buy_in = db.Column(db.Float, nullable=True)  # Buy-in amount
     cash_out = db.Column(db.Float, nullable=True)  # Cash-out amount
     currency = db.Column(db.String(10), nullable=True, default='USD')  # Currency code
+    # Summary numbers copied from the results at upload/reprocess time
+    hand_count = db.Column(db.Integer, nullable=True)
+    earnings = db.Column(db.Float, nullable=True)
+    bb_earnings = db.Column(db.Float, nullable=True)
+    bb_per_100 = db.Column(db.Float, nullable=True)
+    stake_normalized = db.Column(db.String(50), nullable=True, index=True)
+    processing_version = db.Column(db.String(20), nullable=True)  # Parser version that built data_frame
+    metrics_version = db.Column(db.String(20), nullable=True)  # Fingerprint of the metric versions used
+    metric_versions = db.Column(db.Text, nullable=True)  # JSON of each metric's version
+    results_digest = db.Column(db.String(16), nullable=True)  # Hash of data_frame_results, for cache keys and ETags
+
+    __table_args__ = (
+        db.Index('ix_post_date_created_id', 'date_created', 'id'),
+        db.Index('ix_post_author_date_created', 'author', 'date_created', 'id'),
+        db.Index('ix_post_author_stake_category', 'author', 'stake_normalized', 'category'),
+    )
+
+    @property
+    def has_results(self):
+        """True when the post has processed results, without loading them"""
+        return self.hand_count is not None
 
 class Comment(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -133,3 +156,79 @@ class LiveSession(db.Model):
             if profit_bb is not None:
                 return profit_bb / self.hours_played
         return None
+
+
+class UserStats(db.Model):
+    """One running total of a user's sessions: the value at one path of one bucket (all, stake, site or month)"""
+    __tablename__ = 'user_stats_value'
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete="CASCADE"), nullable=False, index=True)
+    bucket_type = db.Column(db.String(10), nullable=False)  # 'all', 'stake', 'site', 'month' or 'format'
+    bucket_key = db.Column(db.String(50), nullable=False, default='')  # e.g. '.25/.50', 'Ladbrooks', '2024-03'
+    path = db.Column(db.String(200), nullable=False, default='[]')  # JSON list of keys, e.g. '["metrics", "vpip_count"]'
+    value = db.Column(db.Float, nullable=False, default=0.0)
+    whole = db.Column(db.Boolean, nullable=False, default=False)  # Counts are read back as ints
+    updated_at = db.Column(db.DateTime(timezone=True), default=func.now())
+
+    __table_args__ = (db.UniqueConstraint('user_id', 'bucket_type', 'bucket_key', 'path', name='uq_user_stats_value'),)
+
+
+class PostMatchup(db.Model):
+    """One post's share of a positional matchup, listed as a source under the user's combined matchups"""
+    __tablename__ = 'post_matchup'
+    id = db.Column(db.Integer, primary_key=True)
+    post_id = db.Column(db.Integer, db.ForeignKey('post.id', ondelete="CASCADE"), nullable=False, index=True)
+    pot_type = db.Column(db.String(30), nullable=False)  # e.g. 'RFI Pots'
+    matchup = db.Column(db.String(30), nullable=False)  # e.g. 'BTN vs BB'
+    hands = db.Column(db.Integer, nullable=False, default=0)
+    bb_earnings = db.Column(db.Float, nullable=False, default=0.0)
+    earnings = db.Column(db.Float, nullable=False, default=0.0)
+    hand_ids = db.Column(db.Text, nullable=True)  # JSON list of the hands in the matchup
+
+
+class Job(db.Model):
+    """A piece of slow work (e.g. processing an upload) run by the background workers"""
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete="CASCADE"), nullable=True, index=True)
+    kind = db.Column(db.String(50), nullable=False)  # e.g. 'upload'
+    status = db.Column(db.String(20), nullable=False, default='queued', index=True)  # queued, running, done or failed
+    progress = db.Column(db.Float, nullable=False, default=0.0)  # 0 to 1
+    message = db.Column(db.String(255), nullable=True)  # What the job is doing right now
+    payload = db.Column(db.Text, nullable=True)  # JSON arguments
+    data = deferred(db.Column(db.LargeBinary, nullable=True))  # Uploaded file, if any
+    result = db.Column(db.Text, nullable=True)  # JSON outcome shown when the job finishes
+    error = db.Column(db.Text, nullable=True)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime(timezone=True), default=func.now())
+    started_at = db.Column(db.DateTime(timezone=True), nullable=True)
+    finished_at = db.Column(db.DateTime(timezone=True), nullable=True)
+    heartbeat_at = db.Column(db.DateTime(timezone=True), nullable=True)  # Last sign of life from the worker
+
+
+class ImportedFile(db.Model):
+    """A hand history file on disk whose hands `flask import-hands` has added to a user's posts"""
+    __tablename__ = 'imported_file'
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete="CASCADE"), nullable=False, index=True)
+    digest = db.Column(db.String(64), nullable=False)  # SHA-256 of the file's contents
+    path = db.Column(db.Text, nullable=False)  # Where the file was when it was imported
+    category = db.Column(db.String(50), nullable=True)
+    hands = db.Column(db.Integer, nullable=False, default=0)  # New hands it added
+    imported_at = db.Column(db.DateTime(timezone=True), default=func.now())
+
+    __table_args__ = (db.UniqueConstraint('user_id', 'digest', name='uq_imported_file_digest'),)
+
+
+class LiveTail(db.Model):
+    """A hand history file `flask tail-hands` follows into a live post while the poker client writes to it"""
+    __tablename__ = 'live_tail'
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete="CASCADE"), nullable=False, index=True)
+    post_id = db.Column(db.Integer, db.ForeignKey('post.id', ondelete="CASCADE"), nullable=True, index=True)  # Made with the first hands
+    post = db.relationship('Post')
+    path = db.Column(db.Text, nullable=False)
+    offset = db.Column(db.Integer, nullable=False, default=0)  # Bytes of the file already read
+    hands = db.Column(db.Integer, nullable=False, default=0)  # Hands added to the post so far
+    active = db.Column(db.Boolean, nullable=False, default=True)  # False once the tailer stops
+    started_at = db.Column(db.DateTime(timezone=True), default=func.now())
+    updated_at = db.Column(db.DateTime(timezone=True), default=func.now(), onupdate=func.now())
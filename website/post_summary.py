@@ -0,0 +1,296 @@
+# This file keeps the small summary numbers saved on each post.
+# It copies hands, earnings and win rate out of the processed results at upload time.
+# List pages read these columns so they never have to load the big hand data.
+import ast
+import json
+from io import StringIO
+
+import pandas as pd
+from sqlalchemy import LargeBinary, case, cast, func, text, update
+
+from . import db
+from .LadbrooksPokerHandProcessor import LadbrooksPokerHandProcessor
+from .metrics_cache import invalidate_post_metrics, results_digest
+from .raw_hands import attach_raw_hands, hand_processor, reference_raw_hands
+
+
+POST_SUMMARY_COLUMNS = {
+    'hand_count': 'INTEGER',
+    'earnings': 'FLOAT',
+    'bb_earnings': 'FLOAT',
+    'bb_per_100': 'FLOAT',
+    'stake_normalized': 'VARCHAR(50)',
+    'processing_version': 'VARCHAR(20)',
+    'metrics_version': 'VARCHAR(20)',
+    'metric_versions': 'TEXT',
+    'results_digest': 'VARCHAR(16)',
+}
+
+POST_INDEXES = {
+    'ix_post_date_created_id': 'post (date_created, id)',
+    'ix_post_stake_normalized': 'post (stake_normalized)',
+    'ix_post_author_date_created': 'post (author, date_created, id)',
+    'ix_post_author_stake_category': 'post (author, stake_normalized, category)',
+}
+
+
+def normalize_stake(stake):
+    """Normalize stake string to handle variations like .25/.5 and .25/.50 (same stake)"""
+    if not stake:
+        return stake
+
+    try:
+        # Remove any whitespace
+        stake = stake.strip()
+
+        # Split by /
+        parts = stake.split('/')
+        if len(parts) != 2:
+            return stake
+
+        sb_str = parts[0].strip()
+        bb_str = parts[1].strip()
+
+        # Convert to floats (this handles .5, .50, 0.5, 0.50 all as 0.5)
+        sb = float(sb_str)
+        bb = float(bb_str)
+
+        # Always format with 2 decimal places for consistency
+        # This ensures .25/.5 becomes 0.25/0.50 and .25/.50 becomes 0.25/0.50
+        normalized = f"{sb:.2f}/{bb:.2f}"
+
+        # Remove leading zero if present for small decimals (optional, but cleaner)
+        # e.g., "0.25/0.50" -> ".25/.50"
+        if sb < 1 and bb < 1:
+            normalized = normalized.replace("0.", ".")
+
+        return normalized
+    except (ValueError, AttributeError):
+        # If parsing fails, return original
+        return stake
+
+
+def ensure_post_columns():
+    """Add the summary columns and list indexes to an existing post table."""
+    try:
+        columns = [row[1] for row in db.session.execute(text("PRAGMA table_info(post)"))]
+    except Exception:
+        return
+
+    for name, column_type in POST_SUMMARY_COLUMNS.items():
+        if name not in columns:
+            db.session.execute(text(f"ALTER TABLE post ADD COLUMN {name} {column_type}"))
+    for name, target in POST_INDEXES.items():
+        db.session.execute(text(f"CREATE INDEX IF NOT EXISTS {name} ON {target}"))
+    db.session.commit()
+
+
+def load_results_metrics(results_json):
+    """Return the single metrics dict stored in data_frame_results, or None."""
+    if not results_json:
+        return None
+    try:
+        metrics_list = json.loads(results_json)
+    except Exception:
+        return None
+    if not metrics_list or not isinstance(metrics_list, list):
+        return None
+    metrics = metrics_list[0]
+    if isinstance(metrics, str):
+        try:
+            metrics = json.loads(metrics)
+        except Exception:
+            try:
+                metrics = ast.literal_eval(metrics)
+            except Exception:
+                return None
+    return metrics if isinstance(metrics, dict) else None
+
+
+def summarize_results(metrics):
+    """Pick the list-page numbers out of one row of processed results."""
+    def as_float(value):
+        try:
+            return round(float(value), 2)
+        except (TypeError, ValueError):
+            return 0.0
+
+    hand_count = metrics.get('Total Hands')
+    if hand_count is None:
+        vpip_info = metrics.get('VPIP Info') or {}
+        if isinstance(vpip_info, str):
+            try:
+                vpip_info = json.loads(vpip_info)
+            except ValueError:
+                vpip_info = {}
+        hand_count = vpip_info.get('num_viable_hands', 0)
+
+    return {
+        'hand_count': int(hand_count or 0),
+        'earnings': as_float(metrics.get('Session Earnings')),
+        'bb_earnings': as_float(metrics.get('Session BB Earnings')),
+        'bb_per_100': as_float(metrics.get('BB per 100 hands')),
+    }
+
+
+def apply_processing_results(post, processed_dataframe, results, stored_hands=None):
+    """Store processed hands and results on a post along with its summary columns.
+
+    The post should already be added to the session; its author's running
+    stats are moved from the old results to the new ones. stored_hands, if
+    given, is processed_dataframe already referenced to the post's file (see
+    reference_raw_hands) and is saved as it is.
+    """
+    from .user_stats import add_post_stats, remove_post_stats
+
+    if post.id is not None:
+        remove_post_stats(post)
+        invalidate_post_metrics(post.id)
+
+    if stored_hands is None:
+        stored_hands = reference_raw_hands(processed_dataframe, post.file_data, post.category)
+    post.data_frame = stored_hands.to_json(orient='records')
+    post.data_frame_results = results.to_json(orient='records')
+    post.results_digest = results_digest(post.data_frame_results)
+    post.stake_normalized = normalize_stake(post.stake)
+    stamp_versions(post)
+
+    metrics = results.iloc[0].to_dict() if len(results) else {}
+    for name, value in summarize_results(metrics).items():
+        setattr(post, name, value)
+
+    db.session.flush()
+    add_post_stats(post)
+    return post
+
+
+def append_processing_results(post, file_data, stored_hands, results):
+    """Add hands to the end of a saved post and store the results they now add up to.
+
+    The new file text and the new hands' stored rows (see reference_raw_hands)
+    are appended in SQL, so the post's saved file and rows are never loaded or
+    written back; only the results row and summary columns are replaced. Its
+    author's running totals move by the difference the new hands make.
+    """
+    from .models import Post
+    from .user_stats import update_post_stats
+
+    invalidate_post_metrics(post.id)
+    old_metrics = load_results_metrics(post.data_frame_results)
+    records = stored_hands.to_json(orient='records')
+    db.session.execute(
+        update(Post).where(Post.id == post.id).values(
+            file_data=cast(func.coalesce(Post.file_data, b'').op('||')(file_data), LargeBinary),
+            # Splice the new records into the saved JSON array
+            data_frame=case(
+                (Post.data_frame.is_(None) | (Post.data_frame == '[]'), records),
+                else_=func.substr(Post.data_frame, 1, func.length(Post.data_frame) - 1).op('||')(',' + records[1:]),
+            ),
+        ).execution_options(synchronize_session=False)
+    )
+    db.session.expire(post, ['file_data', 'data_frame'])
+
+    post.data_frame_results = results.to_json(orient='records')
+    post.results_digest = results_digest(post.data_frame_results)
+    stamp_versions(post)
+    metrics = load_results_metrics(post.data_frame_results)
+    for name, value in summarize_results(metrics or {}).items():
+        setattr(post, name, value)
+
+    db.session.flush()
+    update_post_stats(post, old_metrics, metrics)
+    return post
+
+
+def stamp_versions(post):
+    """Record which parser and metric versions produced a post's results."""
+    post.processing_version = LadbrooksPokerHandProcessor.PARSER_VERSION
+    post.metrics_version = LadbrooksPokerHandProcessor.metrics_version()
+    post.metric_versions = json.dumps(LadbrooksPokerHandProcessor.METRIC_VERSIONS, sort_keys=True)
+
+
+def stale_metrics(post):
+    """Metrics of a post computed by an older version.
+
+    Returns None when the post needs a full reprocess (never stamped or parsed
+    by an older parser) and an empty list when it is up to date.
+    """
+    if not post.data_frame_results or post.processing_version != LadbrooksPokerHandProcessor.PARSER_VERSION:
+        return None
+    if post.metrics_version == LadbrooksPokerHandProcessor.metrics_version():
+        return []
+    try:
+        stored_versions = json.loads(post.metric_versions or '{}')
+    except ValueError:
+        return None
+    return [
+        name for name, version in LadbrooksPokerHandProcessor.METRIC_VERSIONS.items()
+        if stored_versions.get(name) != version
+    ]
+
+
+def refresh_metrics(post, metric_names):
+    """Recompute only the given metrics from the post's stored hands.
+
+    Returns False without changing anything if one of them can only be
+    recomputed by a full reprocess.
+    """
+    from .user_stats import add_post_stats, remove_post_stats
+
+    if not post.data_frame:
+        return False
+    processor = hand_processor(post.category)
+    dataframe = attach_raw_hands(pd.read_json(StringIO(post.data_frame), orient='records'), post)
+
+    updates = {}
+    for name in metric_names:
+        values = processor.calculate_standalone_metric(name, dataframe)
+        if values is None:
+            return False
+        updates.update(values)
+
+    metrics = load_results_metrics(post.data_frame_results)
+    if metrics is None:
+        return False
+    # Round-trip through pandas so values are encoded exactly like a full run
+    updated_row = json.loads(pd.DataFrame([processor.serialize_results(updates)]).to_json(orient='records'))[0]
+
+    remove_post_stats(post)
+    invalidate_post_metrics(post.id)
+    metrics.update(updated_row)
+    post.data_frame_results = json.dumps([metrics])
+    post.results_digest = results_digest(post.data_frame_results)
+    stamp_versions(post)
+    for name, value in summarize_results(metrics).items():
+        setattr(post, name, value)
+    db.session.flush()
+    add_post_stats(post, metrics)
+    return True
+
+
+def backfill_post_summaries(batch_size=50):
+    """Fill summary columns for posts saved before the columns existed."""
+    from .models import Post
+
+    missing = (
+        db.session.query(Post.id, Post.stake, Post.data_frame_results)
+        .filter(Post.stake_normalized.is_(None)
+                | ((Post.hand_count.is_(None) | Post.results_digest.is_(None)) & Post.data_frame_results.isnot(None)))
+        .yield_per(batch_size)
+    )
+    updates = []
+    for post_id, stake, results_json in missing:
+        values = {'id': post_id, 'stake_normalized': normalize_stake(stake),
+                  'results_digest': results_digest(results_json) if results_json else None}
+        metrics = load_results_metrics(results_json)
+        if metrics is not None:
+            values.update(summarize_results(metrics))
+        elif results_json is not None:
+            # Results that can't be read never will be; count them as done so startup skips them from now on
+            values['hand_count'] = 0
+        updates.append(values)
+
+    if updates:
+        db.session.bulk_update_mappings(Post, updates)
+        db.session.commit()
+    return len(updates)
@@ -0,0 +1,68 @@
+# This file sets up logging for hand processing.
+# Problems with single hands are counted, a few are logged in detail, and one summary is logged per run.
+# Set the LOG_LEVEL environment variable to DEBUG to see the sampled per-hand detail.
+import logging
+import os
+
+
+# Per-hand debug messages logged for each kind of message in one run
+DEBUG_SAMPLES = 5
+# Hand ids kept as examples for each kind of problem
+EXAMPLE_HAND_IDS = 3
+
+
+def configure_logging(app):
+    """Set the website's log level from LOG_LEVEL (INFO by default).
+
+    Module loggers are children of the app logger, so they share Flask's
+    handler and format.
+    """
+    app.config.setdefault('LOG_LEVEL', os.environ.get('LOG_LEVEL', 'INFO').upper())
+    app.logger.setLevel(app.config['LOG_LEVEL'])
+
+
+class HandIssues:
+    """Counts problems with single hands during one processing run.
+
+    Only the first few messages of each kind are logged (at debug level);
+    log_summary() then logs one line per kind with a few example hand ids.
+    """
+
+    def __init__(self, logger, samples=DEBUG_SAMPLES, examples=EXAMPLE_HAND_IDS):
+        self.logger = logger
+        self.samples = samples
+        self.examples = examples
+        self.current_hand_id = None
+        self.counts = {}
+        self.hand_ids = {}
+        self._logged = {}
+
+    def debug(self, key, message, *args, exc_info=False):
+        """Log a per-hand debug message, only the first few times for each key"""
+        logged = self._logged.get(key, 0)
+        if logged >= self.samples or not self.logger.isEnabledFor(logging.DEBUG):
+            return
+        self._logged[key] = logged + 1
+        self.logger.debug(message, *args, exc_info=exc_info)
+
+    def record(self, problem, message=None, *args, exc_info=False):
+        """Count a hand with a problem (e.g. 'failed to parse') against the current hand id"""
+        self.counts[problem] = self.counts.get(problem, 0) + 1
+        examples = self.hand_ids.setdefault(problem, [])
+        hand_id = self.current_hand_id
+        if hand_id and len(examples) < self.examples and hand_id not in examples:
+            examples.append(hand_id)
+        if message:
+            self.debug(problem, message, *args, exc_info=exc_info)
+
+    def summary(self):
+        return {
+            problem: {'hands': count, 'example_hand_ids': list(self.hand_ids.get(problem, []))}
+            for problem, count in self.counts.items()
+        }
+
+    def log_summary(self, context):
+        """Log one warning per kind of problem seen in the run"""
+        for problem, count in sorted(self.counts.items()):
+            examples = ', '.join(str(hand_id) for hand_id in self.hand_ids.get(problem, [])) or 'none recorded'
+            self.logger.warning("%s: %d hand(s) %s (example hand ids: %s)", context, count, problem, examples)
@@ -0,0 +1,61 @@
+# This file measures and limits the memory used while hand files are processed.
+# Each timed stage notes the process's resident memory, plus tracemalloc peaks when TRACE_PROCESSING_MEMORY=1.
+# Files too big for PROCESSING_MEMORY_BUDGET_MB are processed in chunks whose metrics are added up as they go.
+import os
+import sys
+
+
+MB = 1024 * 1024
+# A full processing run peaks at about this many times the size of the file's text
+FOOTPRINT_PER_INPUT_BYTE = 10
+# Chunks never get smaller than this, however tight the budget
+MIN_CHUNK_HANDS = 100
+
+
+def memory_budget_mb():
+    """The memory budget for processing one file, from PROCESSING_MEMORY_BUDGET_MB (0 or unset: none).
+
+    Read from the environment because processors also run in worker processes
+    that have no app.
+    """
+    try:
+        return max(float(os.environ.get('PROCESSING_MEMORY_BUDGET_MB') or 0), 0.0)
+    except ValueError:
+        return 0.0
+
+
+def trace_memory_enabled():
+    """tracemalloc slows processing down several times, so it is only used when asked for"""
+    return os.environ.get('TRACE_PROCESSING_MEMORY') == '1'
+
+
+def current_rss_mb():
+    """Resident memory of this process in MB, or None where it can't be read"""
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / MB
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    # Without /proc only the high-water mark is available; macOS reports bytes, Linux KB
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return max_rss / MB if sys.platform == 'darwin' else max_rss / 1024
+
+
+def estimate_footprint_mb(data):
+    """Roughly how much memory processing this file's text will take at its peak"""
+    return len(data) * FOOTPRINT_PER_INPUT_BYTE / MB
+
+
+def chunk_hands(hand_count, footprint_mb, budget_mb):
+    """Hands per chunk so that one chunk's share of the footprint uses at most half the budget.
+
+    The other half is left for the file's text and the rows encoded for saving.
+    """
+    if hand_count <= 0 or footprint_mb <= 0:
+        return max(hand_count, 1)
+    per_hand_mb = footprint_mb / hand_count
+    return max(MIN_CHUNK_HANDS, int(budget_mb / 2 / per_hand_mb))
@@ -0,0 +1,123 @@
+# This file stores where each hand's text sits in the uploaded file.
+# Saved hand rows keep a byte offset and length instead of a copy of the text.
+# Pages that need the text slice it back out of the post's file when they ask for it.
+import pandas as pd
+
+from .sites import UPLOAD_SITES, site_processor
+
+
+RAW_HAND_COLUMN = 'Raw Hand'
+RAW_OFFSET_COLUMN = 'raw_offset'
+RAW_LENGTH_COLUMN = 'raw_length'
+
+
+def hand_processor(category, data=''):
+    """Processor that knows the hand format of a post category"""
+    return site_processor(category if category in UPLOAD_SITES else 'ladbrooks', data)
+
+
+def _as_bytes(file_data):
+    if isinstance(file_data, str):
+        return file_data.encode('utf-8')
+    if isinstance(file_data, bytes):
+        return file_data
+    return bytes(file_data)
+
+
+def reference_raw_hands(dataframe, file_data, category, base_offset=0):
+    """Return a copy of the processed hands with raw text swapped for file offsets.
+
+    A row keeps its text only if slicing the file would not give it back exactly.
+    base_offset is added to every offset, for hands from text that is being
+    appended at that byte of a longer file. StoredHandRows are already
+    referenced and come back as they are.
+    """
+    if (isinstance(dataframe, StoredHandRows) or dataframe is None or RAW_HAND_COLUMN not in dataframe.columns
+            or 'hand_id' not in dataframe.columns or not file_data):
+        return dataframe
+
+    file_bytes = _as_bytes(file_data)
+    processor = hand_processor(category, file_bytes.decode('utf-8'))
+    return reference_located_hands(dataframe, file_bytes, processor.locate_hands(), processor, base_offset)
+
+
+def reference_located_hands(dataframe, file_bytes, located, processor, base_offset=0):
+    """reference_raw_hands for a file whose hands processor.locate_hands() has already found"""
+    offsets, lengths, unmatched = [], [], []
+    for hand_id, raw_hand in zip(dataframe['hand_id'], dataframe[RAW_HAND_COLUMN]):
+        span = located.get(str(hand_id))
+        if span and raw_hand_at(file_bytes, span[0], span[1], None, processor) == raw_hand:
+            offsets.append(base_offset + span[0])
+            lengths.append(span[1])
+            unmatched.append(None)
+        else:
+            offsets.append(None)
+            lengths.append(None)
+            unmatched.append(raw_hand)
+
+    referenced = dataframe.drop(columns=[RAW_HAND_COLUMN])
+    referenced[RAW_OFFSET_COLUMN] = pd.Series(offsets, index=dataframe.index, dtype='Int64')
+    referenced[RAW_LENGTH_COLUMN] = pd.Series(lengths, index=dataframe.index, dtype='Int64')
+    if any(raw_hand is not None for raw_hand in unmatched):
+        referenced[RAW_HAND_COLUMN] = unmatched
+    return referenced
+
+
+class StoredHandRows:
+    """Referenced hand rows kept only as the JSON records they are saved as, one chunk at a time.
+
+    Stands in for the hands dataframe of a file processed in chunks: it has
+    the frame's length and to_json, so the rows are never all held as a frame.
+    """
+
+    def __init__(self):
+        self.chunks = []
+        self.rows = 0
+        self.bytes = 0
+
+    def add(self, referenced):
+        if referenced.empty:
+            return
+        records = referenced.to_json(orient='records')[1:-1]  # Without the enclosing brackets
+        self.chunks.append(records)
+        self.rows += len(referenced)
+        self.bytes += len(records)
+
+    @property
+    def empty(self):
+        return self.rows == 0
+
+    def __len__(self):
+        return self.rows
+
+    def to_json(self, orient='records'):
+        if orient != 'records':
+            raise ValueError("Stored hand rows are only kept as records")
+        return '[' + ','.join(self.chunks) + ']'
+
+
+def raw_hand_at(file_data, offset, length, category, processor=None):
+    """Raw hand text for one (offset, length) reference into a post's file"""
+    if file_data is None or offset is None or length is None or pd.isna(offset) or pd.isna(length):
+        return None
+    offset, length = int(offset), int(length)
+    hand = _as_bytes(file_data)[offset:offset + length].decode('utf-8')
+    return (processor or hand_processor(category)).raw_hand_from_source(hand)
+
+
+def attach_raw_hands(dataframe, post):
+    """Fill the 'Raw Hand' column of a stored frame from the post's file"""
+    if dataframe is None or RAW_OFFSET_COLUMN not in dataframe.columns:
+        return dataframe
+
+    file_bytes = _as_bytes(post.file_data) if post.file_data else None
+    processor = hand_processor(post.category)
+    existing = dataframe[RAW_HAND_COLUMN] if RAW_HAND_COLUMN in dataframe.columns else [None] * len(dataframe)
+    raw_hands = []
+    for offset, length, raw_hand in zip(dataframe[RAW_OFFSET_COLUMN], dataframe[RAW_LENGTH_COLUMN], existing):
+        if isinstance(raw_hand, str):
+            raw_hands.append(raw_hand)
+        else:
+            raw_hands.append(raw_hand_at(file_bytes, offset, length, post.category, processor) or '')
+    dataframe[RAW_HAND_COLUMN] = raw_hands
+    return dataframe
@@ -0,0 +1,200 @@
+# This file reprocesses all of a user's posts as a background job.
+# Hand files are parsed by a pool of worker processes and saved a few posts at a time.
+# Progress is saved with each batch, so a job that stops picks up where it left off.
+import json
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from sqlalchemy import String, type_coerce
+
+from . import db
+from .jobs import job_handler, job_payload, job_result, report_progress
+from .models import Post
+from .post_summary import apply_processing_results, refresh_metrics, stale_metrics
+from .shadow_mode import schedule_shadow_runs
+from .stage_timer import record_stage_timings
+from .sites import UPLOAD_SITES, process_site_file, site_labels
+
+logger = logging.getLogger(__name__)
+
+# Posts saved per commit; progress is checkpointed at the same time
+REPROCESS_BATCH_SIZE = 5
+DEFAULT_REPROCESS_WORKERS = min(4, os.cpu_count() or 1)
+
+
+def process_hand_file(category, file_data):
+    """Parse one stored hand file with its site's processor.
+
+    Runs in a worker process, so it only takes and returns plain values and
+    dataframes. Returns (seconds taken, processor output).
+    """
+    started = time.perf_counter()
+    outcome = process_site_file(category, file_data.decode('utf-8'))
+    return time.perf_counter() - started, outcome
+
+
+def reprocess_query(user_id=None, categories=None, since=None):
+    """Query for the ids of posts with a stored hand file to reprocess"""
+    categories = tuple(UPLOAD_SITES) if categories is None else categories
+    query = db.session.query(Post.id).filter(Post.file_data.isnot(None), Post.category.in_(categories))
+    if user_id is not None:
+        query = query.filter(Post.author == user_id)
+    if since is not None:
+        # Dates are stored as text without microseconds, so compare them as text
+        query = query.filter(type_coerce(Post.date_created, String) >= since.strftime('%Y-%m-%d %H:%M:%S'))
+    return query
+
+
+def reprocess_post_ids(user_id):
+    """Ids of the posts a reprocess-all run covers, oldest first"""
+    return [post_id for (post_id,) in reprocess_query(user_id).order_by(Post.id)]
+
+
+def iter_post_id_batches(query, batch_size):
+    """Walk a post id query in id order, batch_size ids at a time.
+
+    Each batch is a fresh query starting after the last id seen, so no read
+    cursor stays open while batches are being written.
+    """
+    last_id = 0
+    while True:
+        batch = [post_id for (post_id,) in query.filter(Post.id > last_id).order_by(Post.id).limit(batch_size)]
+        if not batch:
+            return
+        yield batch
+        last_id = batch[-1]
+
+
+def process_pool(workers):
+    if workers <= 1:
+        return None
+    # Workers are spawned rather than forked because the app runs threads
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+
+
+def _failure(post_id, error, seconds=None):
+    return {'post_id': post_id, 'status': 'failed', 'error': error[:300],
+            'seconds': round(seconds, 3) if seconds is not None else None}
+
+
+def _save_outcome(post, seconds, outcome):
+    """Store a processor run on its post; returns the per-post record."""
+    is_real_dataset, reason, processed_dataframe, results = outcome
+    record_stage_timings(results)
+    if not is_real_dataset:
+        return _failure(post.id, f"Invalid dataset - {reason}", seconds)
+    if processed_dataframe is None or processed_dataframe.empty:
+        return _failure(post.id, "No valid hands found", seconds)
+    if results is None or results.empty:
+        return _failure(post.id, "No results generated", seconds)
+    apply_processing_results(post, processed_dataframe, results)
+    return {'post_id': post.id, 'status': 'reprocessed', 'seconds': round(seconds, 3), 'hands': len(processed_dataframe)}
+
+
+def reprocess_batch(post_ids, stale_only, executor):
+    """Reprocess some posts in the session (not committed); returns one record per post."""
+    records = {}
+    pending = []
+    for post_id in post_ids:
+        post = db.session.get(Post, post_id)
+        if post is None:
+            records[post_id] = _failure(post_id, "Post no longer exists")
+            continue
+        if stale_only:
+            started = time.perf_counter()
+            outdated = stale_metrics(post)
+            if outdated == []:
+                records[post_id] = {'post_id': post_id, 'status': 'up_to_date'}
+                continue
+            if outdated and refresh_metrics(post, outdated):
+                records[post_id] = {'post_id': post_id, 'status': 'refreshed', 'metrics': outdated,
+                                    'seconds': round(time.perf_counter() - started, 3)}
+                continue
+        if post.category not in UPLOAD_SITES:
+            records[post_id] = _failure(post_id, f"Reprocessing is only available for {site_labels()} posts.")
+        elif not post.file_data or not post.file_data.strip():
+            records[post_id] = _failure(post_id, "No file data found")
+        else:
+            pending.append(post)
+
+    if executor is None:
+        runs = []
+        for post in pending:
+            try:
+                runs.append((post, process_hand_file(post.category, post.file_data), None))
+            except Exception as e:
+                runs.append((post, None, e))
+    else:
+        futures = [(post, executor.submit(process_hand_file, post.category, post.file_data)) for post in pending]
+        runs = []
+        for post, future in futures:
+            try:
+                runs.append((post, future.result(), None))
+            except Exception as e:
+                runs.append((post, None, e))
+
+    for post, run, error in runs:
+        if error is not None:
+            records[post.id] = _failure(post.id, f"{type(error).__name__} - {error}")
+            continue
+        try:
+            records[post.id] = _save_outcome(post, *run)
+        except Exception as e:
+            logger.exception("Could not save the reprocessed post %s", post.id)
+            records[post.id] = _failure(post.id, f"{type(e).__name__} - {e}", run[0])
+    return [records[post_id] for post_id in post_ids]
+
+
+def reprocess_counts(posts):
+    """How many posts ended in each status"""
+    counts = {'reprocessed': 0, 'refreshed': 0, 'up_to_date': 0, 'failed': 0}
+    for record in posts:
+        counts[record['status']] = counts.get(record['status'], 0) + 1
+    return counts
+
+
+@job_handler('reprocess')
+def run_reprocess_job(job):
+    """Reprocess a user's posts, resuming from the job's last checkpoint."""
+    from flask import current_app
+
+    stale_only = job_payload(job).get('stale_only', False)
+    checkpoint = job_result(job)
+    if 'post_ids' not in checkpoint:
+        checkpoint = {'stale_only': stale_only, 'post_ids': reprocess_post_ids(job.user_id), 'posts': []}
+    finished = {record['post_id'] for record in checkpoint['posts']}
+    remaining = [post_id for post_id in checkpoint['post_ids'] if post_id not in finished]
+    total = len(checkpoint['post_ids']) or 1
+
+    workers = current_app.config.get('REPROCESS_WORKERS', DEFAULT_REPROCESS_WORKERS)
+    executor = process_pool(min(workers, len(remaining)))
+    try:
+        for start in range(0, len(remaining), REPROCESS_BATCH_SIZE):
+            batch = remaining[start:start + REPROCESS_BATCH_SIZE]
+            try:
+                records = reprocess_batch(batch, stale_only, executor)
+            except Exception as e:
+                # Keep going with the next batch; this one is recorded as failed
+                db.session.rollback()
+                logger.exception("Reprocess batch failed")
+                records = [_failure(post_id, f"{type(e).__name__} - {e}") for post_id in batch]
+            checkpoint['posts'].extend(records)
+            checkpoint['counts'] = reprocess_counts(checkpoint['posts'])
+            _save_checkpoint(job, checkpoint, total)
+            schedule_shadow_runs(records)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    checkpoint['counts'] = reprocess_counts(checkpoint['posts'])
+    return checkpoint
+
+
+def _save_checkpoint(job, checkpoint, total):
+    """Commit the batch's posts together with the record of what is done."""
+    job.result = json.dumps(checkpoint)
+    done = len(checkpoint['posts'])
+    report_progress(job, done / total, f"Reprocessed {done} of {total} posts")
@@ -0,0 +1,234 @@
+# This file profiles single requests for admins, to find out why a page is slow.
+# A profiled request runs under cProfile and counts its database queries and template render time.
+# The last few profiles are kept in memory and shown on the admin profiles page.
+import cProfile
+import itertools
+import os
+import pstats
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+
+from flask import g, request, template_rendered, before_render_template
+from flask_login import current_user
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+DEFAULT_HISTORY = 20
+# Functions listed per profile, by cumulative time
+TOP_FUNCTIONS = 40
+# Slowest and most repeated statements kept per profile
+TOP_QUERIES = 10
+STATEMENT_LENGTH = 500
+
+_profiles = deque(maxlen=DEFAULT_HISTORY)
+_profiles_lock = threading.Lock()
+_profile_ids = itertools.count(1)
+# The profile being recorded on this thread, if any; engine events and template signals add to it
+_active = threading.local()
+
+
+class _RequestProfile:
+    """What one profiled request spent its time on"""
+
+    def __init__(self):
+        self.profiler = cProfile.Profile()
+        self.started = time.perf_counter()
+        self.query_count = 0
+        self.query_seconds = 0.0
+        self.queries = {}
+        self.template_seconds = 0.0
+        self.templates = []
+        self._query_started = []
+        self._template_started = []
+
+    def query_started(self):
+        self._query_started.append(time.perf_counter())
+
+    def query_finished(self, statement):
+        if not self._query_started:
+            return
+        seconds = time.perf_counter() - self._query_started.pop()
+        self.query_count += 1
+        self.query_seconds += seconds
+        totals = self.queries.setdefault(statement[:STATEMENT_LENGTH], {'count': 0, 'seconds': 0.0, 'slowest': 0.0})
+        totals['count'] += 1
+        totals['seconds'] += seconds
+        totals['slowest'] = max(totals['slowest'], seconds)
+
+    def template_started(self):
+        self._template_started.append(time.perf_counter())
+
+    def template_finished(self, name):
+        if not self._template_started:
+            return
+        seconds = time.perf_counter() - self._template_started.pop()
+        self.template_seconds += seconds
+        self.templates.append({'name': name, 'seconds': seconds})
+
+    def finish(self, status_code, error=None):
+        """Stop profiling and turn the numbers into the record shown on the admin page"""
+        self.profiler.disable()
+        total = time.perf_counter() - self.started
+        statements = [dict(totals, statement=statement) for statement, totals in self.queries.items()]
+        return {
+            'id': next(_profile_ids),
+            'created_at': datetime.now(),
+            'method': request.method,
+            'path': request.full_path.rstrip('?'),
+            'endpoint': request.endpoint,
+            'user': current_user.username if current_user.is_authenticated else None,
+            'status': status_code,
+            'error': error,
+            'total_seconds': total,
+            'query_count': self.query_count,
+            'query_seconds': self.query_seconds,
+            'slowest_queries': sorted(statements, key=lambda row: row['slowest'], reverse=True)[:TOP_QUERIES],
+            'repeated_queries': sorted((row for row in statements if row['count'] > 1),
+                                       key=lambda row: row['count'], reverse=True)[:TOP_QUERIES],
+            'template_seconds': self.template_seconds,
+            'templates': self.templates,
+            'functions': _top_functions(self.profiler),
+        }
+
+
+def _top_functions(profiler):
+    stats = pstats.Stats(profiler)
+    rows = []
+    for (filename, line, name), (calls, total_calls, own_seconds, cumulative, _) in stats.stats.items():
+        rows.append({
+            'function': f"{os.path.basename(filename)}:{line}({name})" if line else name,
+            'calls': total_calls,
+            'primitive_calls': calls,
+            'own_seconds': own_seconds,
+            'cumulative_seconds': cumulative,
+        })
+    return sorted(rows, key=lambda row: row['cumulative_seconds'], reverse=True)[:TOP_FUNCTIONS]
+
+
+def _current():
+    return getattr(_active, 'profile', None)
+
+
+@contextmanager
+def count_queries():
+    """Count the SQL statements this thread runs inside the block.
+
+    Yields a dict whose 'count' and 'statements' fill in as queries run.
+    """
+    counter = {'count': 0, 'statements': []}
+    counters = _active.__dict__.setdefault('counters', [])
+    counters.append(counter)
+    try:
+        yield counter
+    finally:
+        counters.remove(counter)
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = _current()
+    if profile is not None:
+        profile.query_started()
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = _current()
+    if profile is not None:
+        profile.query_finished(statement)
+    for counter in getattr(_active, 'counters', ()):
+        counter['count'] += 1
+        counter['statements'].append(statement)
+
+
+def _template_starting(sender, template, context, **extra):
+    profile = _current()
+    if profile is not None:
+        profile.template_started()
+
+
+def _template_done(sender, template, context, **extra):
+    profile = _current()
+    if profile is not None:
+        profile.template_finished(template.name)
+
+
+def should_profile(app):
+    """Admins can profile any request with ?profile=1, or every request with PROFILE_REQUESTS on"""
+    if request.endpoint in (None, 'static'):
+        return False
+    if not (app.config['PROFILE_REQUESTS'] or request.args.get('profile') == '1'):
+        return False
+    if request.endpoint and request.endpoint.startswith('views.admin_profile'):
+        return False  # Viewing profiles would push the interesting ones out
+    return current_user.is_authenticated and current_user.admin
+
+
+def recent_profiles():
+    """Stored profiles, newest first"""
+    with _profiles_lock:
+        return list(reversed(_profiles))
+
+
+def get_profile(profile_id):
+    with _profiles_lock:
+        return next((profile for profile in _profiles if profile['id'] == profile_id), None)
+
+
+def clear_profiles():
+    with _profiles_lock:
+        _profiles.clear()
+
+
+def _store(record):
+    with _profiles_lock:
+        _profiles.append(record)
+
+
+def init_request_profiler(app):
+    """Hook the profiler into the app's requests; it does nothing until an admin asks for it."""
+    global _profiles
+    app.config.setdefault('PROFILE_REQUESTS', os.environ.get('PROFILE_REQUESTS') == '1')
+    app.config.setdefault('PROFILE_HISTORY', DEFAULT_HISTORY)
+    with _profiles_lock:
+        if _profiles.maxlen != app.config['PROFILE_HISTORY']:
+            _profiles = deque(_profiles, maxlen=app.config['PROFILE_HISTORY'])
+
+    before_render_template.connect(_template_starting, app)
+    template_rendered.connect(_template_done, app)
+
+    @app.before_request
+    def _start_profile():
+        if not should_profile(app):
+            return
+        profile = _RequestProfile()
+        _active.profile = profile
+        g.request_profile = profile
+        profile.profiler.enable()
+
+    @app.after_request
+    def _finish_profile(response):
+        profile = g.pop('request_profile', None)
+        if profile is None:
+            return response
+        _active.profile = None
+        record = profile.finish(response.status_code)
+        _store(record)
+        response.headers['X-Profile-Id'] = str(record['id'])
+        response.headers['Server-Timing'] = (
+            f"db;desc=\"{record['query_count']} queries\";dur={record['query_seconds'] * 1000:.1f}, "
+            f"tpl;dur={record['template_seconds'] * 1000:.1f}, total;dur={record['total_seconds'] * 1000:.1f}"
+        )
+        return response
+
+    @app.teardown_request
+    def _abandon_profile(error=None):
+        # after_request is skipped when the view raises; keep the profile of the failed request too
+        profile = g.pop('request_profile', None)
+        _active.profile = None
+        if profile is not None:
+            _store(profile.finish(500, error=f"{type(error).__name__}: {error}" if error else None))
@@ -0,0 +1,217 @@
+# This file runs a sample of processed posts a second time through an alternative processing engine.
+# The alternative's metrics are compared with the ones saved on the post, within a tolerance, and both
+# timings are kept, so a faster engine can be checked against real uploads before it replaces the current one.
+import json
+import logging
+import math
+import os
+import random
+import time
+
+from . import db
+from .jobs import enqueue_job, job_handler, job_payload
+from .models import Job, Post
+from .post_summary import load_results_metrics
+from .sites import process_site_file
+from .LadbrooksPokerHandProcessor import LadbrooksPokerHandProcessor
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_REL_TOLERANCE = 1e-6
+DEFAULT_ABS_TOLERANCE = 1e-9
+# Mismatches kept per run; the count still covers all of them
+MISMATCH_LIMIT = 50
+VALUE_LENGTH = 200
+
+SHADOW_ENGINES = {}
+
+
+def shadow_engine(name):
+    """Register an alternative engine: a function (category, file text) returning a process_* outcome"""
+    def register(func):
+        SHADOW_ENGINES[name] = func
+        return func
+    return register
+
+
+@shadow_engine('chunk_check')
+def run_chunk_self_check(category, file_data):
+    """A self-check of the memory budget path, not an alternative engine.
+
+    The file goes through the same parser and metrics code as the primary
+    run, a chunk at a time with each chunk's metric tallies added up. A match
+    shows that adding up the chunks loses nothing.
+    """
+    # Any budget below the file's footprint forces the chunked path; a tiny one gives the smallest chunks
+    return process_site_file(category, file_data, memory_budget_mb=1e-6)
+
+
+def init_shadow_mode(app):
+    """Shadow settings: SHADOW_FRACTION of processing runs are repeated with SHADOW_ENGINE.
+
+    Both are off by default; shadow runs only happen once an engine has been
+    named, so each engine is opted into on its own.
+    """
+    try:
+        fraction = float(os.environ.get('SHADOW_FRACTION') or 0)
+    except ValueError:
+        fraction = 0.0
+    app.config.setdefault('SHADOW_FRACTION', min(max(fraction, 0.0), 1.0))
+    app.config.setdefault('SHADOW_ENGINE', os.environ.get('SHADOW_ENGINE') or None)
+    app.config.setdefault('SHADOW_REL_TOLERANCE', DEFAULT_REL_TOLERANCE)
+    app.config.setdefault('SHADOW_ABS_TOLERANCE', DEFAULT_ABS_TOLERANCE)
+
+
+def schedule_shadow_runs(records):
+    """Queue a shadow run for a sample of freshly processed posts.
+
+    records are the per-post dicts uploads and reprocessing produce; only
+    those with status 'reprocessed' or 'created' and their processing time
+    in 'seconds' are considered. Returns the ids of the queued jobs.
+    """
+    from flask import current_app
+
+    fraction = current_app.config.get('SHADOW_FRACTION', 0.0)
+    engine = current_app.config.get('SHADOW_ENGINE')
+    if not fraction or engine not in SHADOW_ENGINES:
+        return []
+    job_ids = []
+    for record in records:
+        if record.get('status') not in ('created', 'reprocessed') or random.random() >= fraction:
+            continue
+        try:
+            job = enqueue_job('shadow', None, {
+                'post_id': record['post_id'],
+                'engine': engine,
+                'primary_seconds': record.get('seconds'),
+            })
+        except Exception:
+            # Shadow runs are only a check; never let them break the processing they sample
+            db.session.rollback()
+            logger.exception("Could not queue a shadow run for post %s", record.get('post_id'))
+            continue
+        job_ids.append(job.id)
+    return job_ids
+
+
+def _short(value):
+    text = json.dumps(value, default=str)
+    return text if len(text) <= VALUE_LENGTH else text[:VALUE_LENGTH] + '...'
+
+
+def _decoded(value):
+    """Many metrics are stored as JSON text; compare what it holds rather than the text"""
+    if isinstance(value, str) and value[:1] in ('{', '['):
+        try:
+            return json.loads(value)
+        except ValueError:
+            return value
+    return value
+
+
+def compare_metrics(primary, shadow, rel_tol=DEFAULT_REL_TOLERANCE, abs_tol=DEFAULT_ABS_TOLERANCE):
+    """Compare two metrics structures value by value.
+
+    Numbers match within the tolerances, everything else must be equal;
+    metrics stored as JSON text are compared by their contents.
+    Returns (number of values compared, list of {'path', 'primary', 'shadow'}).
+    """
+    mismatches = []
+    compared = 0
+
+    def walk(path, left, right):
+        nonlocal compared
+        left, right = _decoded(left), _decoded(right)
+        if isinstance(left, dict) and isinstance(right, dict):
+            for key in sorted(set(left) | set(right), key=str):
+                if key not in left or key not in right:
+                    compared += 1
+                    mismatches.append({'path': f"{path}/{key}",
+                                       'primary': _short(left.get(key, '<missing>')),
+                                       'shadow': _short(right.get(key, '<missing>'))})
+                else:
+                    walk(f"{path}/{key}", left[key], right[key])
+            return
+        if isinstance(left, list) and isinstance(right, list) and len(left) == len(right):
+            for index, (left_item, right_item) in enumerate(zip(left, right)):
+                walk(f"{path}[{index}]", left_item, right_item)
+            return
+        compared += 1
+        numbers = (int, float)
+        if (isinstance(left, numbers) and isinstance(right, numbers)
+                and not isinstance(left, bool) and not isinstance(right, bool)):
+            if (math.isnan(left) and math.isnan(right)) or math.isclose(left, right, rel_tol=rel_tol, abs_tol=abs_tol):
+                return
+        elif left == right:
+            return
+        mismatches.append({'path': path or '/', 'primary': _short(left), 'shadow': _short(right)})
+
+    walk('', primary, shadow)
+    return compared, mismatches
+
+
+@job_handler('shadow')
+def run_shadow_job(job):
+    """Process a post's file with the shadow engine and compare its metrics with the saved ones."""
+    from flask import current_app
+
+    payload = job_payload(job)
+    result = {'post_id': payload['post_id'], 'engine': payload['engine'],
+              'primary_seconds': payload.get('primary_seconds')}
+    post = db.session.get(Post, payload['post_id'])
+    if post is None or not post.file_data:
+        return dict(result, status='skipped', reason='Post or its hand file no longer exists')
+    if post.metrics_version != LadbrooksPokerHandProcessor.metrics_version():
+        return dict(result, status='skipped', reason='Saved metrics are from another metrics version')
+    primary = load_results_metrics(post.data_frame_results)
+    if primary is None:
+        return dict(result, status='skipped', reason='The post has no saved metrics')
+    result.update(category=post.category, hands=post.hand_count)
+
+    started = time.perf_counter()
+    try:
+        is_real_dataset, reason, processed_dataframe, results = SHADOW_ENGINES[payload['engine']](
+            post.category, post.file_data.decode('utf-8'))
+    except Exception as e:
+        return dict(result, status='shadow_failed', reason=f"{type(e).__name__}: {e}")
+    result['shadow_seconds'] = round(time.perf_counter() - started, 3)
+    if not is_real_dataset or results is None or results.empty:
+        return dict(result, status='shadow_failed', reason=reason or 'No results generated')
+
+    shadow = load_results_metrics(results.to_json(orient='records'))
+    compared, mismatches = compare_metrics(
+        primary, shadow,
+        rel_tol=current_app.config.get('SHADOW_REL_TOLERANCE', DEFAULT_REL_TOLERANCE),
+        abs_tol=current_app.config.get('SHADOW_ABS_TOLERANCE', DEFAULT_ABS_TOLERANCE),
+    )
+    result.update(status='mismatch' if mismatches else 'match', values_compared=compared,
+                  mismatch_count=len(mismatches), mismatches=mismatches[:MISMATCH_LIMIT])
+    return result
+
+
+def recent_shadow_runs(limit=100):
+    """The latest shadow jobs, newest first, with their comparison results"""
+    jobs = Job.query.filter_by(kind='shadow').order_by(Job.id.desc()).limit(limit).all()
+    runs = []
+    for job in jobs:
+        run = dict(job_payload(job), job_id=job.id, job_status=job.status, created_at=job.created_at)
+        if job.result:
+            run.update(json.loads(job.result))
+        elif job.status == 'failed':
+            run.update(status='shadow_failed', reason=job.message)
+        else:
+            run.setdefault('status', job.status)
+        runs.append(run)
+    return runs
+
+
+def summarize_shadow_runs(runs):
+    """Counts per status.
+
+    There is no speedup figure: the only engine so far is a self-check of the
+    same code, so its timing says nothing about a faster engine.
+    """
+    counts = {}
+    for run in runs:
+        counts[run['status']] = counts.get(run['status'], 0) + 1
+    return {'counts': counts}
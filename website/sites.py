@@ -0,0 +1,51 @@
+# This file lists the poker sites hand files can come from and the processor class that reads each one.
+# A site's processor is its parser: it recognises, splits, stake-keys, validates and processes that site's hands.
+# Uploads, reprocessing, diagnostics and shadow runs all go through here, so a new site only needs registering.
+from .LadbrooksPokerHandProcessor import LadbrooksPokerHandProcessor
+from .PokerStarsHandProcessor import PokerStarsHandProcessor
+
+
+# How much of the start of a file sniff_category() reads to recognise its site
+SNIFF_BYTES = 4096
+
+UPLOAD_SITES = {
+    'ladbrooks': {
+        'label': 'Ladbrooks',
+        'processor': LadbrooksPokerHandProcessor,
+        'no_stakes_message': 'No valid stake levels detected in the file',
+        'no_posts_message': 'Failed to create any posts',
+    },
+    'stars': {
+        'label': 'PokerStars',
+        'processor': PokerStarsHandProcessor,
+        'no_stakes_message': 'No valid PokerStars cash-game stake levels detected.',
+        'no_posts_message': 'Failed to create any posts from PokerStars file.',
+    },
+}
+
+
+def site_labels():
+    """The supported sites' names for messages, e.g. 'Ladbrooks and PokerStars'"""
+    labels = [site['label'] for site in UPLOAD_SITES.values()]
+    return ' and '.join([', '.join(labels[:-1]), labels[-1]]) if len(labels) > 1 else ''.join(labels)
+
+
+def site_processor(category, file_data='', **options):
+    """A processor for a hand file of the given site; options go to the processor (e.g. memory_budget_mb)"""
+    return UPLOAD_SITES[category]['processor'](file_data, **options)
+
+
+def process_site_file(category, file_data, **options):
+    """Run a hand file through its site's processor.
+
+    Returns the processor's (is valid, reason, hands dataframe, results dataframe).
+    """
+    return site_processor(category, file_data, **options).process()
+
+
+def sniff_category(file_data):
+    """The site whose hand histories a file holds, judged from its first few KB, or None"""
+    head = file_data[:SNIFF_BYTES]
+    if isinstance(head, bytes):
+        head = head.decode('utf-8', errors='ignore')
+    return next((category for category, site in UPLOAD_SITES.items() if site['processor'].sniff(head)), None)
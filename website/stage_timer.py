@@ -0,0 +1,159 @@
+# This file times the stages a hand file goes through while it is processed.
+# Each stage records how long it took, how many rows went in and out, how many failed, and its memory use.
+# Totals from every processed file are kept in memory for the admin page.
+import logging
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+
+from .processing_memory import MB, current_rss_mb, trace_memory_enabled
+
+logger = logging.getLogger(__name__)
+
+class StageTimer:
+    """Records duration, rows in/out and failures for each processing stage.
+
+    Processors take a timer so callers can swap in their own: anything with
+    a stage(name, rows_in) context manager and a summary() method works.
+
+    Every stage notes the resident memory of the process when it ends
+    ('rss_mb') and how much that grew ('rss_growth_mb'); a stage that knows
+    it peaked before its end can set a higher 'rss_mb' itself. With trace_memory
+    (TRACE_PROCESSING_MEMORY=1 by default) tracemalloc also measures the most
+    memory the stage held at once ('peak_memory_mb'); nested stages count
+    towards their parent's peak.
+    """
+
+    def __init__(self, clock=time.perf_counter, trace_memory=None):
+        self.clock = clock
+        self.trace_memory = trace_memory_enabled() if trace_memory is None else trace_memory
+        self.stages = []
+        self._open = []
+        self._started_tracing = False
+
+    @contextmanager
+    def stage(self, name, rows_in=None):
+        """Time the block; it can set 'rows_out' and add to 'failures' on the yielded record"""
+        record = {'name': name, 'rows_in': rows_in, 'rows_out': None, 'failures': 0}
+        rss_before = current_rss_mb()
+        traced = self._start_tracing()
+        self._open.append(traced)
+        started = self.clock()
+        try:
+            yield record
+        except Exception as e:
+            record['failures'] += 1
+            record['error'] = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            record['seconds'] = round(self.clock() - started, 6)
+            self._open.pop()
+            self._finish_tracing(record, traced)
+            rss_after = current_rss_mb()
+            if rss_after is not None and record.get('rss_mb') is not None:
+                rss_after = max(rss_after, record['rss_mb'])
+            if rss_after is not None:
+                record['rss_mb'] = round(rss_after, 1)
+                record['rss_growth_mb'] = round(rss_after - rss_before, 1) if rss_before is not None else None
+            self.stages.append(record)
+
+    def _start_tracing(self):
+        if not self.trace_memory:
+            return None
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+        current, peak = tracemalloc.get_traced_memory()
+        # The enclosing stages keep the peak they reached so far before it is reset for this one
+        for parent in self._open:
+            if parent is not None:
+                parent['peak'] = max(parent['peak'], peak)
+        tracemalloc.reset_peak()
+        return {'start': current, 'peak': current}
+
+    def _finish_tracing(self, record, traced):
+        if traced is None or not tracemalloc.is_tracing():
+            return
+        peak = max(traced['peak'], tracemalloc.get_traced_memory()[1])
+        record['peak_memory_mb'] = round((peak - traced['start']) / MB, 2)
+        for parent in self._open:
+            if parent is not None:
+                parent['peak'] = max(parent['peak'], peak)
+        if self._started_tracing and not self._open:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    def summary(self):
+        """The recorded stages in the order they finished"""
+        return [dict(record) for record in self.stages]
+
+
+class NullStageTimer:
+    """A timer that records nothing, for callers that don't want the overhead"""
+
+    @contextmanager
+    def stage(self, name, rows_in=None):
+        yield {'name': name, 'rows_in': rows_in, 'rows_out': None, 'failures': 0}
+
+    def summary(self):
+        return []
+
+
+class StageCounters:
+    """Running totals per stage across every processed file in this process"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.started_at = datetime.now()
+            self.totals = {}
+
+    def record(self, stages):
+        """Add one file's stage summary to the totals"""
+        with self._lock:
+            for record in stages or []:
+                totals = self.totals.setdefault(record['name'], {
+                    'runs': 0, 'seconds': 0.0, 'max_seconds': 0.0,
+                    'rows_in': 0, 'rows_out': 0, 'failures': 0,
+                    'max_rss_mb': None, 'max_rss_growth_mb': None, 'max_peak_memory_mb': None,
+                })
+                seconds = record.get('seconds') or 0.0
+                totals['runs'] += 1
+                totals['seconds'] += seconds
+                totals['max_seconds'] = max(totals['max_seconds'], seconds)
+                totals['rows_in'] += record.get('rows_in') or 0
+                totals['rows_out'] += record.get('rows_out') or 0
+                totals['failures'] += record.get('failures') or 0
+                for key, total_key in (('rss_mb', 'max_rss_mb'), ('rss_growth_mb', 'max_rss_growth_mb'),
+                                       ('peak_memory_mb', 'max_peak_memory_mb')):
+                    if record.get(key) is not None:
+                        totals[total_key] = max(totals[total_key] or 0.0, record[key])
+
+    def snapshot(self):
+        """Totals per stage, slowest first, with the average time per run"""
+        with self._lock:
+            rows = [dict(totals, name=name) for name, totals in self.totals.items()]
+        for row in rows:
+            row['avg_seconds'] = row['seconds'] / row['runs'] if row['runs'] else 0.0
+        return sorted(rows, key=lambda row: row['seconds'], reverse=True)
+
+
+stage_counters = StageCounters()
+
+
+def record_stage_timings(results):
+    """Add the stage timings attached to a processor's results to the totals"""
+    try:
+        stages = results.attrs.get('stage_timings') if results is not None else None
+    except AttributeError:
+        return
+    try:
+        stage_counters.record(stages)
+    except Exception:
+        # Counters are only for the admin page; never let them break processing
+        logger.exception("Could not record stage timings")
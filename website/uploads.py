@@ -0,0 +1,186 @@
+# This file turns an uploaded hand history file, or an archive of them, into posts.
+# It finds the stake levels in the upload, processes each one, and saves a post per stake.
+# It runs as a background job so the upload page does not wait on the processing.
+import os
+
+from flask import current_app
+
+from . import db
+from .archives import ArchiveError, unpack_hands
+from .jobs import job_handler, job_payload, report_progress
+from .models import Post
+from .post_summary import apply_processing_results
+from .reprocess import DEFAULT_REPROCESS_WORKERS, process_hand_file, process_pool
+from .sites import UPLOAD_SITES, site_processor
+from .stage_timer import record_stage_timings
+
+
+DEFAULT_MAX_ARCHIVE_MB = 50
+DEFAULT_MAX_UNPACKED_MB = 500
+
+
+def init_uploads(app):
+    """Upload limits: MAX_ARCHIVE_MB for an archive as uploaded, MAX_UNPACKED_MB for what it unpacks to"""
+    for name, default in (('MAX_ARCHIVE_MB', DEFAULT_MAX_ARCHIVE_MB), ('MAX_UNPACKED_MB', DEFAULT_MAX_UNPACKED_MB)):
+        try:
+            limit = float(os.environ.get(name) or default)
+        except ValueError:
+            limit = default
+        app.config.setdefault(name, limit)
+
+
+def split_upload_by_stake(file_data, category):
+    """Map each stake level in a file to the file text holding only its hands.
+
+    A file with one stake level is returned whole under that stake.
+    """
+    split_data = site_processor(category, file_data).split_by_stakes()
+    if len(split_data) == 1:
+        return {stake_key: file_data for stake_key in split_data}
+    return split_data
+
+
+def process_stake_files(stake_files, progress):
+    """Process each (category, stake key, file bytes), several at once in worker processes.
+
+    Returns a (seconds taken, processor output) pair per stake file, in the
+    order given.
+    """
+    workers = current_app.config.get('REPROCESS_WORKERS', DEFAULT_REPROCESS_WORKERS)
+    executor = process_pool(min(workers, len(stake_files)))
+    runs = []
+    try:
+        if executor is None:
+            for number, (category, stake_key, file_data) in enumerate(stake_files):
+                progress(0.1 + 0.8 * number / len(stake_files), f'Processing stake {stake_key}')
+                runs.append(process_hand_file(category, file_data))
+        else:
+            futures = [executor.submit(process_hand_file, category, file_data)
+                       for category, _, file_data in stake_files]
+            for number, future in enumerate(futures):
+                progress(0.1 + 0.8 * number / len(futures), f'Processed {number} of {len(futures)} stakes')
+                runs.append(future.result())
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    return runs
+
+
+def create_stake_posts(user_id, details, stake_files, progress, messages=None):
+    """Process (category, stake key, file bytes) stake files and save one post per stake level.
+
+    Returns the flash messages to show, whether any post was created, and the
+    new posts' ids.
+    """
+    messages = list(messages or [])
+    multiple_stakes = len(stake_files) > 1
+    multiple_sites = len({category for category, _, _ in stake_files}) > 1
+
+    def describe(category, stake_key):
+        return f"{stake_key} ({UPLOAD_SITES[category]['label']})" if multiple_sites else stake_key
+
+    processed = []
+    runs = process_stake_files(stake_files, progress)
+    for (category, stake_key, file_data), (seconds, outcome) in zip(stake_files, runs):
+        is_real_dataset, reason, processed_dataframe, results = outcome
+        record_stage_timings(results)
+
+        if not is_real_dataset:
+            if multiple_stakes:
+                messages.append([f'Error processing stake {describe(category, stake_key)}: {reason}', 'error'])
+                continue
+            return {'messages': messages + [[reason, 'error']], 'success': False, 'post_ids': []}
+
+        # Check if dataframe is empty (no valid hands for this stake)
+        if multiple_stakes and (processed_dataframe.empty or len(processed_dataframe) == 0):
+            messages.append([f'No valid hands found for stake {describe(category, stake_key)}. Skipping.', 'warning'])
+            continue
+        processed.append((category, stake_key, file_data, processed_dataframe, results, seconds))
+
+    # Posts are saved together at the end so a failed job leaves nothing half-created
+    progress(0.95, 'Saving posts')
+    posts = []
+    for category, stake_key, file_data, processed_dataframe, results, seconds in processed:
+        post = Post(
+            # Create post text with stake information
+            text=f"{details['text']}\n\n[Stake: {describe(category, stake_key)}]" if multiple_stakes else details['text'],
+            author=user_id,
+            file_data=file_data,
+            category=category,
+            stake=stake_key,
+            game_type=details.get('game_type'),
+            table_size=details.get('table_size'),
+            game_name=details.get('game_name'),
+            buy_in=details.get('buy_in'),
+            cash_out=details.get('cash_out'),
+            currency=details.get('currency', 'USD'),
+        )
+        db.session.add(post)
+        apply_processing_results(post, processed_dataframe, results)
+        posts.append((post, seconds))
+    db.session.commit()
+    posts_created = [describe(post.category, post.stake) for post, _ in posts]
+    post_ids = [post.id for post, _ in posts]
+
+    from .shadow_mode import schedule_shadow_runs
+    schedule_shadow_runs([{'post_id': post.id, 'status': 'created', 'seconds': round(seconds, 3)}
+                          for post, seconds in posts])
+
+    if not multiple_stakes and posts_created:
+        messages.append([f'Post created successfully! (Stake: {posts_created[0]})', 'success'])
+    elif posts_created:
+        messages.append([f'Successfully created {len(posts_created)} post(s) for stakes: {", ".join(posts_created)}', 'success'])
+    else:
+        no_posts = {UPLOAD_SITES[category]['no_posts_message'] for category, _, _ in stake_files}
+        messages.append([no_posts.pop() if len(no_posts) == 1 else 'Failed to create any posts', 'error'])
+    return {'messages': messages, 'success': bool(posts_created), 'post_ids': post_ids}
+
+
+def create_posts_from_upload(user_id, details, file_data, progress=None):
+    """Process an uploaded file and save one post per stake level.
+
+    Returns the flash messages to show and whether any post was created.
+    progress, if given, is called with (fraction done, message).
+    """
+    progress = progress or (lambda fraction, message: None)
+    site = UPLOAD_SITES[details['category']]
+
+    progress(0.05, 'Finding stake levels')
+    split_data = split_upload_by_stake(file_data, details['category'])
+    if not split_data:
+        return {'messages': [[site['no_stakes_message'], 'error']], 'success': False, 'post_ids': []}
+    stake_files = [(details['category'], stake_key, stake_file_data.encode('utf-8'))
+                   for stake_key, stake_file_data in split_data.items()]
+    return create_stake_posts(user_id, details, stake_files, progress)
+
+
+def create_posts_from_archive(user_id, details, filename, data, progress=None):
+    """Unpack an uploaded archive and save one post per site and stake level across all its files.
+
+    Each file's site is sniffed from its contents, and a hand that appears in
+    more than one file is only used once.
+    """
+    progress = progress or (lambda fraction, message: None)
+    max_bytes = int(current_app.config.get('MAX_UNPACKED_MB', DEFAULT_MAX_UNPACKED_MB) * 1024 * 1024)
+    try:
+        unpacked = unpack_hands(filename, data, max_bytes,
+                                progress=lambda name: progress(0.05, f'Reading {name}'))
+    except ArchiveError as e:
+        return {'messages': [[str(e), 'error']], 'success': False, 'post_ids': []}
+
+    messages = unpacked.messages()
+    stake_files = [(category, stake_key, text.encode('utf-8'))
+                   for category, stake_key, text in unpacked.stake_files()]
+    if not stake_files:
+        return {'messages': messages + [['No hand histories with a stake level were found in the archive', 'error']],
+                'success': False, 'post_ids': []}
+    return create_stake_posts(user_id, details, stake_files, progress, messages)
+
+
+@job_handler('upload')
+def run_upload_job(job):
+    details = job_payload(job)
+    progress = lambda fraction, message: report_progress(job, fraction, message)
+    if details.get('archive'):
+        return create_posts_from_archive(job.user_id, details, details['archive'], job.data, progress=progress)
+    return create_posts_from_upload(job.user_id, details, job.data.decode('utf-8'), progress=progress)
@@ -0,0 +1,964 @@
+# This file builds the statistics shown on the dashboard and profile pages.
+# It keeps running totals per user (overall, per stake, per site and per month)
+# that are updated whenever a post or live session changes, so pages read one bucket.
+# Per-post numbers are read from the post's summary columns and its post_matchup rows instead.
+import ast
+import calendar
+import datetime
+import json
+
+from sqlalchemy import String, func, type_coerce
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from . import db
+from .models import Post, PostMatchup, LiveSession, UserStats
+from .downsampling import PROFILE_CHART_POINTS, earnings_chart
+from .post_summary import load_results_metrics, normalize_stake
+
+
+# Currency conversion rate (USD to EUR) - update this periodically or fetch from API
+USD_TO_EUR_RATE = 0.92  # Approximate current rate
+
+POT_TYPES = ['RFI Pots', '3-Bet Pots', '4-Bet Pots', 'RFI Multiway Pots', '3-Bet Multiway Pots', '4-Bet Multiway Pots']
+STREETS = ['flop', 'turn', 'river']
+ACTION_KEYS = ['bets', 'checks', 'calls', 'folds', 'raises']
+
+# Bump when the layout of a contribution changes so saved totals are rebuilt
+STATS_FORMAT = '3'
+
+
+def parse_nested_metric(value):
+    if isinstance(value, dict):
+        return value
+    if isinstance(value, str) and value:
+        try:
+            return json.loads(value)
+        except Exception:
+            try:
+                return ast.literal_eval(value)
+            except Exception:
+                return {}
+    return {}
+
+
+def _empty_action_bucket():
+    return {'total_hands': 0, 'bets': 0, 'checks': 0, 'calls': 0, 'folds': 0, 'raises': 0}
+
+
+# ------------------------------------------------------------------ #
+#  Per-post and per-session contributions                              #
+# ------------------------------------------------------------------ #
+
+def post_contribution(metrics):
+    """Running-total contribution of one post, built from its results row.
+
+    Only additive values are kept (counts and sums) so the same dict can be
+    added when a post is created and subtracted when it is deleted. Entries
+    carry a '_count' of the posts that have them, so an entry disappears only
+    once no post contributes it. Nothing per post is kept, so the totals stay
+    the same size however many posts there are.
+    """
+    contribution = {}
+    if not metrics:
+        return contribution
+    contribution['_count'] = 1
+
+    # Key metrics and postflop action frequencies
+    try:
+        vpip_info = parse_nested_metric(metrics.get('VPIP Info', {}))
+        rfi_info = parse_nested_metric(metrics.get('RFI VPIP Info', {}))
+        three_bet_info = parse_nested_metric(metrics.get('Three bet info', {}))
+        four_bet_info = parse_nested_metric(metrics.get('Four bet info', {}))
+        iso_raise_info = parse_nested_metric(metrics.get('Iso Raise info', {}))
+        hands = vpip_info.get('num_viable_hands', 0)
+        bb_earnings = float(metrics.get('Session BB Earnings', 0))
+
+        contribution['metrics'] = {
+            'total_hands': hands or 0,
+            'vpip_count': vpip_info.get('vpip_count', 0) or 0,
+            'rfi_count': rfi_info.get('rfi_count', 0) or 0,
+            'rfi_hands': rfi_info.get('num_viable_hands', 0) or 0,
+            'three_bet_count': three_bet_info.get('Num_three_bets', 0) or 0,
+            'three_bet_opportunities': three_bet_info.get('hero_3bet_opportunities', 0) or 0,
+            'four_bet_count': four_bet_info.get('Num_four_bets', 0) or 0,
+            'four_bet_opportunities': four_bet_info.get('hero_4bet_opportunities', 0) or 0,
+            'iso_raise_count': iso_raise_info.get('Num_iso_raises', 0) or 0,
+            'iso_raise_hands': iso_raise_info.get('Viable_hands', 0) or 0,
+            'total_bb_earnings': bb_earnings or 0.0,
+        }
+
+        postflop = {}
+        for street in STREETS:
+            source = parse_nested_metric(metrics.get(f'{street.title()} Action Frequency', {}))
+            if not isinstance(source, dict):
+                continue
+            bucket = _empty_action_bucket()
+            bucket['total_hands'] = source.get('total_hands', 0)
+            for action in ACTION_KEYS:
+                bucket[action] = source.get(action, 0)
+            for key in ['ip', 'oop', 'multiway']:
+                src_bucket = source.get(key, {})
+                sub_bucket = _empty_action_bucket()
+                if isinstance(src_bucket, dict):
+                    sub_bucket['total_hands'] = src_bucket.get('total_hands', 0) or src_bucket.get('total', 0)
+                    for action in ACTION_KEYS:
+                        sub_bucket[action] = src_bucket.get(action, 0)
+                bucket[key] = sub_bucket
+            postflop[street] = bucket
+        contribution['postflop'] = postflop
+    except (json.JSONDecodeError, KeyError, ValueError):
+        pass
+
+    # Board High Card Analysis
+    try:
+        board_analysis = parse_nested_metric(metrics.get('Board High Card Analysis', {}))
+        if not isinstance(board_analysis, dict):
+            board_analysis = {}
+        contribution['board'] = {
+            board_type: {
+                '_count': 1,
+                'total_hands': data.get('total_hands', 0),
+                'total_bb_earnings': data.get('total_bb_earnings', 0),
+            }
+            for board_type, data in board_analysis.items()
+        }
+    except (json.JSONDecodeError, KeyError, ValueError, AttributeError):
+        pass
+
+    # Positional Matchups (split by pot type: RFI, 3-bet, 4-bet, and multiway)
+    try:
+        matchups = {}
+        for pot_type, pot_matchups in _matchups_by_pot_type(metrics).items():
+            for matchup, data in pot_matchups.items():
+                matchups.setdefault(pot_type, {})[matchup] = {
+                    '_count': 1,
+                    'total_hands': data.get('total_hands', 0),
+                    'total_bb_earnings': data.get('total_bb_earnings', 0),
+                    'total_earnings': data.get('total_earnings', 0),
+                }
+        contribution['matchups'] = matchups
+    except (json.JSONDecodeError, KeyError, ValueError, AttributeError):
+        pass
+
+    # Hand, RFI, 3-bet and 4-bet matrices (flattened by combo for UI)
+    try:
+        def normalize_entry(value):
+            value = parse_nested_metric(value)
+            return value if isinstance(value, dict) else {}
+
+        hand_matrix = {}
+        for _, hand_data in normalize_entry(metrics.get('Hand Matrix Analysis', {})).items():
+            for combo, combo_data in normalize_entry(hand_data).items():
+                combo_data = normalize_entry(combo_data)
+                entry = hand_matrix.setdefault(combo, {'_count': 1, 'total_hands': 0, 'total_bb_earnings': 0.0, 'combos': {}})
+                entry['total_hands'] += combo_data.get('total_hands', 0)
+                entry['total_bb_earnings'] += combo_data.get('total_bb_earnings', 0)
+                for suit_combo, suit_data in normalize_entry(combo_data.get('combos', {})).items():
+                    suit_data = normalize_entry(suit_data)
+                    suit_entry = entry['combos'].setdefault(suit_combo, {'_count': 1, 'total_hands': 0, 'total_bb_earnings': 0.0})
+                    suit_entry['total_hands'] += suit_data.get('total_hands', 0)
+                    suit_entry['total_bb_earnings'] += suit_data.get('total_bb_earnings', 0)
+        contribution['hand_matrix'] = hand_matrix
+
+        for matrix_key, metric_name, total_key in (
+            ('rfi_matrix', 'RFI Matrix Analysis', 'total_rfi'),
+            ('three_bet_matrix', '3-Bet Matrix Analysis', 'total_three_bet'),
+            ('four_bet_matrix', '4-Bet Matrix Analysis', 'total_four_bet'),
+        ):
+            matrix = {}
+            for hand_type, hand_data in normalize_entry(metrics.get(metric_name, {})).items():
+                hand_data = normalize_entry(hand_data)
+                entry = matrix.setdefault(hand_type, {'_count': 1, total_key: 0, 'combos': {}})
+                entry[total_key] += hand_data.get(total_key, 0)
+                for combo, combo_data in normalize_entry(hand_data.get('combos', {})).items():
+                    combo_data = normalize_entry(combo_data)
+                    combo_entry = entry['combos'].setdefault(combo, {'_count': 1, total_key: 0})
+                    combo_entry[total_key] += combo_data.get(total_key, 0)
+            contribution[matrix_key] = matrix
+    except (json.JSONDecodeError, KeyError, ValueError, AttributeError):
+        pass
+
+    return contribution
+
+
+def _matchups_by_pot_type(metrics):
+    """A results row's Positional Matchups split by pot type"""
+    positional_matchups = parse_nested_metric(metrics.get('Positional Matchups', {}))
+    if not isinstance(positional_matchups, dict):
+        return {}
+    # Old format (flat dict) is treated as RFI Pots for backward compatibility
+    if 'RFI Pots' in positional_matchups or '3-Bet Pots' in positional_matchups:
+        return {pot_type: positional_matchups.get(pot_type, {}) for pot_type in POT_TYPES}
+    return {'RFI Pots': positional_matchups}
+
+
+def post_matchups(post, metrics):
+    """PostMatchup rows for the matchups a post has hands in"""
+    rows = []
+    try:
+        for pot_type, pot_matchups in _matchups_by_pot_type(metrics or {}).items():
+            for matchup, data in pot_matchups.items():
+                if data.get('total_hands', 0):
+                    hand_ids = data.get('hand_id') or data.get('hand_ids')
+                    rows.append(PostMatchup(
+                        post_id=post.id, pot_type=pot_type, matchup=matchup,
+                        hands=data.get('total_hands', 0),
+                        bb_earnings=data.get('total_bb_earnings', 0),
+                        earnings=data.get('total_earnings', 0),
+                        hand_ids=json.dumps(hand_ids) if hand_ids else None,
+                    ))
+    except (json.JSONDecodeError, KeyError, ValueError, AttributeError):
+        pass
+    return rows
+
+
+def live_session_contribution(session):
+    """Running-total contribution of one live session."""
+    profit_loss = session.profit_loss
+    profit_loss_bb = session.profit_loss_bb
+    return {
+        'live': {
+            'sessions': 1,
+            'earnings': profit_loss,
+            'bb_earnings': profit_loss_bb if profit_loss_bb is not None else 0.0,
+            'hours': session.hours_played or 0.0,
+            'winning_sessions': 1 if profit_loss > 0 else 0,
+        }
+    }
+
+
+# ------------------------------------------------------------------ #
+#  Running totals                                                      #
+# ------------------------------------------------------------------ #
+
+def merge_stats(target, delta, sign=1):
+    """Add (sign=1) or subtract (sign=-1) a contribution into running totals."""
+    for key, value in delta.items():
+        if isinstance(value, dict):
+            merged = merge_stats(target.get(key, {}), value, sign)
+            # Drop entries no remaining post contributes to
+            if sign < 0 and (not merged or merged.get('_count') == 0):
+                target.pop(key, None)
+            else:
+                target[key] = merged
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            total = target.get(key, 0) + sign * value
+            # Keep sums free of float noise after many add/subtract cycles
+            target[key] = total if isinstance(total, int) else round(total, 9)
+        else:
+            target.setdefault(key, value)
+    return target
+
+
+def _post_buckets(post):
+    buckets = [('all', '')]
+    stake = post.stake_normalized or normalize_stake(post.stake)
+    if stake:
+        buckets.append(('stake', stake))
+    if post.category:
+        buckets.append(('site', post.category))
+    if post.date_created:
+        buckets.append(('month', post.date_created.strftime('%Y-%m')))
+    return buckets
+
+
+def _flatten(contribution, prefix=()):
+    """(path, value) for every number in a contribution, path being the keys leading to it"""
+    for key, value in contribution.items():
+        path = prefix + (key,)
+        if isinstance(value, dict):
+            yield from _flatten(value, path)
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            yield path, value
+
+
+def _stats_rows(user_id, bucket_type, bucket_key, values, updated_at=None):
+    return [
+        {'user_id': user_id, 'bucket_type': bucket_type, 'bucket_key': bucket_key,
+         'path': json.dumps(list(path)), 'value': value, 'whole': isinstance(value, int),
+         'updated_at': updated_at}
+        for path, value in values
+    ]
+
+
+def _apply_to_buckets(user_id, buckets, contribution, sign):
+    """Add (sign=1) or subtract (sign=-1) a contribution in the user's running totals."""
+    _apply_values(user_id, buckets, [(path, sign * value) for path, value in _flatten(contribution)])
+
+
+def _apply_values(user_id, buckets, values):
+    """Add (path, amount) pairs to the user's running totals in SQL.
+
+    Each number is added to its row by one upsert, so stats jobs running side
+    by side for the same user never overwrite each other's changes.
+    """
+    now = datetime.datetime.now()
+    rows = []
+    for bucket_type, bucket_key in buckets:
+        rows.extend(_stats_rows(user_id, bucket_type, bucket_key, values, now))
+    if not rows:
+        return
+    statement = sqlite_insert(UserStats.__table__)
+    statement = statement.on_conflict_do_update(
+        index_elements=['user_id', 'bucket_type', 'bucket_key', 'path'],
+        set_={
+            # Keep sums free of float noise after many add/subtract cycles
+            'value': func.round(UserStats.value + statement.excluded.value, 9),
+            'whole': UserStats.whole & statement.excluded.whole,
+            'updated_at': statement.excluded.updated_at,
+        },
+    )
+    db.session.execute(statement, rows)
+    if any(path == ('_count',) and value < 0 for path, value in values):
+        # Drop the buckets no remaining post contributes to
+        emptied = (
+            db.session.query(UserStats.bucket_type, UserStats.bucket_key)
+            .filter(UserStats.user_id == user_id, UserStats.bucket_type != 'all',
+                    UserStats.path == '["_count"]', UserStats.value == 0)
+            .all()
+        )
+        for bucket_type, bucket_key in emptied:
+            UserStats.query.filter_by(user_id=user_id, bucket_type=bucket_type, bucket_key=bucket_key).delete()
+
+
+def _prune(totals):
+    """Drop entries no remaining post contributes to"""
+    for key, value in list(totals.items()):
+        if isinstance(value, dict):
+            if value.get('_count') == 0:
+                totals.pop(key)
+            else:
+                _prune(value)
+    return totals
+
+
+def _read_totals(rows):
+    """Running totals nested back up from (path, value, whole) rows"""
+    totals = {}
+    for path, value, whole in rows:
+        keys = json.loads(path)
+        if not keys:
+            continue
+        target = totals
+        for key in keys[:-1]:
+            target = target.setdefault(key, {})
+        target[keys[-1]] = int(round(value)) if whole else value
+    return _prune(totals)
+
+
+def _bucket_totals(user_id, bucket_type, bucket_key):
+    rows = db.session.query(UserStats.path, UserStats.value, UserStats.whole).filter_by(
+        user_id=user_id, bucket_type=bucket_type, bucket_key=bucket_key
+    )
+    return _read_totals(rows)
+
+
+def _is_materialized(user_id):
+    return db.session.query(UserStats.id).filter_by(
+        user_id=user_id, bucket_type='format', bucket_key=STATS_FORMAT
+    ).first() is not None
+
+
+def totals_updated_at(user_id):
+    """When the user's overall running totals last changed, rebuilding the totals first if needed."""
+    if not _is_materialized(user_id):
+        rebuild_user_stats(user_id)
+    return db.session.query(func.max(UserStats.updated_at)).filter_by(
+        user_id=user_id, bucket_type='all', bucket_key=''
+    ).scalar()
+
+
+def add_post_stats(post, metrics=None):
+    """Add a post's results to its author's running totals."""
+    if not _is_materialized(post.author):
+        return
+    if metrics is None:
+        metrics = load_results_metrics(post.data_frame_results)
+    _apply_to_buckets(post.author, _post_buckets(post), post_contribution(metrics), 1)
+    db.session.add_all(post_matchups(post, metrics))
+
+
+def remove_post_stats(post):
+    """Take a post's current results out of its author's running totals."""
+    if post.id is not None:
+        PostMatchup.query.filter_by(post_id=post.id).delete()
+    if not _is_materialized(post.author):
+        return
+    metrics = load_results_metrics(post.data_frame_results)
+    _apply_to_buckets(post.author, _post_buckets(post), post_contribution(metrics), -1)
+
+
+def update_post_stats(post, old_metrics, metrics):
+    """Move a post from its old results to new ones in its author's running totals.
+
+    Only the numbers that changed are written, in one pass, for a post whose
+    results grow in place (a live post gaining hands).
+    """
+    if post.id is not None:
+        PostMatchup.query.filter_by(post_id=post.id).delete()
+    db.session.add_all(post_matchups(post, metrics))
+    if not _is_materialized(post.author):
+        return
+    old_values = dict(_flatten(post_contribution(old_metrics)))
+    changes = []
+    for path, value in _flatten(post_contribution(metrics)):
+        old_value = old_values.pop(path, None)
+        if old_value is None:
+            changes.append((path, value))
+        elif value != old_value:
+            changes.append((path, value - old_value))
+    changes.extend((path, -value) for path, value in old_values.items())
+    _apply_values(post.author, _post_buckets(post), changes)
+
+
+def add_live_session_stats(session):
+    if _is_materialized(session.user_id):
+        _apply_to_buckets(session.user_id, [('all', '')], live_session_contribution(session), 1)
+
+
+def remove_live_session_stats(session):
+    if _is_materialized(session.user_id):
+        _apply_to_buckets(session.user_id, [('all', '')], live_session_contribution(session), -1)
+
+
+def rebuild_user_stats(user_id):
+    """Recompute every bucket for a user from their posts and live sessions."""
+    UserStats.query.filter_by(user_id=user_id).delete()
+    PostMatchup.query.filter(
+        PostMatchup.post_id.in_(db.session.query(Post.id).filter(Post.author == user_id))
+    ).delete(synchronize_session=False)
+    buckets = {('all', ''): {}}
+    posts = (
+        db.session.query(Post)
+        .filter(Post.author == user_id)
+        .order_by(Post.id)
+        .yield_per(20)
+    )
+    for post in posts:
+        metrics = load_results_metrics(post.data_frame_results)
+        contribution = post_contribution(metrics)
+        for bucket in _post_buckets(post):
+            merge_stats(buckets.setdefault(bucket, {}), contribution)
+        db.session.add_all(post_matchups(post, metrics))
+    for session in LiveSession.query.filter_by(user_id=user_id).all():
+        merge_stats(buckets[('all', '')], live_session_contribution(session))
+
+    now = datetime.datetime.now()
+    rows = [{'user_id': user_id, 'bucket_type': 'format', 'bucket_key': STATS_FORMAT, 'path': '[]',
+             'value': 0, 'whole': True, 'updated_at': now}]
+    for (bucket_type, bucket_key), data in buckets.items():
+        rows.extend(_stats_rows(user_id, bucket_type, bucket_key, _flatten(data), now))
+    db.session.execute(UserStats.__table__.insert(), rows)
+    db.session.commit()
+
+
+# ------------------------------------------------------------------ #
+#  Reading stats                                                       #
+# ------------------------------------------------------------------ #
+
+def _month_range(start_date, end_date):
+    """Return the month keys covered by a date filter, or None if it splits a month."""
+    if start_date and (start_date.day != 1 or start_date.time() != datetime.time(0, 0)):
+        return None
+    if end_date:
+        last_day = calendar.monthrange(end_date.year, end_date.month)[1]
+        if end_date.day != last_day or end_date.time() != datetime.time(23, 59, 59):
+            return None
+    start_key = start_date.strftime('%Y-%m') if start_date else None
+    end_key = end_date.strftime('%Y-%m') if end_date else None
+    return start_key, end_key
+
+
+def _materialized_totals(user_id, filters):
+    """Read running totals for the filters, or None if no bucket matches them."""
+    filters = filters or {}
+    start_date, end_date = filters.get('start_date'), filters.get('end_date')
+    stake, site = filters.get('stake'), filters.get('site')
+
+    if not _is_materialized(user_id):
+        rebuild_user_stats(user_id)
+    overall = _bucket_totals(user_id, 'all', '')
+
+    if not (start_date or end_date or stake or site):
+        return overall
+
+    totals = None
+    if not (start_date or end_date):
+        if stake and not site:
+            totals = _bucket_totals(user_id, 'stake', stake)
+        elif site and not stake:
+            totals = _bucket_totals(user_id, 'site', site)
+    elif not (stake or site):
+        months = _month_range(start_date, end_date)
+        if months is not None:
+            start_key, end_key = months
+            query = db.session.query(
+                UserStats.path, func.round(func.sum(UserStats.value), 9), func.min(UserStats.whole)
+            ).filter_by(user_id=user_id, bucket_type='month')
+            if start_key:
+                query = query.filter(UserStats.bucket_key >= start_key)
+            if end_key:
+                query = query.filter(UserStats.bucket_key <= end_key)
+            totals = _read_totals(query.group_by(UserStats.path))
+
+    if totals is None:
+        return None
+    # Live sessions are never filtered, so they always come from the overall bucket
+    totals['live'] = overall.get('live', {})
+    return totals
+
+
+def _post_filter_clauses(user_id, filters):
+    """SQL conditions for a user's posts matching the profile filters."""
+    clauses = [Post.author == user_id]
+    filters = filters or {}
+    # Compare as text in the stored format so rows saved without microseconds match like datetimes do
+    stored_date = type_coerce(Post.date_created, String)
+    if filters.get('start_date'):
+        clauses.append(stored_date >= filters['start_date'].strftime('%Y-%m-%d %H:%M:%S'))
+    if filters.get('end_date'):
+        clauses.append(stored_date <= filters['end_date'].strftime('%Y-%m-%d %H:%M:%S'))
+    if filters.get('stake'):
+        clauses.append(Post.stake_normalized == filters['stake'])
+    if filters.get('site'):
+        clauses.append(Post.category == filters['site'])
+    return clauses
+
+
+def _post_rows(user_id, filters=None):
+    """Light per-post rows (summary columns only) matching the filters, in the order posts were created."""
+    return (
+        db.session.query(Post.id, Post.date_created, Post.stake, Post.stake_normalized, Post.category,
+                         Post.hand_count, Post.earnings)
+        .filter(*_post_filter_clauses(user_id, filters))
+        .order_by(Post.id)
+        .all()
+    )
+
+
+def post_filter_options(user_id):
+    """Stakes and sites a user has posted, for the profile filter dropdowns."""
+    stakes = db.session.query(Post.stake_normalized).filter(
+        Post.author == user_id, Post.stake_normalized.isnot(None), Post.stake_normalized != ''
+    ).distinct()
+    sites = db.session.query(Post.category).filter(
+        Post.author == user_id, Post.category.isnot(None), Post.category != ''
+    ).distinct()
+    return {
+        'stakes': sorted(stake for (stake,) in stakes),
+        'sites': sorted(site for (site,) in sites),
+    }
+
+
+def get_user_stats(user_id, filters=None):
+    """Statistics for the dashboard/profile, read from the running totals when possible."""
+    totals = _materialized_totals(user_id, filters)
+    if totals is None:
+        # Filters that cut across buckets (e.g. stake and site together) are summed per post
+        return aggregate_user_stats(user_id, filters=filters)
+    return _build_stats(user_id, totals, filters)
+
+
+def aggregate_user_stats(user_id, filters=None):
+    """Aggregate poker statistics for a user across all their sessions (online and live)"""
+    rows = _post_rows(user_id, filters)
+    totals = {}
+    if rows:
+        posts = Post.query.filter(Post.id.in_([row.id for row in rows])).order_by(Post.id).all()
+        for post in posts:
+            merge_stats(totals, post_contribution(load_results_metrics(post.data_frame_results)))
+    for session in LiveSession.query.filter_by(user_id=user_id).all():
+        merge_stats(totals, live_session_contribution(session))
+    return _build_stats(user_id, totals, filters)
+
+
+def _build_stats(user_id, totals, filters):
+    """Turn running totals plus light per-post rows into the template stats dict."""
+    online_sessions = db.session.query(func.count(Post.id)).filter(Post.author == user_id).scalar()
+    live = totals.get('live', {})
+    live_total_sessions = live.get('sessions', 0)
+
+    # If no posts and no live sessions, return empty stats
+    if not online_sessions and not live_total_sessions:
+        return {
+            'total_combined_earnings_eur': 0,
+            'total_combined_bb': 0,
+            'total_combined_sessions': 0,
+            'online_sessions': 0,
+            'online_total_hands': 0,
+            'online_total_earnings': 0,
+            'online_total_earnings_eur': 0,
+            'online_total_bb_earnings': 0,
+            'online_bb_per_100': 0,
+            'online_avg_session_earnings': 0,
+            'online_win_rate': 0,
+            'live_sessions': 0,
+            'live_total_earnings': 0,
+            'live_total_bb_earnings': 0,
+            'live_total_hours': 0,
+            'live_avg_session_earnings': 0,
+            'live_win_rate': 0,
+            'live_avg_bb_per_hour': None,
+            'stake_breakdown': {},
+            'site_breakdown': {},
+            'recent_sessions': [],
+            'recent_live_sessions': [],
+            'aggregated_board_analysis': {},
+            'aggregated_hand_matrix': {},
+            'aggregated_rfi_matrix': {},
+            'aggregated_three_bet_matrix': {},
+            'aggregated_four_bet_matrix': {},
+            'aggregated_positional_matchups': {},
+            'earnings_chart': earnings_chart([], [], PROFILE_CHART_POINTS)
+        }
+
+    # Online (USD) statistics, one entry per post with results
+    rows = _post_rows(user_id, filters)
+    online_total_hands = 0
+    online_total_earnings = 0  # USD
+    online_session_earnings = []
+    online_session_dates = []
+    stake_breakdown = {}
+    site_breakdown = {}
+    for row in rows:
+        if row.earnings is None:
+            continue
+        hands = row.hand_count or 0
+        earnings = row.earnings
+        online_total_hands += hands
+        online_total_earnings += earnings
+        online_session_earnings.append(earnings)
+        online_session_dates.append(row.date_created)
+
+        # Track stake breakdown (normalize stake first)
+        stake = row.stake_normalized or normalize_stake(row.stake)
+        if stake not in stake_breakdown:
+            stake_breakdown[stake] = {'sessions': 0, 'earnings': 0, 'hands': 0}
+        stake_breakdown[stake]['sessions'] += 1
+        stake_breakdown[stake]['earnings'] += earnings
+        stake_breakdown[stake]['hands'] += hands
+
+        # Track site breakdown
+        site = row.category
+        if site not in site_breakdown:
+            site_breakdown[site] = {'sessions': 0, 'earnings': 0, 'hands': 0}
+        site_breakdown[site]['sessions'] += 1
+        site_breakdown[site]['earnings'] += earnings
+        site_breakdown[site]['hands'] += hands
+
+    aggregated_post_metrics = {
+        'total_hands': 0,
+        'vpip_count': 0,
+        'rfi_count': 0,
+        'rfi_hands': 0,
+        'three_bet_count': 0,
+        'three_bet_opportunities': 0,
+        'four_bet_count': 0,
+        'four_bet_opportunities': 0,
+        'iso_raise_count': 0,
+        'iso_raise_hands': 0,
+        'total_bb_earnings': 0.0
+    }
+    aggregated_post_metrics.update(totals.get('metrics', {}))
+    online_total_bb_earnings = aggregated_post_metrics['total_bb_earnings']
+
+    # Live (EUR) statistics
+    live_total_earnings = live.get('earnings', 0)  # EUR
+    live_total_bb_earnings = live.get('bb_earnings', 0)
+    live_total_hours = live.get('hours', 0)
+
+    # Calculate combined totals (convert USD to EUR)
+    total_online_earnings_eur = online_total_earnings * USD_TO_EUR_RATE
+    total_combined_earnings_eur = total_online_earnings_eur + live_total_earnings
+    total_combined_bb = online_total_bb_earnings + live_total_bb_earnings
+    total_combined_sessions = online_sessions + live_total_sessions
+
+    # Calculate derived statistics for online
+    online_bb_per_100 = (online_total_bb_earnings / online_total_hands) * 100 if online_total_hands > 0 else 0
+    online_avg_session_earnings = online_total_earnings / online_sessions if online_sessions > 0 else 0
+    online_win_rate = len([e for e in online_session_earnings if e > 0]) / online_sessions * 100 if online_sessions > 0 else 0
+
+    # Calculate derived statistics for live
+    live_avg_session_earnings = live_total_earnings / live_total_sessions if live_total_sessions > 0 else 0
+    live_win_rate = live.get('winning_sessions', 0) / live_total_sessions * 100 if live_total_sessions > 0 else 0
+    live_avg_bb_per_hour = live_total_bb_earnings / live_total_hours if live_total_hours > 0 else None
+
+    formatted_session_dates = [d.strftime('%Y-%m-%d') for d in online_session_dates]
+
+    # Calculate best and worst sessions (online)
+    best_online_session = max(online_session_earnings) if online_session_earnings else 0
+    worst_online_session = min(online_session_earnings) if online_session_earnings else 0
+
+    # Calculate best and worst sessions (live)
+    live_profit = LiveSession.cash_out - LiveSession.buy_in
+    best_live_session, worst_live_session = db.session.query(
+        func.max(live_profit), func.min(live_profit)
+    ).filter(LiveSession.user_id == user_id).one()
+    best_live_session = best_live_session or 0
+    worst_live_session = worst_live_session or 0
+
+    # Recent sessions with earnings data (online)
+    recent_ids = [row.id for row in rows[:5]]
+    recent_posts = {post.id: post for post in Post.query.filter(Post.id.in_(recent_ids)).all()} if recent_ids else {}
+    recent_sessions_with_earnings = []
+    for row in rows[:5]:
+        recent_sessions_with_earnings.append({
+            'post': recent_posts[row.id],
+            'earnings': round(row.earnings or 0, 2),
+            'type': 'online',
+            'stake': row.stake_normalized or normalize_stake(row.stake),
+            'date': row.date_created,
+            'hands': row.hand_count or 0
+        })
+
+    # Recent live sessions
+    recent_live_sessions = []
+    for session in LiveSession.query.filter_by(user_id=user_id).order_by(LiveSession.session_date.desc()).limit(5):
+        recent_live_sessions.append({
+            'session': session,
+            'earnings': round(session.profit_loss, 2),
+            'type': 'live'
+        })
+
+    # Board High Card Analysis: averages, sorted by total BB earnings
+    aggregated_board_analysis = {}
+    for board_type, data in totals.get('board', {}).items():
+        entry = {
+            'total_hands': data.get('total_hands', 0),
+            'total_bb_earnings': data.get('total_bb_earnings', 0.0),
+            'avg_bb_per_hand': 0.0
+        }
+        if entry['total_hands'] > 0:
+            entry['avg_bb_per_hand'] = round(entry['total_bb_earnings'] / entry['total_hands'], 2)
+            entry['total_bb_earnings'] = round(entry['total_bb_earnings'], 2)
+        aggregated_board_analysis[board_type] = entry
+    sorted_board_analysis = dict(sorted(
+        aggregated_board_analysis.items(),
+        key=lambda x: x[1]['total_bb_earnings']
+    ))
+
+    # Positional Matchups: averages and sort for each pot type
+    sorted_positional_matchups = {}
+    aggregated_matchup_debug = {}
+    matchup_totals = totals.get('matchups', {})
+    matchup_debug = _matchup_sources(user_id, filters)
+    for pot_type in POT_TYPES:
+        pot_matchups = {}
+        for matchup, data in matchup_totals.get(pot_type, {}).items():
+            entry = {
+                'total_hands': data.get('total_hands', 0),
+                'total_bb_earnings': data.get('total_bb_earnings', 0.0),
+                'total_earnings': data.get('total_earnings', 0.0),
+                'avg_bb_per_hand': 0.0
+            }
+            if entry['total_hands'] > 0:
+                entry['avg_bb_per_hand'] = round(entry['total_bb_earnings'] / entry['total_hands'], 2)
+                entry['total_bb_earnings'] = round(entry['total_bb_earnings'], 2)
+                entry['total_earnings'] = round(entry['total_earnings'], 2)
+            pot_matchups[matchup] = entry
+        sorted_positional_matchups[pot_type] = dict(sorted(
+            pot_matchups.items(),
+            key=lambda x: x[1]['total_bb_earnings']
+        ))
+        aggregated_matchup_debug[pot_type] = {
+            matchup: matchup_debug.get(pot_type, {}).get(matchup, [])
+            for matchup in pot_matchups
+        }
+
+    # Hand matrix: averages per combo and suit combo
+    aggregated_hand_matrix = {}
+    for combo, data in totals.get('hand_matrix', {}).items():
+        entry = {
+            'total_hands': data.get('total_hands', 0),
+            'total_bb_earnings': data.get('total_bb_earnings', 0.0),
+            'avg_bb_per_hand': 0.0,
+            'combos': {}
+        }
+        for suit_combo, suit_data in data.get('combos', {}).items():
+            entry['combos'][suit_combo] = {
+                'total_hands': suit_data.get('total_hands', 0),
+                'total_bb_earnings': suit_data.get('total_bb_earnings', 0.0),
+                'avg_bb_per_hand': 0.0
+            }
+        aggregated_hand_matrix[combo] = entry
+    _finalize_hand_matrix(aggregated_hand_matrix)
+
+    # Normalize hand matrix to flat combo map if needed
+    if any(key in aggregated_hand_matrix for key in ('Pairs', 'Suited', 'Offsuit')):
+        flat_hand_matrix = {}
+        for group_key in ('Pairs', 'Suited', 'Offsuit'):
+            group_data = aggregated_hand_matrix.get(group_key, {})
+            if not isinstance(group_data, dict):
+                continue
+            for combo, combo_data in group_data.items():
+                if not isinstance(combo_data, dict):
+                    continue
+                if combo not in flat_hand_matrix:
+                    flat_hand_matrix[combo] = {
+                        'total_hands': 0,
+                        'total_bb_earnings': 0.0,
+                        'avg_bb_per_hand': 0.0,
+                        'combos': {}
+                    }
+                flat_hand_matrix[combo]['total_hands'] += combo_data.get('total_hands', 0)
+                flat_hand_matrix[combo]['total_bb_earnings'] += combo_data.get('total_bb_earnings', 0)
+                suit_combos = combo_data.get('combos', {}) if isinstance(combo_data.get('combos', {}), dict) else {}
+                for suit_combo, suit_data in suit_combos.items():
+                    if suit_combo not in flat_hand_matrix[combo]['combos']:
+                        flat_hand_matrix[combo]['combos'][suit_combo] = {
+                            'total_hands': 0,
+                            'total_bb_earnings': 0.0,
+                            'avg_bb_per_hand': 0.0
+                        }
+                    flat_hand_matrix[combo]['combos'][suit_combo]['total_hands'] += suit_data.get('total_hands', 0)
+                    flat_hand_matrix[combo]['combos'][suit_combo]['total_bb_earnings'] += suit_data.get('total_bb_earnings', 0)
+        aggregated_hand_matrix = flat_hand_matrix
+    _finalize_hand_matrix(aggregated_hand_matrix)
+
+    # Aggregate rates across all posts (BB-based)
+    total_hands_all = aggregated_post_metrics['total_hands']
+    vpip_rate = (aggregated_post_metrics['vpip_count'] / total_hands_all * 100) if total_hands_all > 0 else 0
+    rfi_rate = (aggregated_post_metrics['rfi_count'] / aggregated_post_metrics['rfi_hands'] * 100) if aggregated_post_metrics['rfi_hands'] > 0 else 0
+    three_bet_rate = (aggregated_post_metrics['three_bet_count'] / aggregated_post_metrics['three_bet_opportunities'] * 100) if aggregated_post_metrics['three_bet_opportunities'] > 0 else 0
+    four_bet_rate = (aggregated_post_metrics['four_bet_count'] / aggregated_post_metrics['four_bet_opportunities'] * 100) if aggregated_post_metrics['four_bet_opportunities'] > 0 else 0
+    iso_raise_rate = (aggregated_post_metrics['iso_raise_count'] / aggregated_post_metrics['iso_raise_hands'] * 100) if aggregated_post_metrics['iso_raise_hands'] > 0 else 0
+
+    def finalize_action_bucket(bucket):
+        total = bucket.get('total_hands', 0)
+        bucket['bet_pct'] = round((bucket.get('bets', 0) / total * 100), 1) if total > 0 else 0
+        bucket['check_pct'] = round((bucket.get('checks', 0) / total * 100), 1) if total > 0 else 0
+        return bucket
+
+    aggregated_postflop = {}
+    for street in STREETS:
+        action_stats = _empty_action_bucket()
+        source = totals.get('postflop', {}).get(street, {})
+        for key in action_stats:
+            action_stats[key] = source.get(key, 0)
+        finalize_action_bucket(action_stats)
+        for key in ['ip', 'oop', 'multiway']:
+            sub_bucket = _empty_action_bucket()
+            for sub_key in sub_bucket:
+                sub_bucket[sub_key] = source.get(key, {}).get(sub_key, 0)
+            action_stats[key] = finalize_action_bucket(sub_bucket)
+        aggregated_postflop[street] = action_stats
+
+    return {
+        # Combined totals (in EUR)
+        'total_combined_earnings_eur': round(total_combined_earnings_eur, 2),
+        'total_combined_bb': round(total_combined_bb, 2),
+        'total_combined_sessions': total_combined_sessions,
+
+        # Online (USD) statistics
+        'online_sessions': online_sessions,
+        'online_total_hands': online_total_hands,
+        'online_total_earnings': round(online_total_earnings, 2),  # USD
+        'online_total_earnings_eur': round(total_online_earnings_eur, 2),  # Converted to EUR
+        'online_total_bb_earnings': round(online_total_bb_earnings, 2),
+        'online_bb_per_100': round(online_bb_per_100, 2),
+        'online_avg_session_earnings': round(online_avg_session_earnings, 2),
+        'online_win_rate': round(online_win_rate, 1),
+        'online_best_session': round(best_online_session, 2),
+        'online_worst_session': round(worst_online_session, 2),
+
+        # Live (EUR) statistics
+        'live_sessions': live_total_sessions,
+        'live_total_earnings': round(live_total_earnings, 2),  # EUR
+        'live_total_bb_earnings': round(live_total_bb_earnings, 2),
+        'live_total_hours': round(live_total_hours, 1),
+        'live_avg_session_earnings': round(live_avg_session_earnings, 2),
+        'live_win_rate': round(live_win_rate, 1),
+        'live_avg_bb_per_hour': round(live_avg_bb_per_hour, 2) if live_avg_bb_per_hour is not None else None,
+        'live_best_session': round(best_live_session, 2),
+        'live_worst_session': round(worst_live_session, 2),
+
+        # Legacy fields (for backward compatibility - online stats)
+        'total_sessions': online_sessions,
+        'total_hands': online_total_hands,
+        'total_earnings': round(online_total_earnings, 2),
+        'total_bb_earnings': round(online_total_bb_earnings, 2),
+        'bb_per_100': round(online_bb_per_100, 2),
+        'avg_session_earnings': round(online_avg_session_earnings, 2),
+        'win_rate': round(online_win_rate, 1),
+        'best_session': round(best_online_session, 2),
+        'worst_session': round(worst_online_session, 2),
+
+        'stake_breakdown': stake_breakdown,
+        'site_breakdown': site_breakdown,
+        'session_earnings': online_session_earnings,
+        'session_dates': online_session_dates,
+        'formatted_session_dates': formatted_session_dates,
+        'earnings_chart': earnings_chart(formatted_session_dates, online_session_earnings, PROFILE_CHART_POINTS),
+        'recent_sessions': recent_sessions_with_earnings,
+        'recent_live_sessions': recent_live_sessions,
+        'aggregated_board_analysis': sorted_board_analysis,
+        'aggregated_hand_matrix': aggregated_hand_matrix,
+        'aggregated_rfi_matrix': _without_counts(totals.get('rfi_matrix', {})),
+        'aggregated_three_bet_matrix': _without_counts(totals.get('three_bet_matrix', {})),
+        'aggregated_four_bet_matrix': _without_counts(totals.get('four_bet_matrix', {})),
+        'aggregated_positional_matchups': sorted_positional_matchups,
+        'aggregated_leaks': [],
+        'usd_to_eur_rate': USD_TO_EUR_RATE,
+
+        # Aggregated post metrics (BB-based)
+        'agg_total_hands': aggregated_post_metrics['total_hands'],
+        'agg_total_bb_earnings': round(aggregated_post_metrics['total_bb_earnings'], 2),
+        'agg_vpip_count': aggregated_post_metrics['vpip_count'],
+        'agg_vpip_rate': round(vpip_rate, 2),
+        'agg_rfi_count': aggregated_post_metrics['rfi_count'],
+        'agg_rfi_rate': round(rfi_rate, 2),
+        'agg_three_bet_count': aggregated_post_metrics['three_bet_count'],
+        'agg_three_bet_opportunities': aggregated_post_metrics['three_bet_opportunities'],
+        'agg_three_bet_rate': round(three_bet_rate, 2),
+        'agg_four_bet_count': aggregated_post_metrics['four_bet_count'],
+        'agg_four_bet_opportunities': aggregated_post_metrics['four_bet_opportunities'],
+        'agg_four_bet_rate': round(four_bet_rate, 2),
+        'agg_iso_raise_count': aggregated_post_metrics['iso_raise_count'],
+        'agg_iso_raise_rate': round(iso_raise_rate, 2),
+        'agg_postflop_action': aggregated_postflop,
+        'aggregated_matchup_debug': aggregated_matchup_debug
+    }
+
+
+def _matchup_sources(user_id, filters):
+    """The posts behind each positional matchup, for the debug list under the combined matchups"""
+    rows = (
+        db.session.query(PostMatchup, Post.date_created)
+        .join(Post, Post.id == PostMatchup.post_id)
+        .filter(*_post_filter_clauses(user_id, filters))
+        .order_by(PostMatchup.post_id, PostMatchup.id)
+    )
+    sources = {}
+    for matchup, post_date in rows:
+        sources.setdefault(matchup.pot_type, {}).setdefault(matchup.matchup, []).append({
+            'post_id': matchup.post_id,
+            'post_date': post_date.strftime('%Y-%m-%d'),
+            'hand_id': json.loads(matchup.hand_ids) if matchup.hand_ids else None,
+            'hands': matchup.hands,
+            'bb': matchup.bb_earnings,
+            'earnings': matchup.earnings
+        })
+    return sources
+
+
+def _finalize_hand_matrix(hand_matrix):
+    """Calculate averages for the flattened hand matrix"""
+    for combo, combo_data in hand_matrix.items():
+        total_hands = combo_data.get('total_hands', 0)
+        if total_hands:
+            combo_data['avg_bb_per_hand'] = round(combo_data['total_bb_earnings'] / total_hands, 2)
+            combo_data['total_bb_earnings'] = round(combo_data['total_bb_earnings'], 2)
+        suit_combos = combo_data.get('combos', {})
+        for suit_combo, suit_data in suit_combos.items():
+            suit_hands = suit_data.get('total_hands', 0)
+            if suit_hands:
+                suit_data['avg_bb_per_hand'] = round(suit_data['total_bb_earnings'] / suit_hands, 2)
+                suit_data['total_bb_earnings'] = round(suit_data['total_bb_earnings'], 2)
+
+
+def _without_counts(matrix):
+    """Copy of a running-total matrix without the '_count' bookkeeping keys"""
+    return {
+        key: _without_counts(value) if isinstance(value, dict) else value
+        for key, value in matrix.items() if key != '_count'
+    }